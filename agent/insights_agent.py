@@ -5,12 +5,21 @@ This agent processes customer feedback, performs sentiment analysis, generates i
 and optionally integrates with CRM systems using Amazon Bedrock AgentCore Runtime with Memory.
 """
 
+import gzip
+import hashlib
 import json
 import boto3
 import os
+import threading
+import time
 import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
 
 # Strands imports
 from strands import Agent, tool
@@ -27,6 +36,16 @@ except ImportError:
     BedrockAgentCoreApp = None
     MemoryClient = None
 
+# pyarrow reads the Parquet analytics export for long-range trends (optional)
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = pc = ds = None
+
 # Initialize the Bedrock AgentCore App
 if AGENTCORE_AVAILABLE:
     app = BedrockAgentCoreApp()
@@ -56,15 +75,113 @@ CONFIG_TABLE = os.getenv('CONFIG_TABLE_NAME')
 INSIGHTS_BUCKET = os.getenv('INSIGHTS_BUCKET_NAME')
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'dev')
 
-# Get Memory ID from SSM Parameter Store
+# SSM parameter cache (positive and negative TTLs, bulk prefetch of /insightmodai/*)
+PARAMETER_PREFIX = '/insightmodai/'
+PARAMETER_CACHE_TTL_SECONDS = int(os.getenv('PARAMETER_CACHE_TTL_SECONDS', '300'))
+PARAMETER_NEGATIVE_TTL_SECONDS = int(os.getenv('PARAMETER_NEGATIVE_TTL_SECONDS', '60'))
+MEMORY_ID_PARAMETER = f'{PARAMETER_PREFIX}agent-memory-id-{ENVIRONMENT}'
+
+_parameter_cache: Dict[str, Any] = {}
+_parameter_cache_lock = threading.Lock()
+_parameters_prefetched_until = 0.0
+
+
+def prefetch_parameters() -> Dict[str, str]:
+    """
+    Load every /insightmodai/* parameter with one paginated GetParametersByPath listing.
+
+    Returns:
+        Dictionary of parameter name to value
+    """
+    global _parameters_prefetched_until
+    now = time.time()
+    values = {}
+
+    paginator = ssm.get_paginator('get_parameters_by_path')
+    for page in paginator.paginate(Path=PARAMETER_PREFIX.rstrip('/'), Recursive=True):
+        for parameter in page.get('Parameters', []):
+            values[parameter['Name']] = parameter['Value']
+
+    with _parameter_cache_lock:
+        for name, value in values.items():
+            _parameter_cache[name] = (value, now + PARAMETER_CACHE_TTL_SECONDS)
+        _parameters_prefetched_until = now + PARAMETER_CACHE_TTL_SECONDS
+
+    return values
+
+
+def get_cached_parameter(name: str) -> Optional[str]:
+    """
+    Get an SSM parameter through the TTL cache.
+
+    Args:
+        name: Full parameter name
+
+    Returns:
+        Parameter value, or None if the parameter does not exist
+    """
+    now = time.time()
+    with _parameter_cache_lock:
+        entry = _parameter_cache.get(name)
+        if entry and entry[1] > now:
+            return entry[0]
+        if name.startswith(PARAMETER_PREFIX) and _parameters_prefetched_until > now:
+            # The prefix listing is authoritative - cache the miss
+            _parameter_cache[name] = (None, now + PARAMETER_NEGATIVE_TTL_SECONDS)
+            return None
+
+    try:
+        value = ssm.get_parameter(Name=name)['Parameter']['Value']
+        expires_at = now + PARAMETER_CACHE_TTL_SECONDS
+    except ssm.exceptions.ParameterNotFound:
+        value = None
+        expires_at = now + PARAMETER_NEGATIVE_TTL_SECONDS
+
+    with _parameter_cache_lock:
+        _parameter_cache[name] = (value, expires_at)
+    return value
+
+
+def invalidate_parameter(name: str) -> None:
+    """
+    Drop a cached parameter after a call failed with a stale value.
+
+    Args:
+        name: Full parameter name
+    """
+    global _parameters_prefetched_until
+    with _parameter_cache_lock:
+        _parameter_cache.pop(name, None)
+        _parameters_prefetched_until = 0.0
+
+
+def get_memory_id() -> Optional[str]:
+    """
+    Get the AgentCore Memory ID from the parameter cache.
+
+    Returns:
+        Memory ID, or None when memory is not configured or AgentCore is unavailable
+    """
+    if not AGENTCORE_AVAILABLE:
+        return None
+    return get_cached_parameter(MEMORY_ID_PARAMETER)
+
+
+# Prefetch all parameters at cold start, then resolve the Memory ID from the cache
+try:
+    prefetch_parameters()
+except Exception as e:
+    print(f"⚠️  Could not prefetch SSM parameters: {e}")
+
 MEMORY_ID = None
 if AGENTCORE_AVAILABLE:
     try:
-        memory_param = ssm.get_parameter(Name=f'/insightmodai/agent-memory-id-{ENVIRONMENT}')
-        MEMORY_ID = memory_param['Parameter']['Value']
+        MEMORY_ID = get_memory_id()
+    except Exception as e:
+        print(f"⚠️  Could not resolve Memory ID: {e}")
+    if MEMORY_ID:
         print(f"🧠 Using AgentCore Memory: {MEMORY_ID}")
-    except ssm.exceptions.ParameterNotFound:
-        MEMORY_ID = None
+    else:
         print("⚠️  Memory ID not found - memory features disabled")
 else:
     print("⚠️  AgentCore not available - memory features disabled")
@@ -73,6 +190,277 @@ else:
 if not FEEDBACK_TABLE or not SENTIMENT_TABLE or not CONFIG_TABLE:
     raise ValueError("Required environment variables not set: FEEDBACK_TABLE_NAME, SENTIMENT_TABLE_NAME, CONFIG_TABLE_NAME")
 
+# Parallel Segment/TotalSegments ranges for full-table scans
+SCAN_SEGMENTS = int(os.getenv('SCAN_SEGMENTS', '4'))
+
+
+def scan_segment(table_name: str, segment: Optional[int] = None, total_segments: Optional[int] = None,
+                 **scan_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every item of one scan segment (or the whole table), following LastEvaluatedKey.
+
+    Args:
+        table_name: DynamoDB table name
+        segment: Segment number when scanning in parallel
+        total_segments: Total number of segments
+        **scan_kwargs: Additional Scan parameters (filters, projections)
+
+    Returns:
+        Iterator over the matching items
+    """
+    table = dynamodb.Table(table_name)
+    request = dict(scan_kwargs)
+    if total_segments and total_segments > 1:
+        request.update(Segment=segment, TotalSegments=total_segments)
+
+    while True:
+        response = table.scan(**request)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def scan_table(table_name: str, segments: int = 1, **scan_kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every item matching a scan, splitting the table into parallel segments.
+
+    Segments are scanned on a thread pool and their items yielded as each
+    segment finishes, so a 1 MB page limit never truncates the result.
+
+    Args:
+        table_name: DynamoDB table name
+        segments: Number of parallel scan segments
+        **scan_kwargs: Additional Scan parameters (filters, projections)
+
+    Returns:
+        Iterator over the matching items
+    """
+    if segments <= 1:
+        yield from scan_segment(table_name, **scan_kwargs)
+        return
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [
+            executor.submit(lambda segment: list(scan_segment(table_name, segment, segments, **scan_kwargs)), segment)
+            for segment in range(segments)
+        ]
+        for future in futures:
+            yield from future.result()
+
+
+# Versioned configuration snapshot (written by the config manager Lambda, see lambda/config_client.py)
+CONFIG_SNAPSHOT_KEY = 'config#snapshot'
+CONFIG_CACHE_TTL_SECONDS = int(os.getenv('CONFIG_CACHE_TTL_SECONDS', '30'))
+
+_config_cache: Dict[str, Any] = {'settings': None, 'version': None, 'checked_at': 0.0}
+_config_cache_lock = threading.Lock()
+
+
+def load_config_snapshot() -> Tuple[Dict[str, str], int]:
+    """
+    Read every setting and the config version from the snapshot item.
+
+    Tables written before the snapshot existed are read with a scan instead.
+
+    Returns:
+        Tuple of (settings, version); version is 0 when there is no snapshot
+    """
+    item = dynamodb.Table(CONFIG_TABLE).get_item(Key={'config_key': CONFIG_SNAPSHOT_KEY}).get('Item')
+    if item:
+        return {key: str(value) for key, value in (item.get('settings') or {}).items()}, int(item.get('version', 0))
+
+    settings = {
+        item['config_key']: item['config_value']
+        for item in scan_table(CONFIG_TABLE)
+        if item['config_key'] != CONFIG_SNAPSHOT_KEY and 'config_value' in item
+    }
+    return settings, 0
+
+
+def get_config() -> Dict[str, str]:
+    """
+    Get the configuration from the in-container cache.
+
+    After CONFIG_CACHE_TTL_SECONDS only the snapshot version is read, and the
+    settings are reloaded when it has changed.
+
+    Returns:
+        Dictionary of config_key to config_value
+    """
+    now = time.time()
+    with _config_cache_lock:
+        settings, version = _config_cache['settings'], _config_cache['version']
+        if settings is not None and now - _config_cache['checked_at'] < CONFIG_CACHE_TTL_SECONDS:
+            return dict(settings)
+
+    try:
+        if settings is not None and version:
+            item = dynamodb.Table(CONFIG_TABLE).get_item(
+                Key={'config_key': CONFIG_SNAPSHOT_KEY},
+                ProjectionExpression='#version',
+                ExpressionAttributeNames={'#version': 'version'}
+            ).get('Item')
+            if item and int(item.get('version', 0)) == version:
+                with _config_cache_lock:
+                    _config_cache['checked_at'] = now
+                return dict(settings)
+
+        settings, version = load_config_snapshot()
+    except Exception as e:
+        if settings is None:
+            raise
+        # Keep serving the last known configuration and retry after the TTL
+        print(f"Error refreshing configuration, using version {version}: {e}")
+        with _config_cache_lock:
+            _config_cache['checked_at'] = now
+        return dict(settings)
+
+    with _config_cache_lock:
+        _config_cache.update(settings=settings, version=version, checked_at=now)
+    return dict(settings)
+
+
+# Timeframes longer than this read the Parquet analytics export instead of scanning
+ANALYTICS_EXPORT_MIN_DAYS = int(os.getenv('ANALYTICS_EXPORT_MIN_DAYS', '30'))
+
+
+def read_exported_sentiment(start: datetime, end: datetime) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read sentiment scores from the Parquet analytics export, pruning columns and date partitions.
+
+    Args:
+        start: Inclusive start of the range
+        end: Exclusive end of the range
+
+    Returns:
+        Current rows with feedback_id, sentiment_score and analysis_timestamp, or None when
+        pyarrow or the export is unavailable
+    """
+    if not PYARROW_AVAILABLE or not INSIGHTS_BUCKET:
+        return None
+
+    try:
+        dataset = ds.dataset(
+            f"s3://{INSIGHTS_BUCKET}/analytics/sentiment",
+            format='parquet',
+            partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+        )
+        table = dataset.to_table(
+            columns=['feedback_id', 'date', 'analysis_timestamp', 'sentiment_score', '_changed_at', '_sequence', '_deleted'],
+            filter=(
+                (ds.field('date') >= start.date().isoformat()) & (ds.field('date') <= end.date().isoformat())
+                & (ds.field('analysis_timestamp') >= start.isoformat())
+                & (ds.field('analysis_timestamp') < end.isoformat())
+            )
+        )
+    except Exception as e:
+        print(f"Analytics export unavailable, falling back to a table scan: {e}")
+        return None
+
+    # Newest version of each row per partition wins; tombstones mark deletes and moves
+    seen = set()
+    rows = []
+    for row in table.sort_by([('_changed_at', 'descending'), ('_sequence', 'descending')]).to_pylist():
+        key = (row['date'], row['feedback_id'])
+        if key in seen:
+            continue
+        seen.add(key)
+        if not row['_deleted'] and row['sentiment_score'] is not None:
+            rows.append({
+                'feedback_id': row['feedback_id'],
+                'sentiment_score': row['sentiment_score'],
+                'analysis_timestamp': row['analysis_timestamp']
+            })
+    return rows
+
+
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+
+# Maximum number of feedback texts packed into one batched sentiment prompt
+SENTIMENT_BATCH_MAX_ITEMS = int(os.getenv('SENTIMENT_BATCH_MAX_ITEMS', '25'))
+
+
+def invoke_model_text(prompt: str) -> str:
+    """
+    Invoke the Bedrock model and extract the generated text.
+
+    Args:
+        prompt: Prompt to send to the model
+
+    Returns:
+        Generated text from the model response
+    """
+    response = bedrock_model.invoke(prompt)
+
+    # Parse the Titan model response
+    # Titan models return: {"results": [{"outputText": "..."}]}
+    if hasattr(response, 'results') and response.results:
+        return response.results[0].outputText
+    elif isinstance(response, dict) and 'results' in response:
+        return response['results'][0]['outputText']
+
+    # Fallback for other response formats
+    return str(response)
+
+
+def validate_sentiment_entry(entry: Any) -> Optional[Dict[str, Any]]:
+    """
+    Validate one sentiment object returned by the model.
+
+    Args:
+        entry: Parsed JSON value for a single feedback item
+
+    Returns:
+        Normalized sentiment dictionary, or None if the entry is invalid
+    """
+    if not isinstance(entry, dict):
+        return None
+
+    try:
+        score = float(entry["sentiment_score"])
+        confidence = float(entry.get("confidence", 0.5))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    label = str(entry.get("sentiment_label", "")).lower()
+    if not 0.0 <= score <= 1.0 or label not in SENTIMENT_LABELS:
+        return None
+
+    key_themes = entry.get("key_themes", [])
+    if not isinstance(key_themes, list):
+        key_themes = [str(key_themes)]
+
+    return {
+        "sentiment_score": score,
+        "sentiment_label": label,
+        "confidence": min(max(confidence, 0.0), 1.0),
+        "key_themes": [str(theme) for theme in key_themes]
+    }
+
+
+def parse_json_array(response_text: str) -> List[Any]:
+    """
+    Extract a JSON array from model output, tolerating surrounding prose or code fences.
+
+    Args:
+        response_text: Raw model output
+
+    Returns:
+        Parsed list (empty if no array could be parsed)
+    """
+    start = response_text.find('[')
+    end = response_text.rfind(']')
+    if start == -1 or end <= start:
+        return []
+
+    try:
+        parsed = json.loads(response_text[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+
+    return parsed if isinstance(parsed, list) else []
+
 
 @tool
 def analyze_sentiment(feedback_text: str) -> Dict[str, Any]:
@@ -102,17 +490,7 @@ def analyze_sentiment(feedback_text: str) -> Dict[str, Any]:
 
         # Use Bedrock model for sentiment analysis
         try:
-            response = bedrock_model.invoke(prompt)
-
-            # Parse the Titan model response
-            # Titan models return: {"results": [{"outputText": "..."}]}
-            if hasattr(response, 'results') and response.results:
-                response_text = response.results[0].outputText
-            elif isinstance(response, dict) and 'results' in response:
-                response_text = response['results'][0]['outputText']
-            else:
-                # Fallback for other response formats
-                response_text = str(response)
+            response_text = invoke_model_text(prompt)
 
             # Parse the JSON response from the model
             try:
@@ -154,6 +532,114 @@ def analyze_sentiment(feedback_text: str) -> Dict[str, Any]:
             "error": str(e)
         }
 
+@tool
+def analyze_sentiment_batch(
+    feedback_items: List[Dict[str, Any]],
+    customer_context: Optional[Dict[str, List[Dict[str, Any]]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Analyze sentiment of several customer feedback texts with one model call per chunk.
+
+    Each text is given a stable index in a single structured prompt and the model
+    answers with a JSON array. Entries that are missing or fail validation are
+    re-run individually through analyze_sentiment.
+
+    Args:
+        feedback_items: List of dictionaries with feedback_text and optional feedback_id
+            and customer_id
+        customer_context: Optional mapping of customer_id to recent sentiment history
+
+    Returns:
+        List of sentiment results in input order, each carrying its index and feedback_id
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(feedback_items)
+
+    for chunk_start in range(0, len(feedback_items), SENTIMENT_BATCH_MAX_ITEMS):
+        chunk = range(chunk_start, min(chunk_start + SENTIMENT_BATCH_MAX_ITEMS, len(feedback_items)))
+
+        numbered_feedback = "\n".join(
+            f"{index}: {json.dumps(str(feedback_items[index].get('feedback_text') or ''))}"
+            for index in chunk
+        )
+
+        history_lines = []
+        for customer_id in dict.fromkeys(feedback_items[index].get('customer_id') for index in chunk):
+            history = (customer_context or {}).get(customer_id) if customer_id else None
+            if history:
+                scores = ", ".join(str(entry.get('sentiment_score', 'N/A')) for entry in history)
+                history_lines.append(f"- {customer_id}: recent sentiment scores {scores}")
+        customer_history = (
+            "Customer history (context only, score each feedback on its own text):\n        "
+            + "\n        ".join(history_lines)
+        ) if history_lines else ""
+        prompt = f"""
+        Analyze the sentiment of each customer feedback below. Each feedback is prefixed
+        with its index. Respond with a JSON array containing one object per feedback with:
+        - index: the feedback index exactly as given
+        - sentiment_score: float between 0-1 (1 being most positive)
+        - sentiment_label: "positive", "negative", or "neutral"
+        - confidence: float between 0-1 indicating confidence in the analysis
+        - key_themes: array of main themes mentioned
+
+        Feedback:
+        {numbered_feedback}
+
+        {customer_history}
+
+        Respond only with the JSON array, no other text.
+        """
+
+        try:
+            entries = parse_json_array(invoke_model_text(prompt))
+        except Exception as e:
+            print(f"Error calling Bedrock model for sentiment batch: {e}")
+            entries = []
+
+        for entry in entries:
+            index = entry.get("index") if isinstance(entry, dict) else None
+            if not isinstance(index, int) or index not in chunk or results[index] is not None:
+                continue
+            sentiment = validate_sentiment_entry(entry)
+            if sentiment:
+                results[index] = sentiment
+
+    # Re-run anything the batched call did not answer cleanly
+    for index, result in enumerate(results):
+        if result is None:
+            result = analyze_sentiment(feedback_items[index].get('feedback_text') or '')
+            result["batch_fallback"] = True
+            results[index] = result
+
+    for index, result in enumerate(results):
+        result["index"] = index
+        result["feedback_id"] = feedback_items[index].get('feedback_id')
+
+    return results
+
+
+def process_feedback_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyze a whole batch of feedback items sent in one runtime invocation.
+
+    Args:
+        payload: Input payload whose feedback_batch holds the feedback items
+
+    Returns:
+        Per-item sentiment results keyed back to their feedback_id
+    """
+    feedback_items = payload.get('feedback_batch') or []
+    results = analyze_sentiment_batch(feedback_items, payload.get('customer_context'))
+
+    return {
+        "results": results,
+        "batch_size": len(feedback_items),
+        "session_id": payload.get('session_id'),
+        "timestamp": datetime.utcnow().isoformat(),
+        "model_used": model_id,
+        "tools_used": ["analyze_sentiment_batch"]
+    }
+
+
 @tool
 def store_feedback(feedback_data: Dict[str, Any]) -> str:
     """
@@ -186,6 +672,173 @@ def store_feedback(feedback_data: Dict[str, Any]) -> str:
         raise
 
 
+# Trend statistics: EWMA span (in samples), the z value for confidence
+# intervals, and the fitted change over the timeframe that counts as a trend
+TREND_EWMA_SPAN = int(os.getenv('TREND_EWMA_SPAN', '20'))
+TREND_Z_VALUE = 1.96
+TREND_MIN_CHANGE = float(os.getenv('TREND_MIN_CHANGE', '0.05'))
+
+
+def query_sentiment_range(start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """
+    Read sentiment scores analyzed between start and end through the label/time index.
+
+    One Query per sentiment label runs on a thread pool; each reads only its
+    time range and the projected score, never the whole table.
+
+    Args:
+        start: Start of the range
+        end: End of the range
+
+    Returns:
+        Rows with feedback_id, sentiment_score and analysis_timestamp
+    """
+    table = dynamodb.Table(SENTIMENT_TABLE)
+
+    def query_label(label: str) -> List[Dict[str, Any]]:
+        request = {
+            'IndexName': 'LabelTimeIndex',
+            'KeyConditionExpression': 'sentiment_label = :label AND analysis_timestamp BETWEEN :start AND :end',
+            'ProjectionExpression': 'feedback_id, sentiment_score, analysis_timestamp',
+            'ExpressionAttributeValues': {':label': label, ':start': start.isoformat(), ':end': end.isoformat()}
+        }
+        rows = []
+        while True:
+            response = table.query(**request)
+            rows.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return rows
+            request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    with ThreadPoolExecutor(max_workers=len(SENTIMENT_LABELS)) as executor:
+        return [row for rows in executor.map(query_label, SENTIMENT_LABELS) for row in rows]
+
+
+def compute_sentiment_statistics(timestamps: List[str], scores: List[float]) -> Dict[str, Any]:
+    """
+    Compute trend statistics over a sentiment series in one vectorized pass.
+
+    Args:
+        timestamps: ISO analysis timestamps (any order)
+        scores: Sentiment scores matching timestamps
+
+    Returns:
+        Dictionary with mean and confidence interval, least-squares slope per
+        day (with confidence interval), EWMA, trend label and distribution
+    """
+    times = np.array(timestamps, dtype='datetime64[us]')
+    values = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    times, values = times[order], values[order]
+    count = values.size
+
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if count > 1 else 0.0
+    mean_margin = TREND_Z_VALUE * std / np.sqrt(count) if count > 1 else 0.0
+
+    # Exponentially weighted mean with the newest sample weighted highest
+    alpha = 2.0 / (TREND_EWMA_SPAN + 1)
+    weights = (1 - alpha) ** np.arange(count - 1, -1, -1, dtype=np.float64)
+    ewma = float(np.dot(weights, values) / weights.sum())
+
+    slope = slope_margin = None
+    trend = "insufficient_data"
+    days = (times - times[0]) / np.timedelta64(1, 'D')
+    spread = float(((days - days.mean()) ** 2).sum())
+    if count >= 3 and spread > 0:
+        # Least-squares fit of score against time (in days)
+        slope, intercept = np.polyfit(days, values, 1)
+        residuals = values - (slope * days + intercept)
+        slope_margin = TREND_Z_VALUE * float(np.sqrt((residuals ** 2).sum() / (count - 2) / spread))
+        fitted_change = slope * float(days[-1])
+
+        # A trend needs both a meaningful fitted change and a slope interval that excludes zero
+        if fitted_change > TREND_MIN_CHANGE and slope - slope_margin > 0:
+            trend = "improving"
+        elif fitted_change < -TREND_MIN_CHANGE and slope + slope_margin < 0:
+            trend = "declining"
+        else:
+            trend = "stable"
+
+    positive, neutral, negative = (
+        int(np.count_nonzero(values > 0.6)),
+        int(np.count_nonzero((values >= 0.4) & (values <= 0.6))),
+        int(np.count_nonzero(values < 0.4))
+    )
+    histogram, _ = np.histogram(values, bins=10, range=(0.0, 1.0))
+
+    return {
+        "average_sentiment": round(mean, 3),
+        "confidence_interval": [round(mean - mean_margin, 3), round(mean + mean_margin, 3)],
+        "ewma_sentiment": round(ewma, 3),
+        "slope_per_day": round(float(slope), 5) if slope is not None else None,
+        "slope_confidence_interval": (
+            [round(float(slope) - slope_margin, 5), round(float(slope) + slope_margin, 5)]
+            if slope is not None else None
+        ),
+        "trend": trend,
+        "first_analysis": str(times[0]),
+        "last_analysis": str(times[-1]),
+        "sentiment_distribution": {
+            "positive": positive,
+            "neutral": neutral,
+            "negative": negative
+        },
+        "score_histogram": histogram.tolist()
+    }
+
+
+def parse_timeframe_days(timeframe: str) -> float:
+    """
+    Parse a timeframe such as "7d" or "12h" into days.
+
+    Args:
+        timeframe: Time period (e.g., "7d", "30d", "12h")
+
+    Returns:
+        Number of days (7 when the timeframe is not recognized)
+    """
+    if timeframe.endswith('d'):
+        return int(timeframe[:-1])
+    elif timeframe.endswith('h'):
+        return int(timeframe[:-1]) / 24
+    return 7  # Default to 7 days
+
+
+def summarize_sentiment_items(timeframe: str, items: List[Dict[str, Any]], data_source: str) -> Dict[str, Any]:
+    """
+    Build the trend analysis for a set of sentiment rows.
+
+    Args:
+        timeframe: Timeframe the rows cover
+        items: Rows with sentiment_score and analysis_timestamp
+        data_source: Where the rows were read from
+
+    Returns:
+        Dictionary containing trend analysis
+    """
+    if not items:
+        return {
+            "timeframe": timeframe,
+            "data_source": data_source,
+            "total_analyses": 0,
+            "average_sentiment": 0.5,
+            "trend": "insufficient_data"
+        }
+
+    statistics = compute_sentiment_statistics(
+        [item['analysis_timestamp'] for item in items],
+        [float(item['sentiment_score']) for item in items]
+    )
+
+    return {
+        "timeframe": timeframe,
+        "data_source": data_source,
+        "total_analyses": len(items),
+        **statistics
+    }
+
+
 @tool
 def query_sentiment_trends(timeframe: str = "7d") -> Dict[str, Any]:
     """
@@ -198,81 +851,406 @@ def query_sentiment_trends(timeframe: str = "7d") -> Dict[str, Any]:
         Dictionary containing trend analysis
     """
     try:
-        # Parse timeframe
-        if timeframe.endswith('d'):
-            days = int(timeframe[:-1])
-        elif timeframe.endswith('h'):
-            days = int(timeframe[:-1]) / 24
-        else:
-            days = 7  # Default to 7 days
+        days = parse_timeframe_days(timeframe)
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=days)
 
-        start_date = datetime.utcnow() - timedelta(days=days)
-        start_iso = start_date.isoformat()
+        # Long ranges come from the Parquet export; the rest queries the label/time index
+        items = read_exported_sentiment(start_date, end_date) if days > ANALYTICS_EXPORT_MIN_DAYS else None
+        data_source = 'analytics_export' if items is not None else 'sentiment_index'
+        if items is None:
+            items = query_sentiment_range(start_date, end_date)
 
-        table = dynamodb.Table(SENTIMENT_TABLE)
+        return summarize_sentiment_items(timeframe, items, data_source)
 
-        # Query sentiment data within timeframe
-        response = table.scan(
-            FilterExpression='analysis_timestamp >= :start_date',
-            ExpressionAttributeValues={':start_date': start_iso}
-        )
+    except Exception as e:
+        print(f"Error querying sentiment trends: {e}")
+        return {
+            "error": str(e),
+            "timeframe": timeframe
+        }
 
-        items = response.get('Items', [])
 
-        if not items:
-            return {
-                "timeframe": timeframe,
-                "total_analyses": 0,
-                "average_sentiment": 0.5,
-                "trend": "insufficient_data"
-            }
+# Customer-scoped reports read at most this many of the customer's newest feedback items
+CUSTOMER_REPORT_MAX_FEEDBACK = int(os.getenv('CUSTOMER_REPORT_MAX_FEEDBACK', '500'))
 
-        # Calculate trends
-        sentiment_scores = [float(item['sentiment_score']) for item in items]
-        avg_sentiment = sum(sentiment_scores) / len(sentiment_scores)
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_LIMIT = 100
 
-        # Determine trend direction
-        if len(items) >= 2:
-            first_half = sentiment_scores[:len(sentiment_scores)//2]
-            second_half = sentiment_scores[len(sentiment_scores)//2:]
+# Churn-risk weights: stated risk, unresolved issues, recent negativity, declining trend
+CHURN_RISK_WEIGHTS = {"stated_risk": 0.35, "unresolved": 0.25, "recent_negative": 0.25, "declining": 0.15}
+CHURN_RISK_LEVELS = {"high": 1.0, "medium": 0.5, "low": 0.0}
 
-            first_avg = sum(first_half) / len(first_half)
-            second_avg = sum(second_half) / len(second_half)
 
-            if second_avg > first_avg + 0.1:
-                trend = "improving"
-            elif second_avg < first_avg - 0.1:
-                trend = "declining"
-            else:
-                trend = "stable"
-        else:
-            trend = "insufficient_data"
+def query_customer_feedback(customer_id: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """
+    Read a customer's feedback in a time range through the customer/time index, newest first.
+
+    Args:
+        customer_id: Customer identifier
+        start: Start of the range
+        end: End of the range
+
+    Returns:
+        Feedback rows (feedback_id, timestamp, channel, category, rating), at
+        most CUSTOMER_REPORT_MAX_FEEDBACK of them
+    """
+    table = dynamodb.Table(FEEDBACK_TABLE)
+    request = {
+        'IndexName': 'CustomerTimeIndex',
+        'KeyConditionExpression': 'customer_id = :customer_id AND #ts BETWEEN :start AND :end',
+        'ProjectionExpression': 'feedback_id, #ts, channel, category, rating',
+        'ExpressionAttributeNames': {'#ts': 'timestamp'},
+        'ExpressionAttributeValues': {':customer_id': customer_id, ':start': start.isoformat(), ':end': end.isoformat()},
+        'ScanIndexForward': False,
+        'Limit': CUSTOMER_REPORT_MAX_FEEDBACK
+    }
+
+    rows: List[Dict[str, Any]] = []
+    while len(rows) < CUSTOMER_REPORT_MAX_FEEDBACK:
+        response = table.query(**request)
+        rows.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        request['Limit'] = CUSTOMER_REPORT_MAX_FEEDBACK - len(rows)
+    return rows[:CUSTOMER_REPORT_MAX_FEEDBACK]
+
+
+def batch_get_by_feedback_id(table_name: str, feedback_ids: List[str], attributes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch rows keyed by feedback_id with BatchGetItem, retrying unprocessed keys.
+
+    Args:
+        table_name: DynamoDB table name
+        feedback_ids: Keys to fetch
+        attributes: Attributes to project (feedback_id is always included)
+
+    Returns:
+        Dictionary mapping feedback_id to its row
+    """
+    names = {f'#a{index}': name for index, name in enumerate(dict.fromkeys(['feedback_id'] + attributes))}
+    ids = list(dict.fromkeys(feedback_ids))
+    results: Dict[str, Dict[str, Any]] = {}
+
+    for start in range(0, len(ids), BATCH_GET_LIMIT):
+        request = {table_name: {
+            'Keys': [{'feedback_id': feedback_id} for feedback_id in ids[start:start + BATCH_GET_LIMIT]],
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
+        }}
+        attempt = 0
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                results[item['feedback_id']] = item
+            request = response.get('UnprocessedKeys') or None
+            if request:
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+                attempt += 1
+
+    return results
+
+
+def compute_churn_indicators(rows: List[Dict[str, Any]], trend: str) -> Dict[str, Any]:
+    """
+    Derive churn-risk indicators for a customer from their newest-first feedback rows.
+
+    Args:
+        rows: Joined feedback rows (metadata, sentiment_score, sentiment_label), newest first
+        trend: The customer's sentiment trend
+
+    Returns:
+        Dictionary with the stated churn risk, open issues, negative streak,
+        a 0-1 churn-risk score and its level
+    """
+    metadata = [row.get('metadata') if isinstance(row.get('metadata'), dict) else {} for row in rows]
+    stated = [m['churn_risk'] for m in metadata if m.get('churn_risk')]
+    statuses = [m['resolution_status'] for m in metadata if m.get('resolution_status')]
+    unresolved = sum(1 for status in statuses if status in ('unresolved', 'escalated'))
+
+    negative_streak = 0
+    for row in rows:
+        if row.get('sentiment_label') != 'negative':
+            break
+        negative_streak += 1
+
+    recent_labels = [row['sentiment_label'] for row in rows[:5] if row.get('sentiment_label')]
+    recent_negative_share = recent_labels.count('negative') / len(recent_labels) if recent_labels else 0.0
+
+    score = (
+        CHURN_RISK_WEIGHTS["stated_risk"] * CHURN_RISK_LEVELS.get(stated[0] if stated else 'low', 0.0)
+        + CHURN_RISK_WEIGHTS["unresolved"] * (unresolved / len(statuses) if statuses else 0.0)
+        + CHURN_RISK_WEIGHTS["recent_negative"] * recent_negative_share
+        + CHURN_RISK_WEIGHTS["declining"] * (1.0 if trend == "declining" else 0.0)
+    )
+
+    return {
+        "latest_stated_churn_risk": stated[0] if stated else None,
+        "stated_churn_risk_counts": dict(Counter(stated)),
+        "resolution_status_counts": dict(Counter(statuses)),
+        "open_issues": unresolved,
+        "negative_streak": negative_streak,
+        "recent_negative_share": round(recent_negative_share, 3),
+        "churn_risk_score": round(score, 3),
+        "churn_risk_level": "high" if score >= 0.6 else "medium" if score >= 0.3 else "low"
+    }
+
+
+@tool
+def query_customer_insights(customer_id: str, timeframe: str = "90d") -> Dict[str, Any]:
+    """
+    Analyze one customer's feedback: sentiment trend, themes and churn-risk indicators.
+
+    Reads only this customer's rows (customer/time index plus BatchGetItem joins),
+    so the cost follows the customer's data volume rather than the table size.
+
+    Args:
+        customer_id: Customer identifier
+        timeframe: Time period to analyze (e.g., "30d", "90d")
+
+    Returns:
+        Dictionary containing the customer's trend analysis and churn indicators
+    """
+    try:
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(days=parse_timeframe_days(timeframe))
+
+        feedback = query_customer_feedback(customer_id, start_date, end_date)
+        feedback_ids = [row['feedback_id'] for row in feedback]
+        metadata = batch_get_by_feedback_id(FEEDBACK_TABLE, feedback_ids, ['metadata'])
+        sentiments = batch_get_by_feedback_id(
+            SENTIMENT_TABLE, feedback_ids,
+            ['sentiment_score', 'sentiment_label', 'analysis_timestamp', 'key_themes']
+        )
+
+        rows = [
+            {**row, **metadata.get(row['feedback_id'], {}), **sentiments.get(row['feedback_id'], {})}
+            for row in feedback
+        ]
+        analyzed = [row for row in rows if row.get('sentiment_score') is not None and row.get('analysis_timestamp')]
+
+        insights = summarize_sentiment_items(timeframe, analyzed, 'customer_index')
+        themes = Counter(
+            str(theme) for row in analyzed if isinstance(row.get('key_themes'), list) for theme in row['key_themes']
+        )
+        ratings = [float(row['rating']) for row in rows if row.get('rating') is not None]
 
         return {
-            "timeframe": timeframe,
-            "total_analyses": len(items),
-            "average_sentiment": round(avg_sentiment, 3),
-            "trend": trend,
-            "sentiment_distribution": {
-                "positive": len([s for s in sentiment_scores if s > 0.6]),
-                "neutral": len([s for s in sentiment_scores if 0.4 <= s <= 0.6]),
-                "negative": len([s for s in sentiment_scores if s < 0.4])
-            }
+            **insights,
+            "customer_id": customer_id,
+            "total_feedback": len(rows),
+            "truncated": len(rows) >= CUSTOMER_REPORT_MAX_FEEDBACK,
+            "average_rating": round(sum(ratings) / len(ratings), 2) if ratings else None,
+            "channel_breakdown": dict(Counter(row['channel'] for row in rows if row.get('channel'))),
+            "category_breakdown": dict(Counter(row['category'] for row in rows if row.get('category'))),
+            "top_themes": [{"theme": theme, "count": count} for theme, count in themes.most_common(5)],
+            "churn": compute_churn_indicators(rows, insights.get("trend", "insufficient_data"))
         }
 
     except Exception as e:
-        print(f"Error querying sentiment trends: {e}")
+        print(f"Error querying customer insights: {e}")
         return {
             "error": str(e),
+            "customer_id": customer_id,
             "timeframe": timeframe
         }
 
 
+# Materialized reports: gzip-compressed JSON under reports/, indexed by a manifest
+# that maps each normalized criteria hash to its latest report and data watermark
+REPORT_PREFIX = 'reports/'
+REPORT_MANIFEST_KEY = f'{REPORT_PREFIX}manifest.json'
+REPORT_MAX_AGE_SECONDS = int(os.getenv('REPORT_MAX_AGE_SECONDS', '3600'))
+REPORT_MANIFEST_MAX_ENTRIES = int(os.getenv('REPORT_MANIFEST_MAX_ENTRIES', '200'))
+REPORT_MANIFEST_MAX_ATTEMPTS = 5
+
+# Delta reads start this far before the previous watermark, so rows stamped
+# just before it but written just after are not missed
+REPORT_DELTA_OVERLAP = timedelta(minutes=5)
+
+
+def normalize_criteria(criteria: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize report criteria so equivalent requests share one report.
+
+    Args:
+        criteria: Report criteria as given by the caller
+
+    Returns:
+        Criteria with lower-cased keys and stripped string values (identifiers
+        such as customer_id keep their case), empty values dropped and the
+        default timeframe filled in
+    """
+    normalized = {}
+    for key, value in criteria.items():
+        if value is None or value == '':
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        normalized[str(key).strip().lower()] = value
+    normalized['timeframe'] = str(normalized.get('timeframe', '30d')).lower()
+    return dict(sorted(normalized.items()))
+
+
+def criteria_hash(normalized: Dict[str, Any]) -> str:
+    """Stable hash identifying normalized report criteria."""
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:24]
+
+
+def get_sentiment_watermark() -> Optional[str]:
+    """
+    Get the analysis timestamp of the most recently analyzed feedback.
+
+    Returns:
+        Newest analysis_timestamp across all labels, or None if there is no data
+    """
+    table = dynamodb.Table(SENTIMENT_TABLE)
+
+    def newest(label: str) -> Optional[str]:
+        response = table.query(
+            IndexName='LabelTimeIndex',
+            KeyConditionExpression='sentiment_label = :label',
+            ProjectionExpression='analysis_timestamp',
+            ExpressionAttributeValues={':label': label},
+            ScanIndexForward=False,
+            Limit=1
+        )
+        items = response.get('Items', [])
+        return items[0]['analysis_timestamp'] if items else None
+
+    with ThreadPoolExecutor(max_workers=len(SENTIMENT_LABELS)) as executor:
+        timestamps = [timestamp for timestamp in executor.map(newest, SENTIMENT_LABELS) if timestamp]
+    return max(timestamps) if timestamps else None
+
+
+def read_gzip_json(key: str) -> Optional[Any]:
+    """Read a gzip-compressed JSON object from the insights bucket (None if missing)."""
+    try:
+        body = s3.get_object(Bucket=INSIGHTS_BUCKET, Key=key)['Body'].read()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(gzip.decompress(body))
+
+
+def write_gzip_json(key: str, value: Any) -> None:
+    """Write a JSON value to the insights bucket, gzip-compressed."""
+    s3.put_object(
+        Bucket=INSIGHTS_BUCKET,
+        Key=key,
+        Body=gzip.compress(json.dumps(value, default=str).encode('utf-8')),
+        ContentType='application/json',
+        ContentEncoding='gzip'
+    )
+
+
+def read_report_manifest() -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Read the report manifest.
+
+    Returns:
+        The manifest ({"reports": {criteria_hash: entry}}) and its ETag (None if it does not exist yet)
+    """
+    try:
+        response = s3.get_object(Bucket=INSIGHTS_BUCKET, Key=REPORT_MANIFEST_KEY)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return {"reports": {}}, None
+        raise
+    return json.loads(response['Body'].read()), response['ETag']
+
+
+def record_report_in_manifest(key: str, entry: Dict[str, Any]) -> None:
+    """
+    Add or replace a manifest entry with a conditional (ETag-checked) write.
+
+    Args:
+        key: Criteria hash of the report
+        entry: Manifest entry for the report
+    """
+    for attempt in range(REPORT_MANIFEST_MAX_ATTEMPTS):
+        manifest, etag = read_report_manifest()
+        reports = manifest.setdefault('reports', {})
+        reports[key] = entry
+        if len(reports) > REPORT_MANIFEST_MAX_ENTRIES:
+            newest = sorted(reports.items(), key=lambda item: item[1].get('generated_at', ''), reverse=True)
+            manifest['reports'] = dict(newest[:REPORT_MANIFEST_MAX_ENTRIES])
+
+        condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+        try:
+            s3.put_object(
+                Bucket=INSIGHTS_BUCKET,
+                Key=REPORT_MANIFEST_KEY,
+                Body=json.dumps(manifest, default=str),
+                ContentType='application/json',
+                **condition
+            )
+            return
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                raise
+            time.sleep(0.1 * (2 ** attempt))
+
+    print(f"Report manifest kept changing; entry {key} not recorded")
+
+
+def build_report_series(
+    normalized: Dict[str, Any],
+    entry: Optional[Dict[str, Any]],
+    start: datetime,
+    end: datetime
+) -> Tuple[Dict[str, List[Any]], str]:
+    """
+    Build the sentiment series a report is computed from, reusing the previous report's series.
+
+    With a previous series for the same criteria, only rows analyzed since its
+    watermark are read and rows that left the timeframe are dropped.
+    Otherwise the whole timeframe is read.
+
+    Args:
+        normalized: Normalized report criteria
+        entry: Previous manifest entry for the criteria, if any
+        start: Start of the report timeframe
+        end: End of the report timeframe
+
+    Returns:
+        The series ({feedback_id: [analysis_timestamp, score]}) and its data source
+    """
+    days = parse_timeframe_days(normalized['timeframe'])
+    if days > ANALYTICS_EXPORT_MIN_DAYS:
+        items = read_exported_sentiment(start, end)
+        if items is not None:
+            return {item['feedback_id']: [item['analysis_timestamp'], float(item['sentiment_score'])]
+                    for item in items}, 'analytics_export'
+
+    series = None
+    if entry and entry.get('watermark') and entry.get('data_source') == 'sentiment_index':
+        series = read_gzip_json(entry['series_key'])
+
+    start_iso = start.isoformat()
+    if series is None:
+        series, since = {}, start
+    else:
+        series = {feedback_id: point for feedback_id, point in series.items() if point[0] >= start_iso}
+        since = max(start, datetime.fromisoformat(entry['watermark']) - REPORT_DELTA_OVERLAP)
+
+    # Re-analyzed feedback replaces its earlier point
+    for item in query_sentiment_range(since, end):
+        series[item['feedback_id']] = [item['analysis_timestamp'], float(item['sentiment_score'])]
+    return series, 'sentiment_index'
+
+
 @tool
 def generate_report(criteria: Dict[str, Any]) -> str:
     """
     Generate insights report based on specified criteria.
 
+    Reports are materialized per normalized criteria and data watermark: an
+    identical request with no newer sentiment data returns the existing
+    report, and a rebuild reads only the rows analyzed since the last one.
+
     Args:
         criteria: Dictionary containing report criteria (timeframe, customer_id, etc.)
 
@@ -280,31 +1258,59 @@ def generate_report(criteria: Dict[str, Any]) -> str:
         report_id: The generated report ID stored in S3
     """
     try:
-        # Get sentiment data based on criteria
-        timeframe = criteria.get('timeframe', '30d')
-        customer_id = criteria.get('customer_id')
-
-        trends_data = query_sentiment_trends(timeframe)
-
-        # Generate report content
+        normalized = normalize_criteria(criteria)
+        key = criteria_hash(normalized)
+        watermark = get_sentiment_watermark()
+
+        manifest, _ = read_report_manifest()
+        entry = manifest.get('reports', {}).get(key)
+        if entry and entry.get('watermark') == watermark:
+            generated_at = datetime.fromisoformat(entry['generated_at'])
+            if (datetime.utcnow() - generated_at).total_seconds() < REPORT_MAX_AGE_SECONDS:
+                print(f"Reusing report {entry['report_id']} for criteria {key}")
+                return entry['report_id']
+
+        end_date = datetime.utcnow()
+        if normalized.get('customer_id'):
+            # Customer reports read only that customer's rows; there is no shared series to reuse
+            series, data_source = None, 'customer_index'
+            trends_data = query_customer_insights(str(normalized['customer_id']), normalized['timeframe'])
+        else:
+            start_date = end_date - timedelta(days=parse_timeframe_days(normalized['timeframe']))
+            series, data_source = build_report_series(normalized, entry, start_date, end_date)
+            items = [
+                {"analysis_timestamp": timestamp, "sentiment_score": score}
+                for timestamp, score in series.values()
+            ]
+            trends_data = summarize_sentiment_items(normalized['timeframe'], items, data_source)
+
+        # Same criteria and watermark always map to the same report ID
+        report_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"insightmodai-report:{key}:{watermark}"))
         report_content = {
-            "report_id": str(uuid.uuid4()),
-            "generated_at": datetime.utcnow().isoformat(),
-            "criteria": criteria,
+            "report_id": report_id,
+            "generated_at": end_date.isoformat(),
+            "criteria": normalized,
+            "data_watermark": watermark,
             "insights": trends_data,
             "recommendations": generate_recommendations(trends_data)
         }
 
-        # Store report in S3
-        report_id = report_content["report_id"]
-        report_key = f"reports/{report_id}.json"
-
-        s3.put_object(
-            Bucket=INSIGHTS_BUCKET,
-            Key=report_key,
-            Body=json.dumps(report_content, indent=2, default=str),
-            ContentType='application/json'
-        )
+        report_key = f"{REPORT_PREFIX}{report_id}.json.gz"
+        series_key = f"{REPORT_PREFIX}series/{key}.json.gz"
+        write_gzip_json(report_key, report_content)
+        if series is not None and data_source == 'sentiment_index':
+            write_gzip_json(series_key, series)
+
+        record_report_in_manifest(key, {
+            "report_id": report_id,
+            "report_key": report_key,
+            "series_key": series_key,
+            "criteria": normalized,
+            "watermark": watermark,
+            "data_source": data_source,
+            "generated_at": report_content["generated_at"],
+            "total_analyses": trends_data.get("total_analyses", 0)
+        })
 
         return report_id
 
@@ -313,6 +1319,22 @@ def generate_report(criteria: Dict[str, Any]) -> str:
         raise
 
 
+@tool
+def list_reports() -> List[Dict[str, Any]]:
+    """
+    List materialized reports from the report manifest.
+
+    Returns:
+        Manifest entries (report_id, report_key, criteria, watermark, generated_at), newest first
+    """
+    try:
+        manifest, _ = read_report_manifest()
+        return sorted(manifest.get('reports', {}).values(), key=lambda entry: entry.get('generated_at', ''), reverse=True)
+    except Exception as e:
+        print(f"Error listing reports: {e}")
+        return []
+
+
 @tool
 def call_crm_api(action: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -327,10 +1349,7 @@ def call_crm_api(action: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """
     try:
         # Check if CRM integration is enabled
-        config_table = dynamodb.Table(CONFIG_TABLE)
-        response = config_table.get_item(Key={'config_key': 'crm_enabled'})
-
-        if response.get('Item', {}).get('config_value') != 'true':
+        if get_config().get('crm_enabled') != 'true':
             return {"message": "CRM integration disabled", "action": action}
 
         # Get CRM configuration
@@ -381,6 +1400,12 @@ def generate_recommendations(trends_data: Dict[str, Any]) -> List[str]:
     elif trend == "improving":
         recommendations.append("📈 Sentiment is improving! Continue current positive practices.")
 
+    churn = trends_data.get('churn') or {}
+    if churn.get('churn_risk_level') == "high":
+        recommendations.append(f"🚨 High churn risk (score {churn.get('churn_risk_score')}): prioritize outreach and resolve the {churn.get('open_issues', 0)} open issue(s).")
+    elif churn.get('churn_risk_level') == "medium":
+        recommendations.append("👀 Moderate churn risk: follow up on recent negative feedback before it escalates.")
+
     if total_analyses < 10:
         recommendations.append("📊 Limited data available. Increase feedback collection to improve insights accuracy.")
 
@@ -389,24 +1414,13 @@ def generate_recommendations(trends_data: Dict[str, Any]) -> List[str]:
 
 def get_crm_config() -> Optional[Dict[str, str]]:
     """
-    Get CRM configuration from DynamoDB.
+    Get CRM configuration from the cached config snapshot.
 
     Returns:
         Dictionary containing CRM configuration or None if not configured
     """
     try:
-        config_table = dynamodb.Table(CONFIG_TABLE)
-
-        # Scan for CRM-related config
-        response = config_table.scan(
-            FilterExpression='begins_with(config_key, :prefix)',
-            ExpressionAttributeValues={':prefix': 'crm_'}
-        )
-
-        config = {}
-        for item in response.get('Items', []):
-            config[item['config_key']] = item['config_value']
-
+        config = {key: value for key, value in get_config().items() if key.startswith('crm_')}
         return config if config else None
 
     except Exception as e:
@@ -465,9 +1479,12 @@ agent = Agent(
     model=bedrock_model,
     tools=[
         analyze_sentiment,
+        analyze_sentiment_batch,
         store_feedback,
         query_sentiment_trends,
+        query_customer_insights,
         generate_report,
+        list_reports,
         call_crm_api
     ],
     system_prompt="""
@@ -494,6 +1511,9 @@ async def insights_agent_fallback(payload: Dict[str, Any]) -> Dict[str, Any]:
     Provides basic sentiment analysis using Bedrock directly.
     """
     try:
+        if payload.get('feedback_batch'):
+            return process_feedback_batch(payload)
+
         user_input = payload.get('prompt', '')
         feedback_id = payload.get('feedback_id')
 
@@ -543,6 +1563,10 @@ async def insights_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         return await insights_agent_fallback(payload)
 
     try:
+        # Batched stream processing bypasses the conversational agent loop
+        if payload.get('feedback_batch'):
+            return process_feedback_batch(payload)
+
         # Extract input data
         user_input = payload.get('prompt', '')
         feedback_id = payload.get('feedback_id')
@@ -552,19 +1576,20 @@ async def insights_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         context = payload.get('context', {})
 
         # Retrieve memories from AgentCore if available
+        memory_id = get_memory_id()
         memory_context = ""
-        if MEMORY_ID:
+        if memory_id:
             try:
                 # Retrieve session summaries
                 session_memories = memory_client.retrieve_memories(
-                    memory_id=MEMORY_ID,
+                    memory_id=memory_id,
                     namespace=f"/summaries/{customer_id}/{session_id}",
                     query=f"Previous interactions with customer {customer_id}"
                 )
                 
                 # Retrieve semantic facts about the customer
                 fact_memories = memory_client.retrieve_memories(
-                    memory_id=MEMORY_ID,
+                    memory_id=memory_id,
                     namespace=f"/facts/{customer_id}",
                     query=f"Known facts and preferences for customer {customer_id}"
                 )
@@ -581,6 +1606,9 @@ async def insights_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
                             memory_context += f"  • {mem.get('content', '')}\n"
             except Exception as e:
                 print(f"Warning: Could not retrieve memories: {e}")
+                if 'ResourceNotFound' in str(e):
+                    # Memory was recreated under a new ID - refresh on next call
+                    invalidate_parameter(MEMORY_ID_PARAMETER)
 
         # Build enhanced prompt with context
         enhanced_prompt = f"""
@@ -612,10 +1640,10 @@ async def insights_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
         response_text = response.message['content'][0]['text']
 
         # Store conversation in AgentCore Memory
-        if MEMORY_ID:
+        if memory_id:
             try:
                 memory_client.create_event(
-                    memory_id=MEMORY_ID,
+                    memory_id=memory_id,
                     actor_id=customer_id,
                     session_id=session_id,
                     messages=[
@@ -635,7 +1663,7 @@ async def insights_agent(payload: Dict[str, Any]) -> Dict[str, Any]:
             "customer_id": customer_id,
             "timestamp": datetime.utcnow().isoformat(),
             "model_used": model_id,
-            "memory_enabled": MEMORY_ID is not None,
+            "memory_enabled": memory_id is not None,
             "tools_used": [tool.__name__ for tool in agent.tools if hasattr(tool, '__name__')]
         }
 
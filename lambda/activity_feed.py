@@ -0,0 +1,110 @@
+"""
+Capped recent-activity feed in the metrics table.
+
+The latest ACTIVITY_FEED_SIZE ingestion and analysis events are kept
+newest-first in a single item per feed ('activity#all' and, optionally,
+'activity#channel#<channel>'). The metrics aggregator merges each stream
+batch's events in with a version-checked put; events are keyed by type and
+feedback_id so a retried batch does not add duplicates. Reading a feed is a
+single GetItem.
+"""
+
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_table, table_name
+from dynamodb_utils import backoff_delay, from_dynamodb, to_dynamodb
+
+ACTIVITY_FEED_SIZE = int(os.environ.get('ACTIVITY_FEED_SIZE', '25'))
+ACTIVITY_FEED_PER_CHANNEL = os.environ.get('ACTIVITY_FEED_PER_CHANNEL', 'true').lower() == 'true'
+ACTIVITY_FEED_MAX_ATTEMPTS = int(os.environ.get('ACTIVITY_FEED_MAX_ATTEMPTS', '5'))
+
+
+def feed_key(channel=None):
+    """Metric key of the global feed or a per-channel feed."""
+    return f'activity#channel#{channel}' if channel else 'activity#all'
+
+
+def feedback_event(item):
+    """Activity event for an ingested feedback record."""
+    return {
+        'event_id': f"received#{item['feedback_id']}",
+        'type': 'feedback_received',
+        'feedback_id': item['feedback_id'],
+        'timestamp': item.get('timestamp') or '',
+        'channel': item.get('channel'),
+        'description': f"Feedback {item['feedback_id']} received from {item.get('source', 'unknown')}"
+    }
+
+
+def analysis_event(item):
+    """Activity event for a stored sentiment analysis."""
+    return {
+        'event_id': f"analyzed#{item['feedback_id']}",
+        'type': 'feedback_analyzed',
+        'feedback_id': item['feedback_id'],
+        'timestamp': item.get('analysis_timestamp') or '',
+        'channel': item.get('channel'),
+        'description': f"Feedback {item['feedback_id']} analyzed as {item.get('sentiment_label', 'unknown')} "
+                       f"({item.get('model_used', 'unknown')})"
+    }
+
+
+def merge_events(existing, events, limit=ACTIVITY_FEED_SIZE):
+    """Merge events into a feed, newest first, dropping duplicates and capping the size."""
+    merged = {event['event_id']: event for event in existing}
+    for event in events:
+        merged[event['event_id']] = event
+    return sorted(merged.values(), key=lambda event: event['timestamp'], reverse=True)[:limit]
+
+
+def append_events(events):
+    """Merge a batch of events into the global feed and their channel feeds."""
+    feeds = {feed_key(): events}
+    if ACTIVITY_FEED_PER_CHANNEL:
+        for event in events:
+            if event.get('channel'):
+                feeds.setdefault(feed_key(event['channel']), []).append(event)
+
+    for key, feed_events in feeds.items():
+        _merge_into_feed(key, feed_events)
+
+
+def _merge_into_feed(key, events):
+    """Version-checked read-merge-write of one feed item."""
+    table = get_table(table_name('metrics'))
+
+    for attempt in range(ACTIVITY_FEED_MAX_ATTEMPTS):
+        item = table.get_item(Key={'metric_key': key, 'shard_id': 0}, ConsistentRead=True).get('Item')
+        feed = from_dynamodb(item) if item else {'events': [], 'version': 0}
+        merged = merge_events(feed['events'], events)
+        if merged == feed['events']:
+            return
+
+        condition = {
+            'ConditionExpression': 'version = :version',
+            'ExpressionAttributeValues': {':version': feed['version']}
+        } if item else {'ConditionExpression': 'attribute_not_exists(metric_key)'}
+        try:
+            table.put_item(Item=to_dynamodb({
+                'metric_key': key,
+                'shard_id': 0,
+                'events': merged,
+                'version': feed['version'] + 1,
+                'updated_at': int(time.time())
+            }), **condition)
+            return
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            time.sleep(backoff_delay(attempt))
+
+    raise RuntimeError(f'Activity feed {key} update kept conflicting after {ACTIVITY_FEED_MAX_ATTEMPTS} attempts')
+
+
+def read_feed(channel=None, limit=10):
+    """Read the newest events of a feed with one GetItem."""
+    item = get_table(table_name('metrics')).get_item(Key={'metric_key': feed_key(channel), 'shard_id': 0}).get('Item')
+    return from_dynamodb(item)['events'][:limit] if item else []
@@ -1,10 +1,11 @@
 import json
-import boto3
 import os
 import zipfile
 import tempfile
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client
+
 def lambda_handler(event, context):
     """Custom CloudFormation resource for AgentCore Runtime deployment."""
     try:
@@ -27,7 +28,7 @@ def create_agent_runtime(event, context):
     """Create AgentCore Runtime."""
     try:
         # Get ECR repository URI
-        ecr_client = boto3.client('ecr')
+        ecr_client = get_client('ecr')
         repo_response = ecr_client.describe_repositories(repositoryNames=[f'insightmodai-agent-{os.environ["ENVIRONMENT"]}'])
         repository_uri = repo_response['repositories'][0]['repositoryUri']
 
@@ -40,7 +41,7 @@ def create_agent_runtime(event, context):
         image_uri = f'{repository_uri}:{latest_image["imageTag"] or "latest"}'
 
         # Create AgentCore Runtime
-        agentcore_client = boto3.client('bedrock-agentcore')
+        agentcore_client = get_client('bedrock-agentcore')
         runtime_response = agentcore_client.create_agent_runtime(
             agentRuntimeName=f'insightmodai-agent-{os.environ["ENVIRONMENT"]}',
             agentRuntimeArtifact={
@@ -55,7 +56,7 @@ def create_agent_runtime(event, context):
         runtime_arn = runtime_response['agentRuntimeArn']
 
         # Store ARN in SSM Parameter Store
-        ssm = boto3.client('ssm')
+        ssm = get_client('ssm')
         ssm.put_parameter(
             Name=f'/insightmodai/agent-runtime-arn-{os.environ["ENVIRONMENT"]}',
             Value=runtime_arn,
@@ -89,12 +90,12 @@ def delete_agent_runtime(event, context):
     try:
         physical_resource_id = event.get('PhysicalResourceId', '')
         if physical_resource_id:
-            agentcore_client = boto3.client('bedrock-agentcore')
+            agentcore_client = get_client('bedrock-agentcore')
             # Note: delete_agent_runtime API may not be available yet
             # agentcore_client.delete_agent_runtime(agentRuntimeArn=physical_resource_id)
 
         # Clean up SSM parameter
-        ssm = boto3.client('ssm')
+        ssm = get_client('ssm')
         try:
             ssm.delete_parameter(Name=f'/insightmodai/agent-runtime-arn-{os.environ["ENVIRONMENT"]}')
         except ssm.exceptions.ParameterNotFound:
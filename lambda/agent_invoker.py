@@ -1,8 +1,38 @@
 import json
-import boto3
 import uuid
 import os
-from botocore.exceptions import ClientError
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+from aws_clients import get_client, get_table, table_name, get_call_counts
+from parameter_store import get_parameter, invalidate_parameter, agent_runtime_arn_parameter
+from config_client import get_config
+from dynamodb_utils import BatchWriter, to_dynamodb
+from sentiment_cache import sentiment_cache, sentiment_cache_key
+from customer_profiles import get_profile, update_profiles
+from processing_state import CLAIM_ACQUIRED, CLAIM_HELD, claim, release, complete
+from latency_histogram import stage_durations
+from sentiment_triage import (
+    triage_feedback, DEFAULT_NEGATIVE_THRESHOLD, DEFAULT_POSITIVE_THRESHOLD, DEFAULT_MIN_CONFIDENCE
+)
+
+# Upper bound on agent invocations in flight for a single stream batch
+MAX_CONCURRENT_INVOCATIONS = int(os.environ.get('MAX_CONCURRENT_INVOCATIONS', '5'))
+
+# Send a whole stream batch to the agent in a single runtime invocation
+AGENT_BATCH_MODE = os.environ.get('AGENT_BATCH_MODE', 'false').lower() == 'true'
+
+# Agent invocation errors worth retrying through the stream instead of falling back to the rating
+RETRYABLE_ERROR_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException',
+    'ServiceUnavailableException', 'InternalServerException', 'InternalFailure',
+    'ModelTimeoutException', 'RequestTimeout', 'RequestTimeoutException'
+}
+
+# Processing claims are owned per trigger path so each path's own retries can resume
+STREAM_CLAIM_OWNER = 'stream'
+DIRECT_CLAIM_OWNER = 'direct'
 
 def lambda_handler(event, context):
     """Invoke AgentCore Runtime for feedback processing."""
@@ -15,12 +45,38 @@ def lambda_handler(event, context):
             print(f"Processing DynamoDB stream with {len(event['Records'])} records")
             return process_dynamodb_stream(event, context)
 
+        # Feedback submitted through POST /feedback/batch
+        if 'feedback_batch' in event:
+            return process_direct_batch(event['feedback_batch'])
+
         # Handle direct invocation (backward compatibility)
         print("Processing direct invocation")
         feedback_id = event.get('feedback_id')
         feedback_data = event.get('feedback_data', {})
+        feedback_data['timings'] = {
+            'ingested_at_ms': feedback_data.get('ingested_at_ms'),
+            'received_at_ms': now_ms()
+        }
+
+        if feedback_id and claim(feedback_id, DIRECT_CLAIM_OWNER) != CLAIM_ACQUIRED:
+            print(f"Feedback {feedback_id} is already processed or in progress, skipping")
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'feedback_id': feedback_id, 'status': 'duplicate_skipped'})
+            }
 
-        result = process_single_feedback(feedback_id, feedback_data)
+        try:
+            result = process_single_feedback(feedback_id, feedback_data)
+            sentiment_cache.flush()
+        except Exception:
+            release(feedback_id, DIRECT_CLAIM_OWNER)
+            raise
+
+        if feedback_id:
+            if result.get('status'):
+                complete([feedback_id], DIRECT_CLAIM_OWNER)
+            else:
+                release(feedback_id, DIRECT_CLAIM_OWNER)
 
         return {
             'statusCode': 200 if 'error' not in result else 400,
@@ -31,7 +87,64 @@ def lambda_handler(event, context):
         print(f"Error invoking agent: {e}")
         import traceback
         print(f"Traceback: {traceback.format_exc()}")
-        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+        response = {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
+        if isinstance(event, dict) and 'Records' in event:
+            # Report the whole batch as failed so the stream retries it
+            response['batchItemFailures'] = [
+                {'itemIdentifier': record['dynamodb']['SequenceNumber']}
+                for record in event['Records']
+                if record.get('dynamodb', {}).get('SequenceNumber')
+            ]
+        return response
+
+def process_direct_batch(entries):
+    """Process a list of {feedback_id, feedback_data} handed over by the batch API.
+
+    Each item is claimed like a single direct invocation; sentiment rows are
+    buffered and written with BatchWriteItem once for the whole list. Items
+    that fail are released; the stream keeps retrying records whose claim is
+    held here, so it picks them up once released.
+    """
+    sentiment_writer = BatchWriter(table_name('sentiment-analysis'))
+    results, claimed_ids = [], []
+    received_at_ms = now_ms()
+
+    for entry in entries:
+        feedback_id = entry.get('feedback_id')
+        feedback_data = entry.get('feedback_data', {})
+        feedback_data['timings'] = {
+            'ingested_at_ms': feedback_data.get('ingested_at_ms'),
+            'received_at_ms': received_at_ms
+        }
+        if not feedback_id or claim(feedback_id, DIRECT_CLAIM_OWNER) != CLAIM_ACQUIRED:
+            results.append({'feedback_id': feedback_id, 'status': 'duplicate_skipped'})
+            continue
+        claimed_ids.append(feedback_id)
+        try:
+            results.append(process_single_feedback(feedback_id, feedback_data, sentiment_writer))
+        except Exception as e:
+            print(f"Error processing feedback {feedback_id}: {e}")
+            results.append({'feedback_id': feedback_id, 'error': str(e)})
+
+    pending_items = sentiment_writer.pending()
+    unwritten_ids = {item['feedback_id'] for item in sentiment_writer.flush()}
+    sentiment_cache.flush()
+    failed_customers = set(update_profiles([item for item in pending_items if item['feedback_id'] not in unwritten_ids]))
+    failed_ids = unwritten_ids | {item['feedback_id'] for item in pending_items if item.get('customer_id') in failed_customers}
+
+    processed_ids = {result['feedback_id'] for result in results if result.get('status')}
+    done_ids = [feedback_id for feedback_id in claimed_ids
+                if feedback_id in processed_ids and feedback_id not in failed_ids]
+    complete(done_ids, DIRECT_CLAIM_OWNER)
+    for feedback_id in claimed_ids:
+        if feedback_id not in done_ids:
+            release(feedback_id, DIRECT_CLAIM_OWNER)
+
+    print(f"Processed {len(done_ids)}/{len(entries)} feedback items from a batch submission")
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'processed': len(done_ids), 'results': results})
+    }
 
 def get_recent_sentiments(customer_id):
     """Get recent sentiment history for context."""
@@ -39,90 +152,447 @@ def get_recent_sentiments(customer_id):
         return []
 
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-sentiment-analysis-{os.environ["ENVIRONMENT"]}')
-
-        response = table.query(
-            IndexName='CustomerIndex',
-            KeyConditionExpression='customer_id = :cid',
-            ExpressionAttributeValues={':cid': customer_id},
-            ScanIndexForward=False,
-            Limit=5
-        )
+        # One GetItem on the materialized profile instead of a history query
+        profile = get_profile(customer_id)
+        if not profile:
+            return []
 
         return [
             {
-                'sentiment_score': item['sentiment_score'],
-                'analysis_timestamp': item['analysis_timestamp'],
-                'sentiment_label': item.get('sentiment_label', 'unknown')
+                'sentiment_score': entry['sentiment_score'],
+                'analysis_timestamp': entry['analysis_timestamp'],
+                'sentiment_label': entry.get('sentiment_label', 'unknown')
             }
-            for item in response.get('Items', [])
+            for entry in profile.get('recent', [])[:5]
         ]
     except Exception as e:
         print(f"Error getting recent sentiments: {e}")
         return []
 
 def process_dynamodb_stream(event, context):
-    """Process DynamoDB stream events from feedback table."""
+    """Process DynamoDB stream events from feedback table.
+
+    Records are first claimed in the processing-state table so feedback the
+    direct invoke path already handled is skipped. In batch mode the whole
+    stream batch is sent to the agent in a single runtime invocation; otherwise (or if that invocation fails) records are
+    fanned out over a bounded thread pool. Sentiment results are buffered and
+    flushed with BatchWriteItem at the end of the batch. Records that fail
+    (including results that could not be written) are returned as
+    batchItemFailures so only they are retried, not the whole shard.
+    """
     results = []
-    
-    for record in event['Records']:
-        if record['eventName'] == 'INSERT':
-            try:
-                # Extract new feedback from stream
-                new_image = record['dynamodb']['NewImage']
-                
-                feedback_id = new_image.get('feedback_id', {}).get('S')
-                feedback_text = new_image.get('feedback_text', {}).get('S')
-                customer_id = new_image.get('customer_id', {}).get('S')
-                channel = new_image.get('channel', {}).get('S')
-                rating = new_image.get('rating', {}).get('N')
-                
-                # Build feedback data object
-                feedback_data = {
-                    'feedback_text': feedback_text,
-                    'customer_id': customer_id,
-                    'channel': channel,
-                    'rating': int(rating) if rating else None
-                }
-                
-                print(f"Processing feedback from stream: {feedback_id}")
-                
-                # Process the feedback
-                result = process_single_feedback(feedback_id, feedback_data)
-                results.append(result)
-                
-            except Exception as e:
-                print(f"Error processing stream record: {e}")
-                # Continue processing other records
-                continue
-    
+    failed_sequence_numbers = []
+    sentiment_writer = BatchWriter(table_name('sentiment-analysis'))
+
+    insert_records = [record for record in event['Records'] if record['eventName'] == 'INSERT']
+
+    # Stream receipt time, carried on each record into its latency stage timings
+    received_at_ms = now_ms()
+    for record in insert_records:
+        record['received_at_ms'] = received_at_ms
+
+    # Skip feedback already analyzed through the direct invoke path; retry feedback it is still analyzing
+    insert_records, skipped_results, unclaimed_sequence_numbers = claim_records(insert_records)
+    results.extend(skipped_results)
+    failed_sequence_numbers.extend(unclaimed_sequence_numbers)
+
+    # Answer repeated feedback straight from the sentiment cache
+    records, cached_results = apply_cached_sentiments(insert_records, sentiment_writer)
+    results.extend(cached_results)
+
+    # Store clearly positive/negative feedback locally; only the rest goes to the agent
+    records, triaged_results = apply_local_triage(records, sentiment_writer)
+    results.extend(triaged_results)
+
+    batch_processed = False
+    if AGENT_BATCH_MODE and len(records) > 1:
+        try:
+            feedback_items = [parse_stream_record(record) for record in records]
+            customer_ids = {data.get('customer_id') for _, data in feedback_items if data.get('customer_id')}
+            customer_context = {customer_id: get_recent_sentiments(customer_id) for customer_id in customer_ids}
+            results.extend(process_feedback_batch(feedback_items, sentiment_writer, customer_context))
+            batch_processed = True
+        except Exception as e:
+            print(f"Batched agent invocation failed, falling back to per-customer processing: {e}")
+
+    if records and not batch_processed:
+        # One unit of work per customer so bursts share one history lookup and one agent call
+        groups = group_records_by_customer(records)
+        max_workers = max(1, min(MAX_CONCURRENT_INVOCATIONS, len(groups)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(process_record_group, group, sentiment_writer): group
+                for group in groups
+            }
+
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    results.extend(future.result())
+                except Exception as e:
+                    sequence_numbers = [record['dynamodb'].get('SequenceNumber') for record in group]
+                    print(f"Error processing stream records {sequence_numbers}: {e}")
+                    failed_sequence_numbers.extend(sequence_numbers)
+
+    # Flush buffered sentiment rows; records whose rows were not written get retried
+    pending_items = sentiment_writer.pending()
+    unwritten_ids = {item['feedback_id'] for item in sentiment_writer.flush()}
+    sentiment_cache.flush()
+
+    # Fold the rows that were written into the customer profiles; a retried
+    # record rewrites the same row and is skipped by the profile if already applied
+    failed_customers = set(update_profiles([item for item in pending_items if item['feedback_id'] not in unwritten_ids]))
+
+    for record in insert_records:
+        new_image = record['dynamodb']['NewImage']
+        feedback_id = new_image.get('feedback_id', {}).get('S')
+        customer_id = new_image.get('customer_id', {}).get('S')
+        sequence_number = record['dynamodb'].get('SequenceNumber')
+        if (feedback_id in unwritten_ids or customer_id in failed_customers) and sequence_number not in failed_sequence_numbers:
+            failed_sequence_numbers.append(sequence_number)
+
+    # Finished records are marked done; failed ones go back to pending for the retry
+    done_ids, released_ids = [], []
+    for record in insert_records:
+        feedback_id = record['dynamodb']['NewImage'].get('feedback_id', {}).get('S')
+        if record['dynamodb'].get('SequenceNumber') in failed_sequence_numbers:
+            released_ids.append(feedback_id)
+        else:
+            done_ids.append(feedback_id)
+    complete(done_ids, STREAM_CLAIM_OWNER)
+    for feedback_id in released_ids:
+        release(feedback_id, STREAM_CLAIM_OWNER)
+
+    batch_item_failures = [{'itemIdentifier': sequence_number} for sequence_number in failed_sequence_numbers]
+
+    print(f"AWS API calls in this container: {get_call_counts()}")
+    print(f"Sentiment cache stats: {sentiment_cache.stats()}")
+
     return {
         'statusCode': 200,
         'body': json.dumps({
             'processed': len(results),
+            'failed': len(batch_item_failures),
+            'cache': sentiment_cache.stats(),
             'results': results
-        })
+        }),
+        'batchItemFailures': batch_item_failures
+    }
+
+def claim_records(records):
+    """Claim stream records for processing.
+
+    Returns the claimed records, results for records already processed, and
+    the sequence numbers to retry: records still held by the direct path
+    (it may yet fail and release them) and records whose claim errored.
+    """
+    claimed, skipped, failed = [], [], []
+    for record in records:
+        feedback_id = record['dynamodb']['NewImage'].get('feedback_id', {}).get('S')
+        if not feedback_id:
+            continue
+        try:
+            outcome = claim(feedback_id, STREAM_CLAIM_OWNER)
+        except Exception as e:
+            print(f"Error claiming feedback {feedback_id}: {e}")
+            failed.append(record['dynamodb'].get('SequenceNumber'))
+            continue
+
+        if outcome == CLAIM_ACQUIRED:
+            claimed.append(record)
+        elif outcome == CLAIM_HELD:
+            failed.append(record['dynamodb'].get('SequenceNumber'))
+        else:
+            skipped.append({'feedback_id': feedback_id, 'status': 'duplicate_skipped'})
+
+    if skipped:
+        print(f"Skipped {len(skipped)}/{len(records)} records already processed")
+    if failed:
+        print(f"Retrying {len(failed)}/{len(records)} records held by the direct path or not claimable")
+    return claimed, skipped, failed
+
+def parse_stream_record(record):
+    """Extract (feedback_id, feedback_data) from a stream INSERT record."""
+    new_image = record['dynamodb']['NewImage']
+
+    feedback_id = new_image.get('feedback_id', {}).get('S')
+    feedback_text = new_image.get('feedback_text', {}).get('S')
+    customer_id = new_image.get('customer_id', {}).get('S')
+    channel = new_image.get('channel', {}).get('S')
+    rating = new_image.get('rating', {}).get('N')
+    priority = new_image.get('metadata', {}).get('M', {}).get('priority', {}).get('S')
+    ingested_at_ms = new_image.get('ingested_at_ms', {}).get('N')
+
+    # Build feedback data object
+    feedback_data = {
+        'feedback_text': feedback_text,
+        'customer_id': customer_id,
+        'channel': channel,
+        'rating': int(rating) if rating else None,
+        'priority': priority,
+        'timings': {
+            'ingested_at_ms': int(ingested_at_ms) if ingested_at_ms else None,
+            'received_at_ms': record.get('received_at_ms')
+        }
+    }
+
+    return feedback_id, feedback_data
+
+def process_stream_record(record, sentiment_writer=None):
+    """Extract feedback from a stream INSERT record and process it."""
+    feedback_id, feedback_data = parse_stream_record(record)
+
+    print(f"Processing feedback from stream: {feedback_id}")
+
+    # The stream path has already applied the sentiment cache and local triage
+    return process_single_feedback(feedback_id, feedback_data, sentiment_writer, prefiltered=True)
+
+def group_records_by_customer(records):
+    """Group stream records by customer_id, preserving stream order.
+
+    Records without a customer_id each form their own group.
+    """
+    groups = {}
+    for record in records:
+        customer_id = record['dynamodb']['NewImage'].get('customer_id', {}).get('S')
+        key = ('customer', customer_id) if customer_id else ('record', record['dynamodb'].get('SequenceNumber'))
+        groups.setdefault(key, []).append(record)
+    return list(groups.values())
+
+def process_record_group(group, sentiment_writer=None):
+    """Process the records of one customer with a single history lookup and agent call."""
+    if len(group) == 1:
+        return [process_stream_record(group[0], sentiment_writer)]
+
+    feedback_items = [parse_stream_record(record) for record in group]
+    customer_id = feedback_items[0][1].get('customer_id')
+    print(f"Coalescing {len(group)} feedback items from customer {customer_id}")
+
+    customer_context = {customer_id: get_recent_sentiments(customer_id)}
+    try:
+        return process_feedback_batch(feedback_items, sentiment_writer, customer_context)
+    except Exception as e:
+        print(f"Coalesced agent invocation failed for customer {customer_id}, processing individually: {e}")
+        return [
+            process_single_feedback(feedback_id, feedback_data, sentiment_writer, prefiltered=True)
+            for feedback_id, feedback_data in feedback_items
+        ]
+
+def apply_cached_sentiments(records, sentiment_writer=None):
+    """Write sentiment rows for records whose text is already cached.
+
+    Returns the records that still need analysis and the results for the
+    records that were answered from the cache.
+    """
+    parsed = [(record, parse_stream_record(record)) for record in records]
+    keys = {
+        feedback_id: sentiment_cache_key(feedback_data.get('feedback_text'))
+        for _, (feedback_id, feedback_data) in parsed
+        if feedback_id and feedback_data.get('feedback_text')
     }
+    if not keys:
+        return records, []
+
+    hits = sentiment_cache.get_many(list(keys.values()))
+
+    remaining, results = [], []
+    for record, (feedback_id, feedback_data) in parsed:
+        cached = hits.get(keys.get(feedback_id))
+        if cached is None:
+            remaining.append(record)
+            continue
+
+        store_cached_sentiment(feedback_id, cached, sentiment_writer, feedback_data)
+        results.append({'feedback_id': feedback_id, 'sentiment_label': cached.get('sentiment_label'), 'status': 'processed_from_cache'})
+
+    if results:
+        print(f"Answered {len(results)}/{len(records)} records from the sentiment cache")
+    return remaining, results
+
+def load_triage_settings():
+    """Triage thresholds from the cached configuration."""
+    config = get_config()
+    settings = {
+        'local_triage_enabled': config.get('local_triage_enabled', 'true'),
+        'negative_threshold': config.get('negative_threshold', str(DEFAULT_NEGATIVE_THRESHOLD)),
+        'positive_threshold': config.get('positive_threshold', str(DEFAULT_POSITIVE_THRESHOLD)),
+        'triage_min_confidence': config.get('triage_min_confidence', str(DEFAULT_MIN_CONFIDENCE))
+    }
+
+    try:
+        return {
+            'enabled': str(settings['local_triage_enabled']).lower() == 'true',
+            'negative_threshold': float(settings['negative_threshold']),
+            'positive_threshold': float(settings['positive_threshold']),
+            'min_confidence': float(settings['triage_min_confidence'])
+        }
+    except ValueError as e:
+        print(f"Invalid triage settings {settings}: {e}")
+        return {
+            'enabled': False,
+            'negative_threshold': DEFAULT_NEGATIVE_THRESHOLD,
+            'positive_threshold': DEFAULT_POSITIVE_THRESHOLD,
+            'min_confidence': DEFAULT_MIN_CONFIDENCE
+        }
+
+def apply_local_triage(records, sentiment_writer=None, settings=None):
+    """Store sentiment locally for records the triage engine is confident about.
+
+    Returns the records that still need the agent and the results for the
+    records that were resolved locally.
+    """
+    if not records:
+        return records, []
+
+    settings = settings or load_triage_settings()
+    if not settings['enabled']:
+        return records, []
+
+    remaining, results = [], []
+    for record in records:
+        feedback_id, feedback_data = parse_stream_record(record)
+        triage = triage_feedback(
+            feedback_data,
+            negative_threshold=settings['negative_threshold'],
+            positive_threshold=settings['positive_threshold'],
+            min_confidence=settings['min_confidence']
+        )
+        if not feedback_id or triage['route'] != 'local':
+            remaining.append(record)
+            continue
+
+        store_triage_sentiment(feedback_id, triage, sentiment_writer, feedback_data)
+        results.append({'feedback_id': feedback_id, 'sentiment_label': triage['sentiment_label'], 'status': 'processed_locally'})
+
+    if results:
+        print(f"Resolved {len(results)}/{len(records)} records with local triage")
+    return remaining, results
+
+def process_feedback_batch(feedback_items, sentiment_writer=None, customer_context=None):
+    """Analyze a list of (feedback_id, feedback_data) pairs in one agent invocation.
+
+    customer_context maps customer_id to that customer's recent sentiments,
+    fetched once per customer. Items the agent could not analyze fall back to
+    rating-based sentiment.
+    Raises if the invocation itself fails so the caller can fall back to
+    per-record processing.
+    """
+    feedback_items = [(feedback_id, data) for feedback_id, data in feedback_items if feedback_id]
+
+    if not get_parameter(agent_runtime_arn_parameter()):
+        print(f"Agent runtime not deployed, using rating-based sentiment for {len(feedback_items)} items")
+        results = []
+        for feedback_id, feedback_data in feedback_items:
+            store_rating_based_sentiment(feedback_id, feedback_data, sentiment_writer)
+            results.append({'feedback_id': feedback_id, 'status': 'processed_without_agent', 'method': 'rating_based'})
+        return results
+
+    # Generate session ID (33+ characters required)
+    session_id = str(uuid.uuid4()) + str(uuid.uuid4()) + str(uuid.uuid4())
+
+    agent_payload = {
+        'session_id': session_id,
+        'feedback_batch': [
+            {
+                'feedback_id': feedback_id,
+                'feedback_text': feedback_data.get('feedback_text') or '',
+                'customer_id': feedback_data.get('customer_id'),
+                'channel': feedback_data.get('channel')
+            }
+            for feedback_id, feedback_data in feedback_items
+        ],
+        'customer_context': customer_context or {}
+    }
+
+    print(f"Invoking agent once for a batch of {len(feedback_items)} feedback items")
+    for _, feedback_data in feedback_items:
+        mark_timing(feedback_data, 'agent_start_ms')
+    full_response = read_agent_response(invoke_agent_runtime(session_id, agent_payload))
+    for _, feedback_data in feedback_items:
+        mark_timing(feedback_data, 'agent_end_ms')
+    if 'error' in full_response or not isinstance(full_response.get('results'), list):
+        raise RuntimeError(f"Agent batch invocation failed: {full_response.get('error', 'no results')}")
+
+    model_used = full_response.get('model_used')
+    sentiments = {item.get('feedback_id'): item for item in full_response['results'] if isinstance(item, dict)}
+
+    results = []
+    for feedback_id, feedback_data in feedback_items:
+        sentiment = sentiments.get(feedback_id)
+        if not sentiment or sentiment.get('error'):
+            store_rating_based_sentiment(feedback_id, feedback_data, sentiment_writer)
+            results.append({'feedback_id': feedback_id, 'status': 'fallback_to_rating', 'session_id': session_id})
+            continue
+
+        stored = store_structured_sentiment(feedback_id, sentiment, model_used, sentiment_writer, feedback_data)
+        if stored and feedback_data.get('feedback_text'):
+            sentiment_cache.put(sentiment_cache_key(feedback_data['feedback_text']), stored)
+        results.append({
+            'feedback_id': feedback_id,
+            'sentiment_label': sentiment.get('sentiment_label'),
+            'session_id': session_id,
+            'status': 'processed_with_agent_batch'
+        })
+
+    return results
+
+def read_agent_response(response):
+    """Decode an invoke_agent_runtime response body into a dict."""
+    # AgentCore returns the response directly as JSON
+    body = response['response'].read()
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+
+    try:
+        full_response = json.loads(body)
+    except json.JSONDecodeError:
+        # If it's not JSON, treat it as plain text response
+        return {'response': body}
 
-def process_single_feedback(feedback_id, feedback_data):
-    """Process a single feedback item."""
+    return full_response if isinstance(full_response, dict) else {'response': full_response}
+
+def process_single_feedback(feedback_id, feedback_data, sentiment_writer=None, prefiltered=False):
+    """Process a single feedback item.
+
+    When a sentiment_writer is given, the sentiment row is buffered on it
+    instead of being written immediately. Unless prefiltered, the sentiment
+    cache and local triage are consulted before invoking the agent.
+    Transient invocation errors (see is_retryable_error) are raised so the
+    record is retried; other errors fall back to rating-based sentiment.
+    """
     print(f"Processing feedback {feedback_id} with data keys: {list(feedback_data.keys()) if feedback_data else 'None'}")
 
     if not feedback_id:
         print("No feedback_id provided")
         return {'error': 'feedback_id required'}
 
+    feedback_text = feedback_data.get('feedback_text')
+    cache_key = sentiment_cache_key(feedback_text) if feedback_text else None
+    if cache_key and not prefiltered:
+        cached = sentiment_cache.get(cache_key)
+        if cached is not None:
+            store_cached_sentiment(feedback_id, cached, sentiment_writer, feedback_data)
+            return {'feedback_id': feedback_id, 'sentiment_label': cached.get('sentiment_label'), 'status': 'processed_from_cache'}
+
+    if not prefiltered:
+        settings = load_triage_settings()
+        if settings['enabled']:
+            triage = triage_feedback(
+                feedback_data,
+                negative_threshold=settings['negative_threshold'],
+                positive_threshold=settings['positive_threshold'],
+                min_confidence=settings['min_confidence']
+            )
+            if triage['route'] == 'local':
+                store_triage_sentiment(feedback_id, triage, sentiment_writer, feedback_data)
+                return {'feedback_id': feedback_id, 'sentiment_label': triage['sentiment_label'], 'status': 'processed_locally'}
+
     try:
-        # Get agent runtime ARN from SSM
-        ssm = boto3.client('ssm')
-        try:
-            response = ssm.get_parameter(Name=f'/insightmodai/agent-runtime-arn-{os.environ["ENVIRONMENT"]}')
-            agent_runtime_arn = response['Parameter']['Value']
-        except ssm.exceptions.ParameterNotFound:
+        # Get agent runtime ARN from the cached SSM parameters
+        if not get_parameter(agent_runtime_arn_parameter()):
             # Agent not deployed yet - store basic sentiment based on rating
             print(f"Agent runtime not deployed, using rating-based sentiment for {feedback_id}")
-            store_rating_based_sentiment(feedback_id, feedback_data)
+            store_rating_based_sentiment(feedback_id, feedback_data, sentiment_writer)
             return {'feedback_id': feedback_id, 'status': 'processed_without_agent', 'method': 'rating_based'}
         
         # Generate session ID (33+ characters required)
@@ -140,29 +610,17 @@ def process_single_feedback(feedback_id, feedback_data):
         }
         
         # Invoke AgentCore Runtime
-        agentcore_client = boto3.client('bedrock-agentcore')
-        response = agentcore_client.invoke_agent_runtime(
-            agentRuntimeArn=agent_runtime_arn,
-            runtimeSessionId=session_id,
-            payload=json.dumps(agent_payload),
-            qualifier='DEFAULT'
-        )
+        mark_timing(feedback_data, 'agent_start_ms')
+        response = invoke_agent_runtime(session_id, agent_payload)
         
         # Process response from AgentCore Runtime
-        # AgentCore returns the response directly as JSON
-        try:
-            full_response = json.loads(response['response'].read())
-        except (json.JSONDecodeError, KeyError):
-            # Fallback: try to read as text
-            full_response = response['response'].read().decode('utf-8')
-            try:
-                full_response = json.loads(full_response)
-            except json.JSONDecodeError:
-                # If it's not JSON, treat it as plain text response
-                full_response = {'response': full_response}
+        full_response = read_agent_response(response)
+        mark_timing(feedback_data, 'agent_end_ms')
         
         # Store analysis results
-        store_sentiment_analysis(feedback_id, full_response)
+        stored = store_sentiment_analysis(feedback_id, full_response, sentiment_writer, feedback_data)
+        if stored and cache_key and 'error' not in full_response:
+            sentiment_cache.put(cache_key, stored)
         
         return {
             'feedback_id': feedback_id,
@@ -172,17 +630,115 @@ def process_single_feedback(feedback_id, feedback_data):
         }
         
     except Exception as e:
+        if is_retryable_error(e):
+            # Let the caller report the record as failed so the stream retries it
+            print(f"Transient error processing feedback {feedback_id}, not falling back: {e!r}")
+            raise
         print(f"Error processing feedback {feedback_id}: {e}")
         # Fallback to rating-based sentiment
-        store_rating_based_sentiment(feedback_id, feedback_data)
+        store_rating_based_sentiment(feedback_id, feedback_data, sentiment_writer)
         return {'feedback_id': feedback_id, 'error': str(e), 'status': 'fallback_to_rating'}
 
-def store_rating_based_sentiment(feedback_id, feedback_data):
+def is_retryable_error(error):
+    """Whether an agent invocation error is transient (throttling, timeouts, 5xx)."""
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return error.response.get('Error', {}).get('Code') in RETRYABLE_ERROR_CODES or status == 429 or status >= 500
+    return False
+
+def invoke_agent_runtime(session_id, agent_payload):
+    """Invoke the AgentCore Runtime, refreshing the cached ARN once if it is stale."""
+    parameter_name = agent_runtime_arn_parameter()
+    agentcore_client = get_client('bedrock-agentcore')
+
+    for attempt in range(2):
+        agent_runtime_arn = get_parameter(parameter_name)
+        if not agent_runtime_arn:
+            raise RuntimeError(f'Agent runtime ARN parameter {parameter_name} not found')
+
+        try:
+            return agentcore_client.invoke_agent_runtime(
+                agentRuntimeArn=agent_runtime_arn,
+                runtimeSessionId=session_id,
+                payload=json.dumps(agent_payload),
+                qualifier='DEFAULT'
+            )
+        except ClientError as e:
+            error_code = e.response.get('Error', {}).get('Code')
+            if attempt == 0 and error_code in ('ResourceNotFoundException', 'ValidationException'):
+                # The runtime may have been redeployed under a new ARN
+                print(f"Agent runtime call failed with {error_code}, refreshing cached ARN")
+                invalidate_parameter(parameter_name)
+                continue
+            raise
+
+def now_ms():
+    """Current time in epoch milliseconds."""
+    return int(time.time() * 1000)
+
+def mark_timing(feedback_data, mark):
+    """Record a pipeline timestamp (e.g. agent_start_ms) on a feedback item."""
+    if feedback_data is not None:
+        feedback_data.setdefault('timings', {})[mark] = now_ms()
+
+def write_sentiment_item(item, sentiment_writer=None, feedback_data=None):
+    """Write a sentiment row now, or buffer it on the batch writer.
+
+    The row carries the customer_id and channel of the feedback so the
+    customer profile can be updated from it. Immediate writes update the
+    profile right away; buffered rows are applied after the writer flushes.
+    """
+    for field in ('customer_id', 'channel'):
+        if feedback_data and feedback_data.get(field):
+            item[field] = feedback_data[field]
+
+    timings = (feedback_data or {}).get('timings')
+    if timings:
+        durations = stage_durations({**timings, 'written_at_ms': now_ms()})
+        if durations:
+            item['stage_timings_ms'] = durations
+
+    if sentiment_writer is not None:
+        sentiment_writer.put(item)
+    else:
+        get_table(table_name('sentiment-analysis')).put_item(Item=to_dynamodb(item))
+        update_profiles([item])
+    return item
+
+def store_triage_sentiment(feedback_id, triage, sentiment_writer=None, feedback_data=None):
+    """Store a sentiment row decided by local triage."""
+    from datetime import datetime
+
+    return write_sentiment_item({
+        'feedback_id': feedback_id,
+        'sentiment_score': triage['sentiment_score'],
+        'sentiment_label': triage['sentiment_label'],
+        'confidence': triage['confidence'],
+        'analysis_timestamp': datetime.utcnow().isoformat(),
+        'agent_response': f"Local triage: {triage['sentiment_label']} "
+                          f"(score: {triage['sentiment_score']}, confidence: {triage['confidence']}, reason: {triage['reason']})",
+        'model_used': 'local_triage'
+    }, sentiment_writer, feedback_data)
+
+def store_cached_sentiment(feedback_id, cached, sentiment_writer=None, feedback_data=None):
+    """Store a sentiment row from a cached analysis of identical feedback text."""
+    from datetime import datetime
+
+    return write_sentiment_item({
+        **cached,
+        'feedback_id': feedback_id,
+        'analysis_timestamp': datetime.utcnow().isoformat(),
+        'cache_hit': True
+    }, sentiment_writer, feedback_data)
+
+def store_rating_based_sentiment(feedback_id, feedback_data, sentiment_writer=None):
     """Store sentiment based on rating (fallback when agent not available)."""
     try:
         from datetime import datetime
         
-        rating = feedback_data.get('rating', 3)
+        rating = feedback_data.get('rating') or 3
         
         # Simple sentiment mapping based on rating
         if rating >= 4:
@@ -195,24 +751,40 @@ def store_rating_based_sentiment(feedback_id, feedback_data):
             sentiment_score = 0.2
             sentiment_label = 'negative'
         
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-sentiment-analysis-{os.environ["ENVIRONMENT"]}')
-        
-        table.put_item(Item={
+        write_sentiment_item({
             'feedback_id': feedback_id,
             'sentiment_score': sentiment_score,
             'sentiment_label': sentiment_label,
             'analysis_timestamp': datetime.utcnow().isoformat(),
             'agent_response': f"Rating-based analysis: {sentiment_label} (rating: {rating})",
             'model_used': 'rating_based_fallback'
-        })
+        }, sentiment_writer, feedback_data)
         
         print(f"Stored rating-based sentiment for {feedback_id}: {sentiment_label}")
         
     except Exception as e:
         print(f"Error storing rating-based sentiment: {e}")
 
-def store_sentiment_analysis(feedback_id, agent_response):
+def store_structured_sentiment(feedback_id, sentiment, model_used=None, sentiment_writer=None, feedback_data=None):
+    """Store a validated per-item sentiment result returned by the batch tool."""
+    from datetime import datetime
+
+    sentiment_score = min(max(float(sentiment.get('sentiment_score', 0.5)), 0.0), 1.0)
+    sentiment_label = sentiment.get('sentiment_label', 'neutral')
+    key_themes = sentiment.get('key_themes', [])
+
+    return write_sentiment_item({
+        'feedback_id': feedback_id,
+        'sentiment_score': sentiment_score,
+        'sentiment_label': sentiment_label,
+        'confidence': sentiment.get('confidence', 0.5),
+        'key_themes': key_themes,
+        'analysis_timestamp': datetime.utcnow().isoformat(),
+        'agent_response': f"Batch analysis: {sentiment_label} (themes: {', '.join(key_themes) or 'none'})",
+        'model_used': model_used or os.environ.get('BEDROCK_MODEL_ID', 'amazon.titan-text-premier-v1:0')
+    }, sentiment_writer, feedback_data)
+
+def store_sentiment_analysis(feedback_id, agent_response, sentiment_writer=None, feedback_data=None):
     """Store sentiment analysis results in DynamoDB."""
     try:
         # Handle the agent response structure
@@ -243,19 +815,17 @@ def store_sentiment_analysis(feedback_id, agent_response):
             model_used = os.environ.get('BEDROCK_MODEL_ID', 'amazon.titan-text-premier-v1:0')
 
         from datetime import datetime
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-sentiment-analysis-{os.environ["ENVIRONMENT"]}')
-
-        table.put_item(Item={
+        item = write_sentiment_item({
             'feedback_id': feedback_id,
             'sentiment_score': sentiment_score,
             'sentiment_label': sentiment_label,
             'analysis_timestamp': datetime.utcnow().isoformat(),
             'agent_response': analysis_text,
             'model_used': model_used
-        })
+        }, sentiment_writer, feedback_data)
 
         print(f"✅ Stored agent sentiment analysis for {feedback_id}: {sentiment_label} ({sentiment_score})")
+        return item
 
     except Exception as e:
         print(f"Error storing sentiment analysis: {e}")
@@ -0,0 +1,204 @@
+"""
+Incremental Parquet export of the feedback and sentiment tables.
+
+The metrics aggregator, which already reads both table streams, passes each
+stream batch to export_stream_batch. The batch is written as delta files
+under s3://INSIGHTS_BUCKET_NAME/analytics/<dataset>/date=<day>/, and the
+dataset's export watermark in the metrics table is advanced. (DynamoDB
+Streams serves at most two readers per shard, so the export has no stream
+consumer of its own.) This function runs on a schedule and compacts each
+day's deltas into one file, keeping only the newest version of every row.
+Readers (analytics_query) apply the same newest-version rule, so they see
+consistent data between compactions.
+"""
+
+import io
+import json
+import os
+from collections import defaultdict
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client, get_table, table_name
+from analytics_query import (
+    ANALYTICS_PREFIX, DATASETS, WATERMARK_KEY, dataset_schema, latest_rows, partition_date, require_pyarrow
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COMPACTED_FILE = 'part-compacted.parquet'
+
+_deserializer = TypeDeserializer()
+
+def lambda_handler(event, context):
+    """Compact the export (scheduled invocation)."""
+    require_pyarrow()
+    try:
+        compacted = compact_export()
+        print(f"Compacted {compacted} export partitions")
+        return {'statusCode': 200, 'body': json.dumps({'compacted': compacted})}
+
+    except Exception as e:
+        print(f"Error exporting analytics data: {e}")
+        raise
+
+def dataset_for_record(record):
+    """Dataset a stream record belongs to, from its source table."""
+    source_arn = record.get('eventSourceARN', '')
+    for name, (kind, _, _) in DATASETS.items():
+        if f'-{kind}-{os.environ["ENVIRONMENT"]}/' in source_arn:
+            return name
+    return None
+
+def stream_image(record, image):
+    raw = record.get('dynamodb', {}).get(image)
+    if not raw:
+        return None
+    return {name: _deserializer.deserialize(value) for name, value in raw.items()}
+
+def export_row(name, item, changed_at, sequence, deleted):
+    """Flatten an item to the dataset's columns."""
+    row = {}
+    for column, type_name in DATASETS[name][2]:
+        value = item.get(column)
+        if value is not None and type_name == 'float64':
+            value = float(value)
+        elif value is not None and type_name == 'string' and not isinstance(value, str):
+            value = str(value)
+        row[column] = value
+    row['_changed_at'] = changed_at
+    row['_sequence'] = sequence
+    row['_deleted'] = deleted
+    return row
+
+def rows_for_record(name, record):
+    """(date, row) pairs a stream record contributes to its dataset.
+
+    A change that moves a row to another day (e.g. re-analysis updates
+    analysis_timestamp) also leaves a tombstone in the old day's partition.
+    """
+    time_column = DATASETS[name][1]
+    sequence = record['dynamodb']['SequenceNumber'].zfill(40)
+    changed_at = change_time_ms(record)
+    old_item, new_item = stream_image(record, 'OldImage'), stream_image(record, 'NewImage')
+    old_date = partition_date(old_item.get(time_column)) if old_item else None
+    new_date = partition_date(new_item.get(time_column)) if new_item else None
+
+    rows = []
+    if new_item and new_date:
+        rows.append((new_date, export_row(name, new_item, changed_at, sequence, False)))
+    if old_item and old_date and old_date != new_date:
+        rows.append((old_date, export_row(name, old_item, changed_at, sequence, True)))
+    return rows
+
+def change_time_ms(record):
+    """When a stream record's change was made, in epoch milliseconds (0 if unknown)."""
+    changed_at = record['dynamodb'].get('ApproximateCreationDateTime')
+    return int(float(changed_at) * 1000) if changed_at is not None else 0
+
+def export_stream_batch(records):
+    """Write one delta file per (dataset, day) in the batch and advance the watermarks.
+
+    Records from tables other than the two exported ones are ignored.
+    """
+    partitions = defaultdict(list)
+    sequences = defaultdict(list)
+    watermarks = {}
+
+    for record in records:
+        name = dataset_for_record(record)
+        if name is None:
+            continue
+        for day, row in rows_for_record(name, record):
+            partitions[(name, day)].append(row)
+            sequences[(name, day)].append(row['_sequence'])
+        changed_at = record['dynamodb'].get('ApproximateCreationDateTime')
+        if changed_at is not None:
+            watermarks[name] = max(watermarks.get(name, 0), int(changed_at))
+
+    s3 = get_client('s3')
+    for (name, day), rows in partitions.items():
+        # Named after the batch's sequence range, so a retried batch overwrites its own files
+        key = (f"{partition_prefix(name, day)}delta-{min(sequences[(name, day)])}-"
+               f"{max(sequences[(name, day)])}.parquet")
+        table = pa.Table.from_pylist(rows, schema=dataset_schema(name))
+        s3.put_object(Bucket=os.environ['INSIGHTS_BUCKET_NAME'], Key=key, Body=parquet_bytes(table))
+
+    for name, changed_at in watermarks.items():
+        advance_watermark(name, changed_at)
+
+    return len(partitions)
+
+def partition_prefix(name, day):
+    return f'{ANALYTICS_PREFIX}/{name}/date={day}/'
+
+def parquet_bytes(table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='zstd')
+    return buffer.getvalue()
+
+def read_parquet(key):
+    body = get_client('s3').get_object(Bucket=os.environ['INSIGHTS_BUCKET_NAME'], Key=key)['Body'].read()
+    return pq.read_table(pa.BufferReader(body))
+
+def advance_watermark(name, changed_at):
+    """Move a dataset's watermark forward (never back)."""
+    try:
+        get_table(table_name('metrics')).update_item(
+            Key={'metric_key': WATERMARK_KEY, 'shard_id': 0},
+            UpdateExpression='SET #dataset = :changed_at',
+            ConditionExpression='attribute_not_exists(#dataset) OR #dataset < :changed_at',
+            ExpressionAttributeNames={'#dataset': name},
+            ExpressionAttributeValues={':changed_at': changed_at}
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+def compact_export():
+    """Fold every partition's delta files into its compacted file."""
+    s3 = get_client('s3')
+    bucket = os.environ['INSIGHTS_BUCKET_NAME']
+    deltas = defaultdict(list)
+
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=f'{ANALYTICS_PREFIX}/'):
+        for obj in page.get('Contents', []):
+            prefix, _, filename = obj['Key'].rpartition('/')
+            if filename.startswith('delta-'):
+                deltas[prefix + '/'].append(obj['Key'])
+
+    for prefix, keys in deltas.items():
+        compact_partition(bucket, prefix, keys)
+    return len(deltas)
+
+def compact_partition(bucket, prefix, delta_keys):
+    """Merge a partition's compacted file with its deltas, then delete the merged deltas.
+
+    Only the deltas that were read are deleted, so files written by a
+    concurrent stream batch are picked up by the next compaction.
+    """
+    s3 = get_client('s3')
+    name = prefix[len(ANALYTICS_PREFIX) + 1:].split('/', 1)[0]
+    schema = dataset_schema(name)
+
+    tables = [read_parquet(key).cast(schema) for key in delta_keys]
+    try:
+        tables.append(read_parquet(prefix + COMPACTED_FILE).cast(schema))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+            raise
+
+    # Tombstones have done their job once the partition is rewritten without the rows they cover
+    current = latest_rows(pa.concat_tables(tables))
+    s3.put_object(Bucket=bucket, Key=prefix + COMPACTED_FILE, Body=parquet_bytes(current))
+
+    for start in range(0, len(delta_keys), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={
+            'Objects': [{'Key': key} for key in delta_keys[start:start + 1000]],
+            'Quiet': True
+        })
@@ -0,0 +1,228 @@
+"""
+Query layer over the Parquet analytics export.
+
+analytics_exporter writes the feedback-records and sentiment-analysis tables
+to date-partitioned Parquet files (<root>/<dataset>/date=YYYY-MM-DD/*.parquet).
+Queries here read them with pyarrow datasets. Only the requested columns are
+read, and partitions outside the date range are skipped from their paths
+alone. That makes multi-month aggregations cheap compared with scanning the
+live tables.
+
+The root defaults to the export in INSIGHTS_BUCKET_NAME. Any local copy also
+works (e.g. `aws s3 sync s3://<bucket>/analytics ./analytics`), so the same
+queries run on a laptop:
+
+    python analytics_query.py --root ./analytics --from 2024-01-01 --to 2024-06-30 --period month --group-by channel
+
+pyarrow is not part of the Lambda runtime. It comes from the optional
+analytics layer, and PYARROW_AVAILABLE tells callers whether it is present.
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timedelta
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pc = ds = None
+    PYARROW_AVAILABLE = False
+
+ANALYTICS_PREFIX = 'analytics'
+
+# Metrics table item recording how far each dataset has been exported
+WATERMARK_KEY = 'export#watermark'
+
+# Dataset name -> (source table kind, time column used for partitioning, columns)
+DATASETS = {
+    'feedback': ('feedback-records', 'timestamp', (
+        ('feedback_id', 'string'), ('timestamp', 'string'), ('customer_id', 'string'), ('channel', 'string'),
+        ('category', 'string'), ('rating', 'float64'), ('source', 'string'), ('feedback_text', 'string'),
+    )),
+    'sentiment': ('sentiment-analysis', 'analysis_timestamp', (
+        ('feedback_id', 'string'), ('analysis_timestamp', 'string'), ('sentiment_score', 'float64'),
+        ('sentiment_label', 'string'), ('confidence', 'float64'), ('model_used', 'string'),
+        ('customer_id', 'string'), ('channel', 'string'),
+    )),
+}
+
+# Bookkeeping columns on every exported row: when the change was made (the
+# stream record's ApproximateCreationDateTime, epoch milliseconds), the stream
+# sequence number (zero-padded so it sorts as a string) and a tombstone flag
+# for deletes and rows that moved to another date partition. Sequence numbers
+# are only ordered within a stream shard and an item's changes can span a
+# shard split, so versions are ordered by change time first and sequence second.
+EXPORT_COLUMNS = (('_changed_at', 'int64'), ('_sequence', 'string'), ('_deleted', 'bool_'))
+
+# Sort order that puts the newest version of a row first
+NEWEST_FIRST = [('_changed_at', 'descending'), ('_sequence', 'descending')]
+
+# Grouping dimensions for sentiment_aggregates -> (dataset, column)
+GROUP_COLUMNS = {
+    'channel': ('sentiment', 'channel'),
+    'label': ('sentiment', 'sentiment_label'),
+    'model': ('sentiment', 'model_used'),
+    'category': ('feedback', 'category'),
+    'source': ('feedback', 'source'),
+}
+
+# Length of the timestamp prefix that identifies each period
+PERIODS = {'day': 10, 'month': 7, 'year': 4}
+
+
+def require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError('pyarrow is not installed; attach the analytics layer to query the export')
+
+
+def dataset_schema(name):
+    """Arrow schema of an exported dataset's files."""
+    require_pyarrow()
+    columns = DATASETS[name][2] + EXPORT_COLUMNS
+    return pa.schema([(column, getattr(pa, type_name)()) for column, type_name in columns])
+
+
+def partition_date(value):
+    """Date partition (YYYY-MM-DD) of an ISO timestamp, or None if it is not one."""
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return None
+
+
+def analytics_root():
+    """Export location: ANALYTICS_ROOT if set, else the insights bucket."""
+    return os.environ.get('ANALYTICS_ROOT') or f"s3://{os.environ['INSIGHTS_BUCKET_NAME']}/{ANALYTICS_PREFIX}"
+
+
+def latest_rows(table, keys=('feedback_id',)):
+    """Keep the newest version (latest _changed_at, then highest _sequence) of each row and drop tombstones."""
+    if table.num_rows == 0:
+        return table
+    table = table.sort_by(NEWEST_FIRST)
+    seen = set()
+    keep = []
+    for index, key in enumerate(zip(*(table.column(name).to_pylist() for name in keys))):
+        if key not in seen:
+            seen.add(key)
+            keep.append(index)
+    table = table.take(pa.array(keep, type=pa.int64()))
+    return table.filter(pc.invert(table.column('_deleted')))
+
+
+def open_dataset(name, root=None):
+    """Open an exported dataset with hive date partitioning; None if nothing is exported yet."""
+    require_pyarrow()
+    partitioning = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    try:
+        return ds.dataset(f"{(root or analytics_root()).rstrip('/')}/{name}", format='parquet',
+                          schema=dataset_schema(name).append(pa.field('date', pa.string())),
+                          partitioning=partitioning)
+    except FileNotFoundError:
+        return None
+
+
+def read_rows(name, start, end, columns, root=None):
+    """Current rows of a dataset with start <= time < end, reading only the given columns."""
+    time_column = DATASETS[name][1]
+    dataset = open_dataset(name, root)
+    wanted = list(dict.fromkeys(columns))
+    if dataset is None:
+        return dataset_schema(name).empty_table().select(wanted)
+
+    # The date predicate prunes partitions by path; the time predicate trims the edge days
+    expression = (
+        (ds.field('date') >= start.date().isoformat()) & (ds.field('date') <= end.date().isoformat())
+        & (ds.field(time_column) >= start.isoformat()) & (ds.field(time_column) < end.isoformat())
+    )
+    read_columns = list(dict.fromkeys(wanted + ['feedback_id', 'date', '_changed_at', '_sequence', '_deleted']))
+    table = dataset.to_table(columns=read_columns, filter=expression)
+    return latest_rows(table, keys=('date', 'feedback_id')).select(wanted)
+
+
+def sentiment_aggregates(start, end, period='month', group_by=None, root=None):
+    """Sentiment statistics per period (and optionally per group) over [start, end).
+
+    Returns rows {period, group?, count, mean_score, stddev_score, positive,
+    neutral, negative}, ordered by period.
+    """
+    require_pyarrow()
+    if period not in PERIODS:
+        raise ValueError(f'period must be one of {sorted(PERIODS)}')
+    if group_by is not None and group_by not in GROUP_COLUMNS:
+        raise ValueError(f'group_by must be one of {sorted(GROUP_COLUMNS)}')
+
+    columns = ['feedback_id', 'analysis_timestamp', 'sentiment_score', 'sentiment_label']
+    group_dataset, group_column = GROUP_COLUMNS.get(group_by, (None, None))
+    if group_dataset == 'sentiment':
+        columns.append(group_column)
+    table = read_rows('sentiment', start, end, columns, root)
+
+    if group_dataset == 'feedback':
+        # Feedback is usually recorded shortly before its analysis; allow a day of slack
+        feedback = read_rows('feedback', start - timedelta(days=1), end, ['feedback_id', group_column], root)
+        table = table.join(feedback, keys='feedback_id', join_type='left outer')
+
+    keys = ['period'] + ([group_column] if group_column else [])
+    table = table.append_column('period', pc.utf8_slice_codeunits(table.column('analysis_timestamp'), 0, PERIODS[period]))
+    for label in ('positive', 'neutral', 'negative'):
+        table = table.append_column(label, pc.cast(pc.equal(table.column('sentiment_label'), label), pa.int64()))
+
+    grouped = table.group_by(keys).aggregate([
+        ('sentiment_score', 'count'),
+        ('sentiment_score', 'mean'),
+        ('sentiment_score', 'stddev'),
+        ('positive', 'sum'),
+        ('neutral', 'sum'),
+        ('negative', 'sum'),
+    ])
+
+    rows = []
+    for row in grouped.to_pylist():
+        entry = {
+            'period': row['period'],
+            'count': row['sentiment_score_count'],
+            'mean_score': round(row['sentiment_score_mean'], 4) if row['sentiment_score_mean'] is not None else None,
+            'stddev_score': round(row['sentiment_score_stddev'], 4) if row['sentiment_score_stddev'] is not None else None,
+            'positive': row['positive_sum'],
+            'neutral': row['neutral_sum'],
+            'negative': row['negative_sum'],
+        }
+        if group_column:
+            entry['group'] = row[group_column]
+        rows.append(entry)
+    return sorted(rows, key=lambda entry: (entry['period'], str(entry.get('group'))))
+
+
+def read_watermark():
+    """Newest stream change exported per dataset ({dataset: epoch seconds}), from the metrics table."""
+    from aws_clients import get_table, table_name
+    from dynamodb_utils import from_dynamodb
+
+    item = get_table(table_name('metrics')).get_item(Key={'metric_key': WATERMARK_KEY, 'shard_id': 0}).get('Item')
+    item = from_dynamodb(item) if item else {}
+    return {name: int(item[name]) for name in DATASETS if item.get(name) is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate sentiment from the Parquet analytics export')
+    parser.add_argument('--root', help='Export root: a local directory or s3://bucket/analytics')
+    parser.add_argument('--from', dest='start', required=True, help='Start date (ISO 8601)')
+    parser.add_argument('--to', dest='end', help='End date, exclusive (ISO 8601, default now)')
+    parser.add_argument('--period', default='month', choices=sorted(PERIODS))
+    parser.add_argument('--group-by', choices=sorted(GROUP_COLUMNS))
+    args = parser.parse_args()
+
+    end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow()
+    rows = sentiment_aggregates(datetime.fromisoformat(args.start), end, args.period, args.group_by, args.root)
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == '__main__':
+    main()
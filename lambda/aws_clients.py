@@ -0,0 +1,122 @@
+"""
+Shared AWS client registry for the InsightModAI Lambda functions.
+
+Sessions, clients, resources and DynamoDB Table objects are created once per
+container and reused across invocations, so keep-alive HTTP pools and TLS
+sessions survive between calls instead of being rebuilt for every record.
+"""
+
+import os
+import threading
+from collections import Counter
+
+import boto3
+from botocore.config import Config
+
+# Connection pool and retry tuning (overridable per function via environment)
+MAX_POOL_CONNECTIONS = int(os.environ.get('CLIENT_MAX_POOL_CONNECTIONS', '25'))
+RETRY_MODE = os.environ.get('CLIENT_RETRY_MODE', 'standard')
+MAX_ATTEMPTS = int(os.environ.get('CLIENT_MAX_ATTEMPTS', '3'))
+CONNECT_TIMEOUT = float(os.environ.get('CLIENT_CONNECT_TIMEOUT', '5'))
+READ_TIMEOUT = float(os.environ.get('CLIENT_READ_TIMEOUT', '30'))
+
+# Per-service overrides; agent invocations can legitimately run for minutes
+SERVICE_CONFIG_OVERRIDES = {
+    'bedrock-agentcore': {'read_timeout': 300},
+}
+
+_lock = threading.RLock()
+_session = None
+_clients = {}
+_resources = {}
+_tables = {}
+
+_call_counts = Counter()
+_call_counts_lock = threading.Lock()
+
+
+def get_session():
+    """Get the container-wide boto3 session."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session()
+        return _session
+
+
+def client_config(service_name):
+    """Build the botocore Config used for a service."""
+    options = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'retries': {'mode': RETRY_MODE, 'max_attempts': MAX_ATTEMPTS},
+        'connect_timeout': CONNECT_TIMEOUT,
+        'read_timeout': READ_TIMEOUT,
+        'tcp_keepalive': True,
+    }
+    options.update(SERVICE_CONFIG_OVERRIDES.get(service_name, {}))
+    return Config(**options)
+
+
+def get_client(service_name):
+    """Get a pooled low-level client for a service."""
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+
+    with _lock:
+        if service_name not in _clients:
+            client = get_session().client(service_name, config=client_config(service_name))
+            client.meta.events.register('before-call', _count_call)
+            _clients[service_name] = client
+        return _clients[service_name]
+
+
+def get_resource(service_name):
+    """Get a pooled service resource (e.g. dynamodb)."""
+    resource = _resources.get(service_name)
+    if resource is not None:
+        return resource
+
+    with _lock:
+        if service_name not in _resources:
+            resource = get_session().resource(service_name, config=client_config(service_name))
+            resource.meta.client.meta.events.register('before-call', _count_call)
+            _resources[service_name] = resource
+        return _resources[service_name]
+
+
+def get_table(name):
+    """Get a cached DynamoDB Table object by full table name."""
+    table = _tables.get(name)
+    if table is not None:
+        return table
+
+    with _lock:
+        if name not in _tables:
+            _tables[name] = get_resource('dynamodb').Table(name)
+        return _tables[name]
+
+
+def table_name(kind):
+    """Resolve a stack table name, e.g. table_name('feedback-records')."""
+    return f'{os.environ["STACK_NAME"]}-{kind}-{os.environ["ENVIRONMENT"]}'
+
+
+def _count_call(event_name=None, **kwargs):
+    """botocore before-call hook counting API calls per service operation."""
+    # event_name looks like 'before-call.dynamodb.PutItem'
+    key = event_name.split('.', 1)[1] if event_name else 'unknown'
+    with _call_counts_lock:
+        _call_counts[key] += 1
+
+
+def get_call_counts():
+    """Get API call counts since container start, keyed by 'service.Operation'."""
+    with _call_counts_lock:
+        return dict(_call_counts)
+
+
+def reset_call_counts():
+    """Reset the per-operation call counters."""
+    with _call_counts_lock:
+        _call_counts.clear()
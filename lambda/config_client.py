@@ -0,0 +1,215 @@
+"""
+Versioned, in-container cache of the agent configuration table.
+
+Besides one item per setting, the table holds a snapshot item
+(config_key 'config#snapshot') with every setting in one map and a version
+number. config_manager rewrites the snapshot, bumps the version and puts the
+individual items in a single transaction, so the snapshot is always a
+complete, consistent copy.
+
+Readers load the snapshot with one GetItem and keep it for
+CONFIG_CACHE_TTL_SECONDS. After that they read only the version and reload
+the settings when it has changed, so a warm container answers config reads
+from memory. Tables written before the snapshot existed are read with a
+scan until the next configuration update creates it.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client, get_table, table_name
+from dynamodb_utils import from_dynamodb
+from scan_engine import scan_items
+
+CONFIG_CACHE_TTL_SECONDS = int(os.environ.get('CONFIG_CACHE_TTL_SECONDS', '30'))
+
+SNAPSHOT_KEY = 'config#snapshot'
+
+# Attempts at an update that races another writer
+CONFIG_UPDATE_MAX_ATTEMPTS = 3
+
+# TransactWriteItems accepts at most 100 actions, one of which is the snapshot
+MAX_SETTINGS_PER_UPDATE = 99
+
+DEFAULTS = {
+    'crm_enabled': 'false',
+    'auto_process_feedback': 'false',
+    'enable_memory': 'false',
+    'negative_threshold': '0.3',
+    'positive_threshold': '0.7',
+    'local_triage_enabled': 'true',
+    'triage_min_confidence': '0.6',
+    'max_processing_time': '300',
+    'batch_size': '10'
+}
+
+_serializer = TypeSerializer()
+
+
+class ConfigConflictError(RuntimeError):
+    """The configuration kept changing underneath an update."""
+
+
+def config_table_name():
+    return table_name('agent-config')
+
+
+def load_snapshot(consistent=False):
+    """Read the stored settings and version; (settings, 0) when there is no snapshot yet."""
+    item = get_table(config_table_name()).get_item(
+        Key={'config_key': SNAPSHOT_KEY}, ConsistentRead=consistent
+    ).get('Item')
+    if item:
+        item = from_dynamodb(item)
+        return dict(item.get('settings') or {}), int(item.get('version', 0))
+
+    settings = {
+        item['config_key']: item['config_value']
+        for item in scan_items(config_table_name(), ConsistentRead=consistent)
+        if item['config_key'] != SNAPSHOT_KEY and 'config_value' in item
+    }
+    return settings, 0
+
+
+def read_version():
+    """Current config version, reading only the version attribute of the snapshot."""
+    item = get_table(config_table_name()).get_item(
+        Key={'config_key': SNAPSHOT_KEY},
+        ProjectionExpression='#version',
+        ExpressionAttributeNames={'#version': 'version'}
+    ).get('Item')
+    return int(item['version']) if item and item.get('version') is not None else 0
+
+
+class ConfigCache:
+    """In-container copy of the config snapshot, revalidated by version after a TTL."""
+
+    def __init__(self, ttl=CONFIG_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._settings = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def get_all(self):
+        """All settings (defaults filled in) and the version they belong to."""
+        now = time.time()
+        with self._lock:
+            if self._settings is not None and now - self._checked_at < self.ttl:
+                return self._settings, self._version
+            cached_version = self._version if self._settings is not None else None
+
+        try:
+            # Version 0 means there is no snapshot to compare against; reload it
+            if cached_version and read_version() == cached_version:
+                with self._lock:
+                    self._checked_at = now
+                    return self._settings, self._version
+
+            stored, version = load_snapshot()
+            settings = {**DEFAULTS, **stored}
+            with self._lock:
+                self._settings, self._version, self._checked_at = settings, version, now
+            print(f"Loaded configuration version {version}")
+            return settings, version
+        except Exception as e:
+            with self._lock:
+                if self._settings is not None:
+                    # Keep serving the last known configuration and retry after the TTL
+                    print(f"Error refreshing configuration, using version {self._version}: {e}")
+                    self._checked_at = now
+                    return self._settings, self._version
+            print(f"Error loading configuration, using defaults: {e}")
+            return dict(DEFAULTS), None
+
+    def invalidate(self):
+        with self._lock:
+            self._settings, self._version, self._checked_at = None, None, 0
+
+
+_cache = ConfigCache()
+
+
+def get_config():
+    """Cached copy of every setting, with defaults for the ones never set."""
+    return dict(_cache.get_all()[0])
+
+
+def get_setting(key, default=None):
+    """One cached setting value."""
+    return _cache.get_all()[0].get(key, default)
+
+
+def config_version():
+    """Version of the cached configuration (None if it could not be loaded)."""
+    return _cache.get_all()[1]
+
+
+def invalidate_config():
+    _cache.invalidate()
+
+
+def update_config(updates):
+    """Store new setting values and bump the config version in one transaction.
+
+    The snapshot is rewritten conditionally on the version it was read at, so
+    concurrent updates cannot lose each other's settings; a lost race is
+    retried from a fresh read. Returns the new version.
+    """
+    if not updates:
+        raise ValueError('No settings to update')
+    if len(updates) > MAX_SETTINGS_PER_UPDATE:
+        raise ValueError(f'At most {MAX_SETTINGS_PER_UPDATE} settings can be updated at once')
+    updates = {str(key): str(value) for key, value in updates.items()}
+    if SNAPSHOT_KEY in updates:
+        raise ValueError(f'{SNAPSHOT_KEY} is reserved')
+
+    client = get_client('dynamodb')
+    name = config_table_name()
+
+    for attempt in range(CONFIG_UPDATE_MAX_ATTEMPTS):
+        settings, version = load_snapshot(consistent=True)
+        snapshot = {
+            'config_key': SNAPSHOT_KEY,
+            'settings': {**settings, **updates},
+            'version': version + 1,
+            'updated_at': datetime.utcnow().isoformat()
+        }
+        if version:
+            condition = {'ConditionExpression': '#version = :version',
+                         'ExpressionAttributeNames': {'#version': 'version'},
+                         'ExpressionAttributeValues': {':version': _serializer.serialize(version)}}
+        else:
+            condition = {'ConditionExpression': 'attribute_not_exists(config_key)'}
+
+        try:
+            client.transact_write_items(TransactItems=[
+                {'Put': {'TableName': name, 'Item': _serialize(snapshot), **condition}}
+            ] + [
+                # Individual items stay readable by key for containers still running older code
+                {'Put': {'TableName': name, 'Item': _serialize({'config_key': key, 'config_value': value})}}
+                for key, value in updates.items()
+            ])
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'TransactionCanceledException':
+                raise
+            reasons = e.response.get('CancellationReasons') or []
+            if not reasons or reasons[0].get('Code') != 'ConditionalCheckFailed':
+                raise
+            print(f"Configuration changed during update (attempt {attempt + 1}), retrying")
+            continue
+
+        _cache.invalidate()
+        return version + 1
+
+    raise ConfigConflictError('Configuration is being updated concurrently, try again')
+
+
+def _serialize(values):
+    """Convert a resource-style dict into low-level attribute values."""
+    return {name: _serializer.serialize(value) for name, value in values.items()}
@@ -1,8 +1,8 @@
 import json
-import boto3
-import os
 from botocore.exceptions import ClientError
 
+from config_client import DEFAULTS, ConfigConflictError, load_snapshot, update_config
+
 def lambda_handler(event, context):
     """Manage agent configuration settings."""
     try:
@@ -25,30 +25,9 @@ def lambda_handler(event, context):
 def handle_get_config():
     """Get all configuration settings."""
     try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-agent-config-{os.environ["ENVIRONMENT"]}')
-
-        # Get all config items
-        response = table.scan()
-        config = {}
-
-        for item in response.get('Items', []):
-            config[item['config_key']] = item['config_value']
-
-        # Set defaults for missing config
-        defaults = {
-            'crm_enabled': 'false',
-            'auto_process_feedback': 'false',
-            'enable_memory': 'false',
-            'negative_threshold': '0.3',
-            'positive_threshold': '0.7',
-            'max_processing_time': '300',
-            'batch_size': '10'
-        }
-
-        for key, default_value in defaults.items():
-            if key not in config:
-                config[key] = default_value
+        # Read the stored snapshot directly so an update is visible immediately
+        settings, _ = load_snapshot(consistent=True)
+        config = {**DEFAULTS, **settings}
 
         return {
             'statusCode': 200,
@@ -66,24 +45,23 @@ def handle_put_config(event):
             return {'statusCode': 400, 'body': json.dumps({'error': 'Request body required'})}
 
         config_updates = json.loads(event['body'])
+        if not isinstance(config_updates, dict):
+            return {'statusCode': 400, 'body': json.dumps({'error': 'Request body must be an object of settings'})}
 
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-agent-config-{os.environ["ENVIRONMENT"]}')
-
-        # Update each config item
-        for key, value in config_updates.items():
-            table.put_item(Item={
-                'config_key': key,
-                'config_value': str(value)
-            })
+        # Settings, snapshot and version change together in one transaction
+        version = update_config(config_updates)
 
         return {
             'statusCode': 200,
-            'body': json.dumps({'message': 'Configuration updated successfully'})
+            'body': json.dumps({'message': 'Configuration updated successfully', 'version': version})
         }
 
     except json.JSONDecodeError:
         return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON in request body'})}
+    except ValueError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+    except ConfigConflictError as e:
+        return {'statusCode': 409, 'body': json.dumps({'error': str(e)})}
     except Exception as e:
         print(f"Error updating config: {e}")
-        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})})
+        return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
@@ -1,8 +1,8 @@
 import json
-import boto3
-import os
 from botocore.exceptions import ClientError
 
+from config_client import get_config, get_setting
+
 def lambda_handler(event, context):
     """Integrate with CRM systems (Salesforce, HubSpot)."""
     try:
@@ -37,36 +37,13 @@ def lambda_handler(event, context):
 
 def is_crm_enabled():
     """Check if CRM integration is enabled."""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-agent-config-{os.environ["ENVIRONMENT"]}')
-
-        response = table.get_item(Key={'config_key': 'crm_enabled'})
-        return response.get('Item', {}).get('config_value') == 'true'
-    except Exception as e:
-        print(f"Error checking CRM status: {e}")
-        return False
+    return get_setting('crm_enabled') == 'true'
 
 def get_crm_config():
-    """Get CRM configuration from DynamoDB."""
-    try:
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-agent-config-{os.environ["ENVIRONMENT"]}')
-
-        # Get all CRM-related config
-        response = table.scan(
-            FilterExpression='begins_with(config_key, :prefix)',
-            ExpressionAttributeValues={':prefix': 'crm_'}
-        )
-
-        config = {}
-        for item in response.get('Items', []):
-            config[item['config_key']] = item['config_value']
-
-        return config if config else None
-    except Exception as e:
-        print(f"Error getting CRM config: {e}")
-        return None
+    """Get the CRM-related settings from the cached configuration."""
+    config = {key: value for key, value in get_config().items() if key.startswith('crm_')}
+    # crm_enabled always has a default; anything else means CRM was configured
+    return config if set(config) - {'crm_enabled'} else None
 
 def handle_salesforce_action(action, data, config):
     """Handle Salesforce CRM actions."""
@@ -0,0 +1,157 @@
+"""
+Materialized per-customer sentiment profiles.
+
+Each customer has one compact item holding the last N sentiment results,
+a running mean and variance (Welford), counts per label and the last
+channel. Profiles are updated with optimistic concurrency (conditional put
+on a version number) whenever sentiment rows are written, and read with a
+single GetItem, so history lookups stay O(1) however much feedback a
+customer has sent.
+"""
+
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_table, table_name
+from dynamodb_utils import backoff_delay, from_dynamodb, to_dynamodb
+
+PROFILE_RECENT_LIMIT = int(os.environ.get('PROFILE_RECENT_LIMIT', '10'))
+PROFILE_UPDATE_MAX_ATTEMPTS = int(os.environ.get('PROFILE_UPDATE_MAX_ATTEMPTS', '5'))
+
+SENTIMENT_LABELS = ('positive', 'neutral', 'negative')
+
+
+def new_profile(customer_id):
+    """An empty profile for a customer with no analyzed feedback yet."""
+    return {
+        'customer_id': customer_id,
+        'version': 0,
+        'count': 0,
+        'mean_score': 0.0,
+        'm2': 0.0,
+        'variance': 0.0,
+        'label_counts': {label: 0 for label in SENTIMENT_LABELS},
+        'recent': [],
+        'last_channel': None,
+        'last_analysis_at': None
+    }
+
+
+def observation_from_item(item):
+    """Build a profile observation from a sentiment row, or None if it has no customer."""
+    if not item.get('customer_id') or item.get('sentiment_score') is None:
+        return None
+    return {
+        'feedback_id': item['feedback_id'],
+        'sentiment_score': float(item['sentiment_score']),
+        'sentiment_label': item.get('sentiment_label', 'unknown'),
+        'analysis_timestamp': item.get('analysis_timestamp'),
+        'channel': item.get('channel')
+    }
+
+
+def apply_observations(profile, observations):
+    """Fold observations into a profile; returns the number actually applied.
+
+    Observations already present in the recent list are skipped, so retried
+    stream records do not double count.
+    """
+    seen = {entry.get('feedback_id') for entry in profile['recent']}
+    applied = 0
+
+    for observation in observations:
+        if observation['feedback_id'] in seen:
+            continue
+        seen.add(observation['feedback_id'])
+
+        score = observation['sentiment_score']
+        profile['count'] += 1
+        delta = score - profile['mean_score']
+        profile['mean_score'] += delta / profile['count']
+        profile['m2'] += delta * (score - profile['mean_score'])
+
+        label = observation['sentiment_label']
+        profile['label_counts'][label] = profile['label_counts'].get(label, 0) + 1
+
+        profile['recent'].insert(0, {
+            'feedback_id': observation['feedback_id'],
+            'sentiment_score': score,
+            'sentiment_label': label,
+            'analysis_timestamp': observation['analysis_timestamp']
+        })
+        if observation.get('channel'):
+            profile['last_channel'] = observation['channel']
+        if observation['analysis_timestamp'] and (observation['analysis_timestamp'] > (profile['last_analysis_at'] or '')):
+            profile['last_analysis_at'] = observation['analysis_timestamp']
+        applied += 1
+
+    if applied:
+        profile['recent'] = sorted(
+            profile['recent'], key=lambda entry: entry.get('analysis_timestamp') or '', reverse=True
+        )[:PROFILE_RECENT_LIMIT]
+        profile['variance'] = profile['m2'] / profile['count']
+
+    return applied
+
+
+def get_profile(customer_id):
+    """Read a customer's profile with a single GetItem, or None if there is none."""
+    item = get_table(table_name('customer-profiles')).get_item(Key={'customer_id': customer_id}).get('Item')
+    return from_dynamodb(item) if item else None
+
+
+def record_sentiments(customer_id, observations):
+    """Apply observations to a customer's profile with a version-checked put.
+
+    Concurrent writers re-read and retry with backoff on a version conflict.
+    Returns the stored profile.
+    """
+    table = get_table(table_name('customer-profiles'))
+
+    for attempt in range(PROFILE_UPDATE_MAX_ATTEMPTS):
+        item = table.get_item(Key={'customer_id': customer_id}, ConsistentRead=True).get('Item')
+        profile = from_dynamodb(item) if item else new_profile(customer_id)
+        version = profile['version']
+
+        if not apply_observations(profile, observations):
+            return profile
+
+        profile['version'] = version + 1
+        profile['updated_at'] = int(time.time())
+        condition = {
+            'ConditionExpression': 'version = :version',
+            'ExpressionAttributeValues': {':version': version}
+        } if item else {'ConditionExpression': 'attribute_not_exists(customer_id)'}
+
+        try:
+            table.put_item(Item=to_dynamodb(profile), **condition)
+            return profile
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                raise
+            time.sleep(backoff_delay(attempt))
+
+    raise RuntimeError(f'Profile update for {customer_id} kept conflicting after {PROFILE_UPDATE_MAX_ATTEMPTS} attempts')
+
+
+def update_profiles(items):
+    """Fold written sentiment rows into their customers' profiles.
+
+    Returns the customer_ids whose profiles could not be updated.
+    """
+    observations = {}
+    for item in items:
+        observation = observation_from_item(item)
+        if observation:
+            observations.setdefault(item['customer_id'], []).append(observation)
+
+    failed = []
+    for customer_id, customer_observations in observations.items():
+        try:
+            record_sentiments(customer_id, customer_observations)
+        except Exception as e:
+            print(f"Error updating sentiment profile for customer {customer_id}: {e}")
+            failed.append(customer_id)
+    return failed
@@ -0,0 +1,117 @@
+"""
+DynamoDB helpers shared by the InsightModAI Lambda functions.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from aws_clients import get_resource
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+BATCH_WRITE_LIMIT = 25
+BATCH_WRITE_MAX_ATTEMPTS = int(os.environ.get('BATCH_WRITE_MAX_ATTEMPTS', '8'))
+BATCH_WRITE_BASE_DELAY = float(os.environ.get('BATCH_WRITE_BASE_DELAY', '0.05'))
+BATCH_WRITE_MAX_DELAY = float(os.environ.get('BATCH_WRITE_MAX_DELAY', '2.0'))
+
+
+def _json_default(value):
+    """JSON fallback that keeps Decimals numeric and stringifies everything else."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return str(value)
+
+
+def to_dynamodb(value):
+    """Convert a JSON-like value into DynamoDB-safe types (floats become Decimal)."""
+    return json.loads(json.dumps(value, default=_json_default), parse_float=Decimal)
+
+
+def from_dynamodb(value):
+    """Convert DynamoDB values (Decimals) back into plain JSON-serializable types."""
+    return json.loads(json.dumps(value, default=_json_default))
+
+
+def backoff_delay(attempt, base=BATCH_WRITE_BASE_DELAY, cap=BATCH_WRITE_MAX_DELAY):
+    """Exponential backoff with full jitter for the given attempt number."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class BatchWriter:
+    """
+    Buffers items for one table and writes them with BatchWriteItem.
+
+    Items are keyed by their primary key so a later put for the same key
+    replaces an earlier one (BatchWriteItem rejects duplicate keys in a
+    request). flush() writes everything in chunks of 25, retries unprocessed
+    items with exponential backoff and jitter, and returns whatever could not
+    be written so the caller can report those records as failed.
+    """
+
+    def __init__(self, table_name, key_attributes=('feedback_id',)):
+        self.table_name = table_name
+        self.key_attributes = tuple(key_attributes)
+        self._buffer = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+        return False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def put(self, item):
+        """Buffer an item for the next flush."""
+        item = to_dynamodb(item)
+        key = tuple(item[attribute] for attribute in self.key_attributes)
+        with self._lock:
+            self._buffer.pop(key, None)
+            self._buffer[key] = item
+
+    def pending(self):
+        """Snapshot of the items buffered for the next flush."""
+        with self._lock:
+            return list(self._buffer.values())
+
+    def flush(self):
+        """Write all buffered items; returns the items that could not be written."""
+        with self._lock:
+            items = list(self._buffer.values())
+            self._buffer.clear()
+
+        unwritten = []
+        for start in range(0, len(items), BATCH_WRITE_LIMIT):
+            unwritten.extend(self._write_chunk(items[start:start + BATCH_WRITE_LIMIT]))
+
+        if items:
+            print(f"Flushed {len(items) - len(unwritten)}/{len(items)} items to {self.table_name}")
+        return unwritten
+
+    def _write_chunk(self, chunk):
+        """Write up to 25 items, retrying UnprocessedItems with backoff."""
+        dynamodb = get_resource('dynamodb')
+        request_items = {self.table_name: [{'PutRequest': {'Item': item}} for item in chunk]}
+
+        try:
+            for attempt in range(BATCH_WRITE_MAX_ATTEMPTS):
+                response = dynamodb.batch_write_item(RequestItems=request_items)
+                request_items = response.get('UnprocessedItems') or {}
+                if not request_items.get(self.table_name):
+                    return []
+                time.sleep(backoff_delay(attempt))
+        except Exception as e:
+            print(f"Error writing batch to {self.table_name}: {e}")
+            return chunk
+
+        unprocessed = [request['PutRequest']['Item'] for request in request_items[self.table_name]]
+        print(f"Giving up on {len(unprocessed)} unprocessed items for {self.table_name}")
+        return unprocessed
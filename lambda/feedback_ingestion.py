@@ -1,20 +1,63 @@
 import json
-import boto3
 import uuid
 import os
+import time
 from datetime import datetime
-from botocore.exceptions import ClientError
+from urllib.parse import unquote_plus
+
+from aws_clients import get_client, get_table, table_name
+from config_client import get_setting
+from dynamodb_utils import BatchWriter, to_dynamodb
+from processing_state import CLAIM_ACQUIRED, STATE_DONE, claim, get_checkpoint, release, save_checkpoint
+from s3_ingestion import (
+    MalformedFileError, INGESTION_CHUNK_BYTES, decompressed_chunks, is_gzip, iter_records, job_id,
+    record_feedback_id, skip_bytes
+)
+
+REQUIRED_FIELDS = ('customer_id', 'feedback_text', 'channel')
+MAX_FEEDBACK_TEXT_LENGTH = int(os.environ.get('MAX_FEEDBACK_TEXT_LENGTH', '10000'))
+
+# Bulk files are flushed (and checkpointed) every this many records
+INGESTION_FLUSH_RECORDS = int(os.environ.get('INGESTION_FLUSH_RECORDS', '500'))
+
+# Stop and hand the rest of a file to a fresh invocation this close to the timeout
+INGESTION_TIME_MARGIN_MS = int(os.environ.get('INGESTION_TIME_MARGIN_MS', '30000'))
+
+# Rejected records whose errors are kept on the job checkpoint
+INGESTION_MAX_ERRORS_KEPT = 20
+
+# Largest array accepted by POST /feedback/batch
+FEEDBACK_BATCH_MAX_ITEMS = int(os.environ.get('FEEDBACK_BATCH_MAX_ITEMS', '500'))
+
+# Feedback items handed to the agent invoker per async invocation (keeps payloads under 256 KB)
+AGENT_TRIGGER_BATCH_SIZE = int(os.environ.get('AGENT_TRIGGER_BATCH_SIZE', '10'))
+
+BATCH_API_RESOURCE = '/feedback/batch'
+
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token',
+    'Access-Control-Allow-Methods': 'POST,OPTIONS'
+}
 
 def lambda_handler(event, context):
     """Process S3 object creation events and API Gateway requests for feedback ingestion."""
     try:
+        # Batch submissions arrive through a proxy integration
+        if event.get('resource') == BATCH_API_RESOURCE:
+            return handle_batch_request(event)
         # Handle S3 trigger
         if event.get('Records'):
             for record in event['Records']:
                 if record['eventSource'] == 'aws:s3':
                     bucket = record['s3']['bucket']['name']
-                    key = record['s3']['object']['key']
-                    process_s3_feedback(bucket, key)
+                    key = unquote_plus(record['s3']['object']['key'])
+                    process_s3_feedback(bucket, key, context)
+        # Continue a bulk file handed over by an invocation that ran out of time
+        elif event.get('resume_ingestion'):
+            resume = event['resume_ingestion']
+            process_s3_feedback(resume['bucket'], resume['key'], context, etag=resume.get('etag'))
         # Handle API Gateway request
         elif event.get('body'):
             body = json.loads(event['body'])
@@ -29,75 +72,312 @@ def lambda_handler(event, context):
         print(f"Error processing feedback: {e}")
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
-def process_s3_feedback(bucket, key):
-    """Process feedback uploaded to S3."""
-    s3 = boto3.client('s3')
+def process_s3_feedback(bucket, key, context=None, etag=None):
+    """Stream a feedback file from S3 into the feedback table.
+
+    JSON arrays, JSON Lines, single JSON objects and their gzip variants are
+    parsed incrementally (see s3_ingestion). Progress is checkpointed in the
+    processing-state table under a claim on the object version, so duplicate
+    S3 events are no-ops and a run near its timeout hands the rest of the
+    file to a fresh invocation.
+    """
+    s3 = get_client('s3')
+    owner = getattr(context, 'aws_request_id', None) or str(uuid.uuid4())
+
     try:
-        response = s3.get_object(Bucket=bucket, Key=key)
-        feedback_data = json.loads(response['Body'].read())
+        if etag is None:
+            etag = s3.head_object(Bucket=bucket, Key=key)['ETag'].strip('"')
+        job = job_id(bucket, key, etag)
+        if claim(job, owner) != CLAIM_ACQUIRED:
+            print(f"Skipping s3://{bucket}/{key}: already ingested or in progress")
+            return
 
-        # Store in DynamoDB
-        dynamodb = boto3.resource('dynamodb')
-        table = dynamodb.Table(os.environ['FEEDBACK_TABLE_NAME'])
+        checkpoint = get_checkpoint(job) or {}
+        offset = int(checkpoint.get('offset', 0))
+        progress = {
+            'offset': offset,
+            'file_format': checkpoint.get('file_format'),
+            'written': int(checkpoint.get('written', 0)),
+            'rejected': int(checkpoint.get('rejected', 0)),
+            'failed': int(checkpoint.get('failed', 0)),
+            'errors': checkpoint.get('errors', [])
+        }
 
-        feedback_id = str(uuid.uuid4())
-        table.put_item(Item={
-            'feedback_id': feedback_id,
-            'timestamp': datetime.utcnow().isoformat(),
-            'source': 's3',
-            's3_bucket': bucket,
-            's3_key': key,
-            **feedback_data
-        })
-
-        print(f"Stored feedback {feedback_id} from S3")
+        records = open_s3_records(s3, bucket, key, etag, offset, progress['file_format'],
+                                  on_format=lambda file_format: progress.update(file_format=file_format))
+        finished = ingest_records(records, bucket, key, etag, job, owner, progress, context)
+
+        if finished:
+            save_checkpoint(job, owner, progress, state=STATE_DONE)
+            print(f"Ingested s3://{bucket}/{key}: {progress['written']} written, "
+                  f"{progress['rejected']} rejected, {progress['failed']} failed")
+        else:
+            # Hand the rest of the file to a fresh invocation
+            save_checkpoint(job, owner, progress)
+            release(job, owner)
+            get_client('lambda').invoke(
+                FunctionName=f'{os.environ["STACK_NAME"]}-feedback-ingestion-{os.environ["ENVIRONMENT"]}',
+                InvocationType='Event',
+                Payload=json.dumps({'resume_ingestion': {'bucket': bucket, 'key': key, 'etag': etag}})
+            )
+            print(f"Checkpointed s3://{bucket}/{key} at byte {progress['offset']}; continuing in a new invocation")
     except Exception as e:
         print(f"Error processing S3 feedback: {e}")
         raise
 
+def open_s3_records(s3, bucket, key, etag, offset, file_format, on_format=None):
+    """Parsed records of an S3 object from a byte offset (of the decompressed content)."""
+    request = {'Bucket': bucket, 'Key': key, 'IfMatch': f'"{etag}"'}
+    head = s3.head_object(**request)
+    if head.get('ContentLength', 0) == 0:
+        return iter(())
+    compressed = is_gzip(key, head.get('ContentEncoding'), b'')
+    if not compressed and offset == 0:
+        # Small peek for gzip files that carry neither a .gz suffix nor Content-Encoding
+        peek = s3.get_object(Range='bytes=0-1', **request)['Body'].read()
+        compressed = is_gzip(key, None, peek)
+
+    if not compressed and offset > 0:
+        # Plain files resume with a ranged GET
+        request['Range'] = f'bytes={offset}-'
+    chunks = s3.get_object(**request)['Body'].iter_chunks(INGESTION_CHUNK_BYTES)
+    if compressed:
+        # gzip cannot seek; decompress from the start and skip what was already ingested
+        chunks = skip_bytes(decompressed_chunks(chunks), offset)
+    return iter_records(chunks, offset, file_format, on_format)
+
+def ingest_records(records, bucket, key, etag, job, owner, progress, context):
+    """Validate and batch-write parsed records, checkpointing after every flush.
+
+    Returns True when the file is finished, False when the run stopped early
+    to stay clear of the Lambda timeout.
+    """
+    writer = BatchWriter(os.environ['FEEDBACK_TABLE_NAME'])
+
+    def flush(offset):
+        unwritten = writer.flush()
+        progress['written'] += buffered - len(unwritten)
+        progress['failed'] += len(unwritten)
+        for item in unwritten:
+            print(f"Could not write feedback {item['feedback_id']} from s3://{bucket}/{key}")
+        progress['offset'] = offset
+        if not save_checkpoint(job, owner, progress):
+            raise RuntimeError(f"Lost the ingestion claim on s3://{bucket}/{key}")
+
+    buffered = 0
+    last_end = progress['offset']
+    try:
+        for record_start, record_end, value, error in records:
+            error = error or validate_feedback(value)
+            if error:
+                progress['rejected'] += 1
+                if len(progress['errors']) < INGESTION_MAX_ERRORS_KEPT:
+                    progress['errors'].append({'offset': record_start, 'error': error})
+            else:
+                timestamp = datetime.utcnow()
+                writer.put(build_feedback_item(
+                    value, record_feedback_id(bucket, key, etag, record_start), 's3', timestamp,
+                    s3_bucket=bucket, s3_key=key
+                ))
+                buffered += 1
+            last_end = record_end
+
+            if buffered >= INGESTION_FLUSH_RECORDS:
+                flush(last_end)
+                buffered = 0
+            if context and context.get_remaining_time_in_millis() < INGESTION_TIME_MARGIN_MS:
+                flush(last_end)
+                return False
+    except MalformedFileError as e:
+        # Keep what was parsed before the damage; the rest of the file cannot be read
+        progress['errors'].append({'offset': last_end, 'error': str(e)})
+        print(f"Stopped ingesting s3://{bucket}/{key}: {e}")
+
+    flush(last_end)
+    return True
+
+def missing_field_error(feedback_data):
+    """Error for a record lacking a required field, or None.
+
+    This is the whole check POST /feedback has always applied; bulk and
+    batch records also go through validate_feedback.
+    """
+    if not isinstance(feedback_data, dict):
+        return 'record must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if field not in feedback_data:
+            return f"Missing required field: {field}"
+    return None
+
+def validate_feedback(feedback_data):
+    """Validation error for a bulk or batch feedback record, or None if it is valid."""
+    error = missing_field_error(feedback_data)
+    if error:
+        return error
+    for field in REQUIRED_FIELDS:
+        if not isinstance(feedback_data[field], str) or not feedback_data[field].strip():
+            return f"Field {field} must be a non-empty string"
+    if len(feedback_data['feedback_text']) > MAX_FEEDBACK_TEXT_LENGTH:
+        return f"feedback_text exceeds {MAX_FEEDBACK_TEXT_LENGTH} characters"
+    rating = feedback_data.get('rating')
+    if rating is not None and (isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5):
+        return 'rating must be a number from 1 to 5'
+    if feedback_data.get('metadata') is not None and not isinstance(feedback_data['metadata'], dict):
+        return 'metadata must be an object'
+    return None
+
+def build_feedback_item(feedback_data, feedback_id, source, timestamp, ingested_at_ms=None, **attributes):
+    """Feedback table item for a validated record.
+
+    The server-generated keys, source and index attributes are applied after
+    the client's fields so a record cannot override them.
+    """
+    return {
+        **feedback_data,
+        **attributes,
+        'feedback_id': feedback_id,
+        'timestamp': timestamp.isoformat(),
+        'ingested_at_ms': ingested_at_ms or int(time.time() * 1000),
+        'source': source,
+        **index_attributes(feedback_data, timestamp)
+    }
+
+def index_attributes(feedback_data, timestamp):
+    """Top-level attributes keyed by the feedback query indexes.
+
+    category is lifted out of metadata (GSI keys must be top-level strings)
+    and feedback_date partitions the date index by day.
+    """
+    attributes = {'feedback_date': timestamp.date().isoformat()}
+    metadata = feedback_data.get('metadata') if isinstance(feedback_data.get('metadata'), dict) else {}
+    category = feedback_data.get('category') or metadata.get('category')
+    if isinstance(category, str) and category:
+        attributes['category'] = category
+    return attributes
+
 def process_api_feedback(feedback_data):
     """Process feedback from API Gateway."""
-    # Validate required fields
-    required_fields = ['customer_id', 'feedback_text', 'channel']
-    for field in required_fields:
-        if field not in feedback_data:
-            raise ValueError(f"Missing required field: {field}")
+    # Keep the single-record API contract: only required fields are checked
+    error = missing_field_error(feedback_data)
+    if error:
+        raise ValueError(error)
 
     # Store in DynamoDB
-    dynamodb = boto3.resource('dynamodb')
-    table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-feedback-records-{os.environ["ENVIRONMENT"]}')
+    table = get_table(table_name('feedback-records'))
 
     feedback_id = str(uuid.uuid4())
-    table.put_item(Item={
-        'feedback_id': feedback_id,
-        'timestamp': datetime.utcnow().isoformat(),
-        'source': 'api',
-        **feedback_data
-    })
+    # Start of the ingestion-to-insight latency measured by the agent invoker
+    ingested_at_ms = int(time.time() * 1000)
+    table.put_item(Item=to_dynamodb(
+        build_feedback_item(feedback_data, feedback_id, 'api', datetime.utcnow(), ingested_at_ms)
+    ))
 
     # Optionally trigger agent processing
-    trigger_agent_processing(feedback_id, feedback_data)
+    trigger_agent_processing(feedback_id, {**feedback_data, 'ingested_at_ms': ingested_at_ms})
 
     return {'feedback_id': feedback_id, 'status': 'processed'}
 
+def handle_batch_request(event):
+    """POST /feedback/batch: proxy request in, proxy response out."""
+    try:
+        body = json.loads(event.get('body') or 'null')
+    except json.JSONDecodeError:
+        return batch_response(400, {'error': 'Request body must be JSON'})
+
+    records = body.get('feedback') if isinstance(body, dict) else body
+    if not isinstance(records, list) or not records:
+        return batch_response(400, {'error': 'Request body must be a non-empty array of feedback objects'})
+    if len(records) > FEEDBACK_BATCH_MAX_ITEMS:
+        return batch_response(400, {'error': f'At most {FEEDBACK_BATCH_MAX_ITEMS} feedback objects per request'})
+
+    result = process_batch_feedback(records)
+    # 207 when only some of the records were accepted
+    status_code = 200 if not result['rejected'] and not result['failed'] else 207
+    if not result['accepted']:
+        status_code = 400 if not result['failed'] else 500
+    return batch_response(status_code, result)
+
+def batch_response(status_code, body):
+    return {'statusCode': status_code, 'headers': CORS_HEADERS, 'body': json.dumps(body)}
+
+def process_batch_feedback(records):
+    """Validate and store a batch of feedback records from the API.
+
+    Every record is validated before anything is written; valid records are
+    written with BatchWriteItem and invalid ones are reported without
+    failing the rest. Returns per-record results in request order:
+    {index, feedback_id, status} for stored records and {index, status,
+    error} for rejected or failed ones.
+    """
+    results = []
+    items = {}
+    timestamp = datetime.utcnow()
+    # Start of the ingestion-to-insight latency measured by the agent invoker
+    ingested_at_ms = int(time.time() * 1000)
+
+    for index, record in enumerate(records):
+        error = validate_feedback(record)
+        if error:
+            results.append({'index': index, 'status': 'rejected', 'error': error})
+            continue
+        feedback_id = str(uuid.uuid4())
+        items[feedback_id] = record
+        results.append({'index': index, 'feedback_id': feedback_id, 'status': 'accepted'})
+
+    writer = BatchWriter(table_name('feedback-records'))
+    for feedback_id, record in items.items():
+        writer.put(build_feedback_item(record, feedback_id, 'api', timestamp, ingested_at_ms))
+    unwritten_ids = {item['feedback_id'] for item in writer.flush()}
+
+    for result in results:
+        if result.get('feedback_id') in unwritten_ids:
+            result.update(status='failed', error='Could not be stored, please resubmit')
+            del result['feedback_id']
+
+    written = [
+        (feedback_id, {**record, 'ingested_at_ms': ingested_at_ms})
+        for feedback_id, record in items.items() if feedback_id not in unwritten_ids
+    ]
+    if written and auto_process_enabled():
+        trigger_agent_batch_processing(written)
+
+    return {
+        'accepted': len(written),
+        'rejected': sum(1 for result in results if result['status'] == 'rejected'),
+        'failed': len(unwritten_ids),
+        'results': results
+    }
+
+def auto_process_enabled():
+    """Whether new feedback is sent straight to the agent (the auto_process_feedback setting)."""
+    return get_setting('auto_process_feedback') == 'true'
+
+def invoke_agent_invoker(payload):
+    get_client('lambda').invoke(
+        FunctionName=f'{os.environ["STACK_NAME"]}-agent-invoker-{os.environ["ENVIRONMENT"]}',
+        InvocationType='Event',
+        Payload=json.dumps(payload)
+    )
+
 def trigger_agent_processing(feedback_id, feedback_data):
     """Trigger AgentCore agent processing if enabled."""
-    # Get config from DynamoDB
-    dynamodb = boto3.resource('dynamodb')
-    config_table = dynamodb.Table(os.environ['CONFIG_TABLE_NAME'])
-
     try:
-        response = config_table.get_item(Key={'config_key': 'auto_process_feedback'})
-        if response.get('Item', {}).get('config_value') == 'true':
-            # Invoke agent processing
-            lambda_client = boto3.client('lambda')
-            lambda_client.invoke(
-                FunctionName=f'{os.environ["STACK_NAME"]}-agent-invoker-{os.environ["ENVIRONMENT"]}',
-                InvocationType='Event',
-                Payload=json.dumps({
-                    'feedback_id': feedback_id,
-                    'feedback_data': feedback_data
-                })
-            )
+        if auto_process_enabled():
+            invoke_agent_invoker({'feedback_id': feedback_id, 'feedback_data': feedback_data})
     except Exception as e:
         print(f"Error triggering agent processing: {e}")
+
+def trigger_agent_batch_processing(feedback_items):
+    """Hand stored (feedback_id, feedback_data) pairs to the agent invoker, several per invocation.
+
+    Items whose invocation fails are still picked up from the table stream.
+    """
+    for start in range(0, len(feedback_items), AGENT_TRIGGER_BATCH_SIZE):
+        chunk = feedback_items[start:start + AGENT_TRIGGER_BATCH_SIZE]
+        try:
+            invoke_agent_invoker({'feedback_batch': [
+                {'feedback_id': feedback_id, 'feedback_data': feedback_data}
+                for feedback_id, feedback_data in chunk
+            ]})
+        except Exception as e:
+            print(f"Error triggering agent processing for {len(chunk)} feedback items: {e}")
@@ -1,153 +1,305 @@
 import json
-import boto3
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from metrics_store import read_counters, breakdown
+from sentiment_rollups import RESOLUTIONS, compare_windows, sentiment_series, summarize_series
+from activity_feed import read_feed
+from latency_histogram import latency_summary
+from insights_queries import QueryError, query_feedback
+from analytics_query import GROUP_COLUMNS, PERIODS, PYARROW_AVAILABLE, read_watermark, sentiment_aggregates
+from response_cache import ResponseCache
+
+# Upper bound on buckets read for one series request
+MAX_SERIES_BUCKETS = int(os.environ.get('MAX_SERIES_BUCKETS', '1000'))
+
+# Longest range one analytics (Parquet export) request may aggregate
+MAX_ANALYTICS_DAYS = int(os.environ.get('MAX_ANALYTICS_DAYS', '731'))
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token,If-None-Match',
+    'Access-Control-Allow-Methods': 'GET,OPTIONS',
+    'Access-Control-Expose-Headers': 'ETag,X-Cache'
+}
+
+# Every open dashboard polls the same queries, so responses are shared across requests
+insights_cache = ResponseCache('insights')
+
+# Summary metrics are evaluated concurrently, each against this deadline
+METRIC_DEADLINE_SECONDS = float(os.environ.get('METRIC_DEADLINE_SECONDS', '3'))
+_metric_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('METRIC_MAX_WORKERS', '8')))
+
+# Last value computed in this container, served when a metric misses its deadline
+_last_metric_values = {}
+
 def lambda_handler(event, context):
     """Handle insights and dashboard data requests."""
+    query_params = event.get('queryStringParameters') or {}
+    headers = {name.lower(): value for name, value in (event.get('headers') or {}).items()}
+
+    response = insights_cache.respond(query_params, headers.get('if-none-match'), lambda: route_request(query_params))
+    response['headers'] = {**CORS_HEADERS, **response.get('headers', {})}
+    return response
+
+def route_request(query_params):
+    """Compute the response for an insights request."""
     try:
         # Check for summary parameter
-        query_params = event.get('queryStringParameters') or {}
         summary = query_params.get('summary') == 'true'
 
         if summary:
             return handle_summary_insights()
+        elif query_params.get('series') == 'true':
+            return handle_sentiment_series(query_params)
+        elif query_params.get('latency') == 'true':
+            return handle_latency_insights(query_params)
+        elif query_params.get('analytics') == 'true':
+            return handle_analytics_insights(query_params)
+        elif query_params.get('activity') == 'true':
+            return {'statusCode': 200, 'body': json.dumps({'recentActivity': get_recent_activity(query_params.get('channel'))})}
         else:
-            return handle_detailed_insights()
+            return handle_detailed_insights(query_params)
 
     except Exception as e:
         print(f"Error in insights handler: {e}")
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
 def handle_summary_insights():
-    """Get summary dashboard data."""
-    try:
-        dynamodb = boto3.resource('dynamodb')
+    """Get summary dashboard data.
 
-        # Get feedback records table
-        feedback_table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-feedback-records-{os.environ["ENVIRONMENT"]}')
-
-        # Get sentiment analysis table
-        sentiment_table = dynamodb.Table(f'{os.environ["STACK_NAME"]}-sentiment-analysis-{os.environ["ENVIRONMENT"]}')
-
-        # Calculate metrics
-        total_feedback = get_total_feedback_count(feedback_table)
-        avg_sentiment = get_average_sentiment(sentiment_table)
-        sentiment_trend = get_sentiment_trend(sentiment_table)
-        processing_time = get_average_processing_time(sentiment_table)
-        active_sessions = get_active_sessions_count(sentiment_table)
-        recent_activity = get_recent_activity(feedback_table)
-        alerts = get_system_alerts()
+    Metric providers run concurrently, each with a deadline. Providers raise
+    on errors; a metric that fails or misses its deadline is served from the last value this
+    container computed (or its default) and listed in meta.staleMetrics,
+    so one slow read cannot fail or stall the whole summary.
+    """
+    try:
+        # Every provider reads aggregates maintained from the streams (a few items, no scans)
+        providers = {
+            'counters': (lambda: read_counters('summary'), {}),
+            'sentimentTrend': (get_sentiment_trend, 0),
+            'avgProcessingTime': (get_average_processing_time, 0),
+            'activeSessions': (get_active_sessions_count, 0),
+            'recentActivity': (get_recent_activity, []),
+            'alerts': (get_system_alerts, [])
+        }
+        values, timings, stale = evaluate_metrics(providers)
+        summary_metrics = values['counters']
 
         summary_data = {
-            'totalFeedback': total_feedback,
-            'avgSentiment': avg_sentiment,
-            'sentimentTrend': sentiment_trend,
-            'avgProcessingTime': processing_time,
-            'activeSessions': active_sessions,
-            'recentActivity': recent_activity,
-            'alerts': alerts
+            'totalFeedback': get_total_feedback_count(summary_metrics),
+            'avgSentiment': get_average_sentiment(summary_metrics),
+            'sentimentStdDev': get_sentiment_std_dev(summary_metrics),
+            'sentimentBreakdown': breakdown(summary_metrics, 'label'),
+            'channelBreakdown': breakdown(summary_metrics, 'channel'),
+            'categoryBreakdown': breakdown(summary_metrics, 'category'),
+            'sentimentTrend': values['sentimentTrend'],
+            'avgProcessingTime': values['avgProcessingTime'],
+            'activeSessions': values['activeSessions'],
+            'recentActivity': values['recentActivity'],
+            'alerts': values['alerts'],
+            'meta': {
+                'timingsMs': timings,
+                'staleMetrics': stale,
+                'partial': bool(stale)
+            }
         }
 
-        return {
+        response = {
             'statusCode': 200,
             'body': json.dumps(summary_data)
         }
+        if stale:
+            # Do not let the response cache hold on to a partial summary
+            response['headers'] = {'Cache-Control': 'no-store'}
+        return response
 
     except Exception as e:
         print(f"Error getting summary insights: {e}")
         return {'statusCode': 500, 'body': json.dumps({'error': str(e)})}
 
-def handle_detailed_insights():
-    """Get detailed insights data."""
-    # Placeholder for future detailed insights
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'message': 'Detailed insights not yet implemented'})
-    }
+def evaluate_metrics(providers):
+    """Run metric providers concurrently, each against METRIC_DEADLINE_SECONDS.
 
-def get_total_feedback_count(table):
-    """Get total count of feedback records."""
-    try:
-        response = table.scan(Select='COUNT')
-        return response.get('Count', 0)
-    except Exception as e:
-        print(f"Error getting feedback count: {e}")
-        return 0
+    providers maps a metric name to (callable, default). A provider that
+    raises or misses its deadline is served from the last value it returned
+    in this container, or its default. Returns the values, per-metric
+    timings in milliseconds and the names of metrics that were served stale.
+    """
+    started = time.monotonic()
+    futures = {name: _metric_executor.submit(_timed, provider) for name, (provider, _) in providers.items()}
 
-def get_average_sentiment(table):
-    """Calculate average sentiment score."""
-    try:
-        response = table.scan(
-            ProjectionExpression='sentiment_score'
-        )
+    values, timings, stale = {}, {}, []
+    for name, future in futures.items():
+        try:
+            values[name], elapsed = future.result(timeout=max(started + METRIC_DEADLINE_SECONDS - time.monotonic(), 0))
+            timings[name] = round(elapsed * 1000, 1)
+            _last_metric_values[name] = values[name]
+        except Exception as e:
+            # The provider keeps running in the pool; its result is simply not awaited
+            print(f"Metric {name} failed or missed its {METRIC_DEADLINE_SECONDS}s deadline: {e!r}")
+            values[name] = _last_metric_values.get(name, providers[name][1])
+            timings[name] = round((time.monotonic() - started) * 1000, 1)
+            stale.append(name)
 
-        scores = []
-        for item in response.get('Items', []):
-            score = item.get('sentiment_score')
-            if isinstance(score, (int, float)):
-                scores.append(score)
+    return values, timings, stale
 
-        return sum(scores) / len(scores) if scores else 0.5
-    except Exception as e:
-        print(f"Error calculating average sentiment: {e}")
-        return 0.5
+def _timed(provider):
+    """Call a provider and return (value, elapsed seconds)."""
+    started = time.monotonic()
+    return provider(), time.monotonic() - started
+
+def handle_detailed_insights(query_params):
+    """Get a page of feedback with joined sentiment, filtered through the query indexes.
 
-def get_sentiment_trend(table):
-    """Calculate sentiment trend (simplified)."""
+    Query parameters: one of customer_id, channel, category or label; from/to
+    (ISO timestamps); limit; cursor (the next_cursor of the previous page).
+    """
     try:
-        # Get sentiment scores from last 24 hours vs previous 24 hours
-        now = datetime.utcnow()
-        yesterday = now - timedelta(days=1)
-        two_days_ago = now - timedelta(days=2)
-
-        # This is a simplified trend calculation
-        # In a real implementation, you'd compare time periods
-        return 0.02  # Placeholder positive trend
-    except Exception as e:
-        print(f"Error calculating sentiment trend: {e}")
-        return 0
+        return {
+            'statusCode': 200,
+            'body': json.dumps(query_feedback(query_params))
+        }
+    except QueryError as e:
+        return {'statusCode': 400, 'body': json.dumps({'error': str(e)})}
+
+def get_total_feedback_count(summary_metrics):
+    """Get total count of feedback records from the aggregate counters."""
+    return int(summary_metrics.get('feedback_count', 0))
+
+def get_average_sentiment(summary_metrics):
+    """Calculate average sentiment score from the running score sum."""
+    count = summary_metrics.get('sentiment_count', 0)
+    return summary_metrics.get('score_sum', 0) / count if count > 0 else 0.5
+
+def get_sentiment_std_dev(summary_metrics):
+    """Population standard deviation of sentiment scores from sum and sum of squares."""
+    count = summary_metrics.get('sentiment_count', 0)
+    if count <= 0:
+        return 0.0
+    mean = summary_metrics.get('score_sum', 0) / count
+    return max(summary_metrics.get('score_sum_sq', 0) / count - mean * mean, 0.0) ** 0.5
 
-def get_average_processing_time(table):
-    """Get average processing time (placeholder)."""
-    # This would require tracking processing start/end times
-    return 150  # milliseconds
+def get_sentiment_trend():
+    """Change in average sentiment over the last 24 hours vs the previous 24 hours."""
+    # 48 hourly rollup buckets instead of the raw sentiment rows
+    comparison = compare_windows(timedelta(days=1), resolution='hour')
+    return round(comparison['change'], 4) if comparison['change'] is not None else 0
 
-def get_active_sessions_count(table):
-    """Get count of active sessions (placeholder)."""
+def parse_window(value, default):
+    """Parse a window such as '24h', '7d' or '90m' into a timedelta."""
+    units = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
     try:
-        # Count records from last hour as "active sessions"
-        one_hour_ago = datetime.utcnow() - timedelta(hours=1)
+        if value and value[-1] in units:
+            return timedelta(**{units[value[-1]]: int(value[:-1])})
+    except ValueError:
+        pass
+    return default
 
-        response = table.scan(
-            FilterExpression='analysis_timestamp >= :timestamp',
-            ExpressionAttributeValues={':timestamp': one_hour_ago.isoformat()}
-        )
+def handle_sentiment_series(query_params):
+    """Get a windowed sentiment series from the time-bucketed rollups.
 
-        return len(response.get('Items', []))
-    except Exception as e:
-        print(f"Error getting active sessions: {e}")
-        return 0
+    Query parameters: resolution (minute, hour or day), window (e.g. 24h, 7d)
+    and compare=true to add the previous window for comparison.
+    """
+    resolution = query_params.get('resolution', 'hour')
+    if resolution not in RESOLUTIONS:
+        return {'statusCode': 400, 'body': json.dumps({'error': f'resolution must be one of {sorted(RESOLUTIONS)}'})}
+
+    window = parse_window(query_params.get('window'), timedelta(days=1))
+    bucket_count = window / RESOLUTIONS[resolution][0]
+    if bucket_count < 1 or bucket_count > MAX_SERIES_BUCKETS:
+        return {'statusCode': 400, 'body': json.dumps({'error': f'window must span 1-{MAX_SERIES_BUCKETS} {resolution} buckets'})}
+
+    end = datetime.utcnow()
+    body = {
+        'resolution': resolution,
+        'window': query_params.get('window', '24h'),
+        'series': sentiment_series(end - window, end, resolution)
+    }
+    if query_params.get('compare') == 'true':
+        body['comparison'] = compare_windows(window, resolution, now=end)
+
+    return {'statusCode': 200, 'body': json.dumps(body)}
+
+def get_average_processing_time():
+    """Mean ingestion-to-insight latency (ms) over the last 24 hours."""
+    end = datetime.utcnow()
+    total = latency_summary(end - timedelta(days=1), end).get('total')
+    return total['mean_ms'] if total else 0
+
+def handle_latency_insights(query_params):
+    """Get p50/p90/p99 latency per processing stage over a window (default 24h)."""
+    window = parse_window(query_params.get('window'), timedelta(days=1))
+    if window > timedelta(days=90):
+        return {'statusCode': 400, 'body': json.dumps({'error': 'window must be at most 90d'})}
+
+    end = datetime.utcnow()
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'window': query_params.get('window', '24h'),
+            'stages': latency_summary(end - window, end)
+        })
+    }
+
+def handle_analytics_insights(query_params):
+    """Get multi-month sentiment aggregates from the Parquet analytics export.
+
+    Query parameters: from/to (ISO dates, default the last 180 days), period
+    (day, month or year) and group_by (channel, label, model, category or source).
+    """
+    if not PYARROW_AVAILABLE:
+        return {'statusCode': 503, 'body': json.dumps({'error': 'Analytics export queries are not enabled'})}
+
+    period = query_params.get('period', 'month')
+    group_by = query_params.get('group_by')
+    if period not in PERIODS:
+        return {'statusCode': 400, 'body': json.dumps({'error': f'period must be one of {sorted(PERIODS)}'})}
+    if group_by and group_by not in GROUP_COLUMNS:
+        return {'statusCode': 400, 'body': json.dumps({'error': f'group_by must be one of {sorted(GROUP_COLUMNS)}'})}
 
-def get_recent_activity(table):
-    """Get recent activity feed."""
     try:
-        response = table.scan(
-            ProjectionExpression='feedback_id, timestamp, source, customer_id',
-            Limit=10
-        )
-
-        activities = []
-        for item in response.get('Items', []):
-            activities.append({
-                'description': f"Feedback {item['feedback_id']} processed from {item.get('source', 'unknown')}",
-                'timestamp': item['timestamp']
-            })
-
-        return activities
-    except Exception as e:
-        print(f"Error getting recent activity: {e}")
-        return []
+        end = datetime.fromisoformat(query_params['to']) if query_params.get('to') else datetime.utcnow()
+        start = datetime.fromisoformat(query_params['from']) if query_params.get('from') else end - timedelta(days=180)
+    except ValueError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'from and to must be ISO 8601 dates'})}
+    if not timedelta(0) < end - start <= timedelta(days=MAX_ANALYTICS_DAYS):
+        return {'statusCode': 400, 'body': json.dumps({'error': f'range must span 1-{MAX_ANALYTICS_DAYS} days'})}
+
+    watermark = read_watermark()
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'period': period,
+            'groupBy': group_by,
+            'rows': sentiment_aggregates(start, end, period, group_by or None),
+            'exportedThrough': {
+                name: datetime.utcfromtimestamp(changed_at).isoformat() for name, changed_at in watermark.items()
+            }
+        })
+    }
+
+def get_active_sessions_count():
+    """Sentiment analyses completed in the last hour ("active sessions"), from the minute rollups."""
+    end = datetime.utcnow()
+    return summarize_series(sentiment_series(end - timedelta(hours=1), end, 'minute'))['count']
+
+def get_recent_activity(channel=None):
+    """Get the newest entries of the stream-maintained activity feed."""
+    return [
+        {
+            'description': event['description'],
+            'timestamp': event['timestamp'],
+            'type': event['type'],
+            'channel': event.get('channel')
+        }
+        for event in read_feed(channel, limit=10)
+    ]
 
 def get_system_alerts():
     """Get system alerts (placeholder)."""
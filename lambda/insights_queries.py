@@ -0,0 +1,224 @@
+"""
+Index-backed, cursor-paginated feedback queries for the detailed insights API.
+
+Each filter maps onto a GSI with a time sort key, so a page is one Query
+(plus one BatchGetItem to join the other table) however large the tables
+grow:
+
+    customer_id -> feedback CustomerTimeIndex (customer_id, timestamp)
+    channel     -> feedback ChannelTimeIndex  (channel, timestamp)
+    category    -> feedback CategoryTimeIndex (category, timestamp)
+    label       -> sentiment LabelTimeIndex   (sentiment_label, analysis_timestamp)
+    (none)      -> feedback DateTimeIndex     (feedback_date, timestamp), one day at a time
+
+Existing stacks build the feedback indexes one deploy at a time (see
+FeedbackQueryIndexes in the template); queries that need an index that is
+not built yet are rejected.
+
+Pages are returned newest first. The cursor is an opaque base64 token
+wrapping the index, the day being read and DynamoDB's LastEvaluatedKey.
+"""
+
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+
+from aws_clients import get_resource, get_table, table_name
+from dynamodb_utils import from_dynamodb
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('QUERY_DEFAULT_PAGE_SIZE', '25'))
+MAX_PAGE_SIZE = int(os.environ.get('QUERY_MAX_PAGE_SIZE', '100'))
+
+# Unfiltered date-range queries read one DateTimeIndex partition per day
+MAX_DATE_RANGE_DAYS = int(os.environ.get('QUERY_MAX_DATE_RANGE_DAYS', '31'))
+
+# Feedback indexes in the order the template builds them, and how many exist so far
+FEEDBACK_INDEX_ROLLOUT = ('DateTimeIndex', 'CustomerTimeIndex', 'ChannelTimeIndex', 'CategoryTimeIndex')
+FEEDBACK_QUERY_INDEXES = int(os.environ.get('FEEDBACK_QUERY_INDEXES', str(len(FEEDBACK_INDEX_ROLLOUT))))
+
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_LIMIT = 100
+
+FEEDBACK_FIELDS = ('feedback_id', 'timestamp', 'customer_id', 'channel', 'category', 'rating', 'source', 'feedback_text')
+SENTIMENT_FIELDS = ('feedback_id', 'sentiment_score', 'sentiment_label', 'confidence', 'analysis_timestamp', 'model_used')
+
+# filter parameter -> (table kind, index, partition attribute, sort attribute)
+FILTER_INDEXES = {
+    'customer_id': ('feedback-records', 'CustomerTimeIndex', 'customer_id', 'timestamp'),
+    'channel': ('feedback-records', 'ChannelTimeIndex', 'channel', 'timestamp'),
+    'category': ('feedback-records', 'CategoryTimeIndex', 'category', 'timestamp'),
+    'label': ('sentiment-analysis', 'LabelTimeIndex', 'sentiment_label', 'analysis_timestamp'),
+}
+
+
+class QueryError(ValueError):
+    """Invalid query parameters or cursor (reported as HTTP 400)."""
+
+
+def encode_cursor(state):
+    """Encode pagination state as an opaque URL-safe token."""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor, raising QueryError if it is malformed."""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise QueryError('Invalid cursor') from e
+    if not isinstance(state, dict):
+        raise QueryError('Invalid cursor')
+    return state
+
+
+def require_index(index):
+    """Raise QueryError if a staged feedback index has not been built yet."""
+    if index in FEEDBACK_INDEX_ROLLOUT[FEEDBACK_QUERY_INDEXES:]:
+        raise QueryError(f'This query needs {index}, which is not available yet')
+
+
+def parse_time(value, name):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '')).replace(tzinfo=None)
+    except (AttributeError, ValueError) as e:
+        raise QueryError(f'{name} must be an ISO 8601 timestamp') from e
+
+
+def _projection(fields):
+    names = {f'#p{index}': field for index, field in enumerate(fields)}
+    return ', '.join(names), names
+
+
+def batch_get(kind, feedback_ids, fields):
+    """Fetch rows by feedback_id with BatchGetItem; returns {feedback_id: item}."""
+    dynamodb = get_resource('dynamodb')
+    name = table_name(kind)
+    projection, names = _projection(fields)
+    ids = list(dict.fromkeys(feedback_ids))
+    results = {}
+
+    for start in range(0, len(ids), BATCH_GET_LIMIT):
+        request = {name: {
+            'Keys': [{'feedback_id': feedback_id} for feedback_id in ids[start:start + BATCH_GET_LIMIT]],
+            'ProjectionExpression': projection,
+            'ExpressionAttributeNames': names
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(name, []):
+                results[item['feedback_id']] = from_dynamodb(item)
+            request = response.get('UnprocessedKeys') or None
+
+    return results
+
+
+def _query_page(kind, index, partition_attribute, partition_value, sort_attribute, start, end, limit,
+                exclusive_start_key, fields):
+    """One newest-first Query page on an index within [start, end)."""
+    projection, names = _projection(fields)
+    names.update({'#pk': partition_attribute, '#sk': sort_attribute})
+    request = {
+        'IndexName': index,
+        'KeyConditionExpression': '#pk = :pk AND #sk BETWEEN :start AND :end',
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': {':pk': partition_value, ':start': start.isoformat(), ':end': end.isoformat()},
+        'ProjectionExpression': projection,
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if exclusive_start_key:
+        request['ExclusiveStartKey'] = exclusive_start_key
+
+    response = get_table(table_name(kind)).query(**request)
+    return from_dynamodb(response.get('Items', [])), response.get('LastEvaluatedKey')
+
+
+def query_feedback(params):
+    """Run a detailed insights query.
+
+    params: at most one of customer_id, channel, category or label; optional
+    from/to ISO timestamps (default: last 7 days); limit; cursor.
+    Returns {'items': [...], 'count': n, 'next_cursor': token or None}.
+    """
+    filters = [name for name in FILTER_INDEXES if params.get(name)]
+    if len(filters) > 1:
+        raise QueryError(f'Use at most one of {", ".join(FILTER_INDEXES)} per query')
+
+    try:
+        limit = int(params.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        raise QueryError('limit must be an integer') from e
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    end = parse_time(params['to'], 'to') if params.get('to') else datetime.utcnow()
+    start = parse_time(params['from'], 'from') if params.get('from') else end - timedelta(days=7)
+    if start > end:
+        raise QueryError('from must not be after to')
+
+    cursor = decode_cursor(params['cursor']) if params.get('cursor') else {}
+
+    if filters:
+        return _query_filtered(filters[0], params[filters[0]], start, end, limit, cursor)
+    return _query_by_date(start, end, limit, cursor)
+
+
+def _query_filtered(filter_name, value, start, end, limit, cursor):
+    kind, index, partition_attribute, sort_attribute = FILTER_INDEXES[filter_name]
+    require_index(index)
+    if cursor and cursor.get('i') != index:
+        raise QueryError('Cursor does not belong to this query')
+
+    if kind == 'sentiment-analysis':
+        # Page over sentiment rows, then join the feedback they belong to
+        sentiments, last_key = _query_page(kind, index, partition_attribute, value, sort_attribute,
+                                           start, end, limit, cursor.get('k'), SENTIMENT_FIELDS)
+        feedback = batch_get('feedback-records', [row['feedback_id'] for row in sentiments], FEEDBACK_FIELDS)
+        items = [{**feedback.get(row['feedback_id'], {'feedback_id': row['feedback_id']}), 'sentiment': row}
+                 for row in sentiments]
+    else:
+        rows, last_key = _query_page(kind, index, partition_attribute, value, sort_attribute,
+                                     start, end, limit, cursor.get('k'), FEEDBACK_FIELDS)
+        items = _join_sentiment(rows)
+
+    return {
+        'items': items,
+        'count': len(items),
+        'next_cursor': encode_cursor({'i': index, 'k': last_key}) if last_key else None
+    }
+
+
+def _query_by_date(start, end, limit, cursor):
+    index = 'DateTimeIndex'
+    require_index(index)
+    if cursor and cursor.get('i') != index:
+        raise QueryError('Cursor does not belong to this query')
+    if (end.date() - start.date()).days >= MAX_DATE_RANGE_DAYS:
+        raise QueryError(f'Date ranges without a filter are limited to {MAX_DATE_RANGE_DAYS} days')
+
+    day = datetime.fromisoformat(cursor['d']) if cursor.get('d') else datetime.combine(end.date(), datetime.min.time())
+    exclusive_start_key = cursor.get('k')
+    rows = []
+
+    # Walk days newest first until the page is full
+    while day.date() >= start.date() and len(rows) < limit:
+        page, last_key = _query_page('feedback-records', index, 'feedback_date', day.date().isoformat(), 'timestamp',
+                                     start, end, limit - len(rows), exclusive_start_key, FEEDBACK_FIELDS)
+        rows.extend(page)
+        if last_key:
+            exclusive_start_key = last_key
+            break
+        day, exclusive_start_key = day - timedelta(days=1), None
+
+    next_cursor = None
+    if exclusive_start_key or day.date() >= start.date():
+        next_cursor = encode_cursor({'i': index, 'd': day.date().isoformat(), 'k': exclusive_start_key})
+
+    items = _join_sentiment(rows)
+    return {'items': items, 'count': len(items), 'next_cursor': next_cursor}
+
+
+def _join_sentiment(rows):
+    sentiments = batch_get('sentiment-analysis', [row['feedback_id'] for row in rows], SENTIMENT_FIELDS)
+    return [{**row, 'sentiment': sentiments.get(row['feedback_id'])} for row in rows]
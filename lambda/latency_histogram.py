@@ -0,0 +1,133 @@
+"""
+Processing latency stages and mergeable log-bucket histograms.
+
+The agent invoker stamps each feedback item as it moves through the
+pipeline and stores the per-stage durations on its sentiment row
+(stage_timings_ms). The metrics aggregator folds those durations into
+hourly histogram items in the metrics table. Bucket i counts durations in
+[GROWTH^i, GROWTH^(i+1)) milliseconds, so every histogram uses the same
+boundaries and merging is just adding counts. That makes it possible to
+ADD into shared items and to combine any range of hours. Percentiles are
+accurate to within the bucket width (about +/-6% with GROWTH=1.12).
+"""
+
+import math
+from datetime import datetime
+
+from metrics_store import counter_update, read_unsharded
+from sentiment_rollups import RESOLUTIONS, bucket_start, parse_timestamp
+
+HISTOGRAM_GROWTH = 1.12
+HISTOGRAM_RETENTION_SECONDS = 90 * 24 * 3600
+
+# Stage name -> (start mark, end mark) in the timings recorded by the invoker
+LATENCY_STAGES = {
+    'stream_delay': ('ingested_at_ms', 'received_at_ms'),
+    'pre_agent': ('received_at_ms', 'agent_start_ms'),
+    'agent': ('agent_start_ms', 'agent_end_ms'),
+    'store': ('agent_end_ms', 'written_at_ms'),
+    'total': ('ingested_at_ms', 'written_at_ms'),
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+def stage_durations(timings):
+    """Durations in ms for every stage whose start and end marks were recorded."""
+    durations = {}
+    for stage, (start_mark, end_mark) in LATENCY_STAGES.items():
+        start, end = timings.get(start_mark), timings.get(end_mark)
+        if start is not None and end is not None and end >= start:
+            durations[stage] = int(end - start)
+    return durations
+
+
+def bucket_index(duration_ms):
+    """Histogram bucket for a duration."""
+    if duration_ms < 1:
+        return 0
+    return int(math.log(duration_ms) / math.log(HISTOGRAM_GROWTH))
+
+
+def bucket_value(index):
+    """Representative duration of a bucket (geometric midpoint)."""
+    return HISTOGRAM_GROWTH ** (index + 0.5)
+
+
+def latency_key(start):
+    return f"latency#hour#{start.strftime('%Y-%m-%dT%H')}"
+
+
+def add_latency_contribution(item, latency_deltas):
+    """Add one sentiment row's stage durations to its hour's histogram deltas."""
+    durations = item.get('stage_timings_ms') if item else None
+    timestamp = parse_timestamp(item.get('analysis_timestamp')) if item else None
+    if not durations or timestamp is None:
+        return
+
+    deltas = latency_deltas.setdefault(bucket_start(timestamp, 'hour'), {})
+    for stage, duration in durations.items():
+        duration = float(duration)
+        for name, value in (
+            (f'count:{stage}', 1),
+            (f'sum:{stage}', duration),
+            (f'bucket:{stage}:{bucket_index(duration)}', 1),
+        ):
+            deltas[name] = deltas.get(name, 0) + value
+
+
+def latency_updates(latency_deltas):
+    """Counter updates (for metrics_store.apply_counter_updates) for the histogram deltas."""
+    return [
+        counter_update(
+            latency_key(start), deltas, shard_id=0,
+            expires_at=int((start - datetime(1970, 1, 1)).total_seconds()) + HISTOGRAM_RETENTION_SECONDS
+        )
+        for start, deltas in latency_deltas.items()
+    ]
+
+
+def percentile(buckets, count, fraction):
+    """Value at a percentile of a {bucket index: count} histogram."""
+    target = fraction * count
+    seen = 0
+    ordered = sorted(buckets)
+    for index in ordered:
+        seen += buckets[index]
+        if seen >= target:
+            return bucket_value(index)
+    return bucket_value(ordered[-1]) if ordered else 0.0
+
+
+def latency_summary(start, end):
+    """Merge the hourly histograms in [start, end) into per-stage statistics.
+
+    Returns {stage: {count, mean_ms, p50_ms, p90_ms, p99_ms}}.
+    """
+    hours = []
+    current = bucket_start(start, 'hour')
+    while current < end:
+        hours.append(current)
+        current += RESOLUTIONS['hour'][0]
+
+    merged = {}
+    for counters in read_unsharded([latency_key(hour) for hour in hours]).values():
+        for name, value in counters.items():
+            merged[name] = merged.get(name, 0) + value
+
+    summary = {}
+    for stage in LATENCY_STAGES:
+        count = merged.get(f'count:{stage}', 0)
+        if count <= 0:
+            continue
+        buckets = {
+            int(name.rsplit(':', 1)[1]): value
+            for name, value in merged.items()
+            if name.startswith(f'bucket:{stage}:') and value > 0
+        }
+        summary[stage] = {
+            'count': count,
+            'mean_ms': round(merged.get(f'sum:{stage}', 0) / count, 1),
+            **{f'p{p}_ms': round(percentile(buckets, count, p / 100), 1) for p in PERCENTILES}
+        }
+    return summary
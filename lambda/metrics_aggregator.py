@@ -0,0 +1,134 @@
+import json
+import os
+from collections import Counter
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from metrics_store import apply_counter_updates, batch_shard, counter_update
+from sentiment_rollups import add_rollup_contribution, rollup_updates
+from activity_feed import analysis_event, append_events, feedback_event
+from latency_histogram import add_latency_contribution, latency_updates
+from analytics_query import PYARROW_AVAILABLE
+from analytics_exporter import export_stream_batch
+
+SUMMARY_METRIC = 'summary'
+
+_deserializer = TypeDeserializer()
+
+def lambda_handler(event, context):
+    """Maintain aggregate dashboard metrics from the feedback and sentiment table streams.
+
+    When the analytics layer (pyarrow) is attached, the batch is also written
+    to the Parquet export, so the export does not need its own stream reader.
+    """
+    records = event.get('Records', [])
+    deltas = Counter()
+    bucket_deltas = {}
+    latency_deltas = {}
+    events = []
+
+    try:
+        for record in records:
+            source_arn = record.get('eventSourceARN', '')
+            if f'-feedback-records-{os.environ["ENVIRONMENT"]}/' in source_arn:
+                apply_feedback_record(record, deltas, events)
+            elif f'-sentiment-analysis-{os.environ["ENVIRONMENT"]}/' in source_arn:
+                apply_sentiment_record(record, deltas, bucket_deltas, latency_deltas, events)
+
+        # The export overwrites its own files on a retry, so it goes first: if it
+        # fails, the batch is retried before anything has been counted
+        if PYARROW_AVAILABLE and os.environ.get('INSIGHTS_BUCKET_NAME'):
+            files = export_stream_batch(records)
+            print(f"Exported {len(records)} stream records into {files} Parquet files")
+
+        # Transactions are keyed by the batch, so a retry of a batch (within
+        # DynamoDB's 10-minute token window) does not count it again
+        batch_id = stream_batch_id(records)
+        summary_shard = batch_shard(batch_id, SUMMARY_METRIC) if batch_id else None
+        apply_counter_updates(
+            [counter_update(SUMMARY_METRIC, deltas, shard_id=summary_shard)]
+            + rollup_updates(bucket_deltas) + latency_updates(latency_deltas),
+            batch_id=batch_id
+        )
+
+        # The activity feed is best effort: retrying the batch for it would count it twice
+        if events:
+            try:
+                append_events(events)
+            except Exception as e:
+                print(f"Error updating the activity feed: {e}")
+
+        print(f"Aggregated {len(records)} stream records into {len(deltas)} counters and {len(bucket_deltas)} time buckets")
+        return {'statusCode': 200, 'body': json.dumps({'records': len(records), 'counters': len(deltas)})}
+
+    except Exception as e:
+        print(f"Error aggregating metrics: {e}")
+        raise
+
+def stream_batch_id(records):
+    """Identity of a stream batch: its source shard and first and last sequence numbers."""
+    sequences = [record.get('dynamodb', {}).get('SequenceNumber') for record in records]
+    if not records or not sequences[0] or not sequences[-1]:
+        return None
+    return f"{records[0].get('eventSourceARN', '')}#{sequences[0]}#{sequences[-1]}"
+
+def stream_image(record, image):
+    """Deserialize a stream record image into plain Python values."""
+    raw = record.get('dynamodb', {}).get(image)
+    if not raw:
+        return None
+    return {name: _deserializer.deserialize(value) for name, value in raw.items()}
+
+def feedback_category(item):
+    """Feedback category, stored top-level or in metadata."""
+    metadata = item.get('metadata') if isinstance(item.get('metadata'), dict) else {}
+    return item.get('category') or metadata.get('category')
+
+def apply_feedback_record(record, deltas, events):
+    """Count inserted (and subtract removed) feedback records."""
+    if record['eventName'] == 'INSERT':
+        item, sign = stream_image(record, 'NewImage'), 1
+    elif record['eventName'] == 'REMOVE':
+        item, sign = stream_image(record, 'OldImage'), -1
+    else:
+        return
+
+    if not item:
+        return
+
+    deltas['feedback_count'] += sign
+    if sign > 0 and item.get('feedback_id'):
+        events.append(feedback_event(item))
+    if item.get('channel'):
+        deltas[f"channel:{item['channel']}"] += sign
+    category = feedback_category(item)
+    if category:
+        deltas[f'category:{category}'] += sign
+
+def sentiment_contribution(item, sign, deltas):
+    """Add (sign=1) or remove (sign=-1) one sentiment row's contribution."""
+    if not item or item.get('sentiment_score') is None:
+        return
+
+    score = float(item['sentiment_score'])
+    deltas['sentiment_count'] += sign
+    deltas['score_sum'] += sign * score
+    deltas['score_sum_sq'] += sign * score * score
+    deltas[f"label:{item.get('sentiment_label', 'unknown')}"] += sign
+    if item.get('channel'):
+        deltas[f"channel_sentiment_count:{item['channel']}"] += sign
+        deltas[f"channel_score_sum:{item['channel']}"] += sign * score
+
+def apply_sentiment_record(record, deltas, bucket_deltas, latency_deltas, events):
+    """Apply a sentiment row insert, overwrite or delete to the running sums and time buckets."""
+    # An overwrite (re-analysis) replaces the old row's contribution
+    old_item, new_item = stream_image(record, 'OldImage'), stream_image(record, 'NewImage')
+    sentiment_contribution(old_item, -1, deltas)
+    sentiment_contribution(new_item, 1, deltas)
+    add_rollup_contribution(old_item, -1, bucket_deltas)
+    add_rollup_contribution(new_item, 1, bucket_deltas)
+    if record['eventName'] == 'INSERT':
+        # Latency is measured once per feedback; re-analysis overwrites are not re-counted
+        add_latency_contribution(new_item, latency_deltas)
+    if new_item and new_item.get('feedback_id'):
+        events.append(analysis_event(new_item))
@@ -0,0 +1,171 @@
+"""
+Sharded counters in the InsightModAI metrics table.
+
+Each metric item (e.g. 'summary') is split over METRIC_SHARDS items that
+share a metric_key and differ by shard_id. Writers ADD their deltas to a
+random shard so no single item becomes a hot key; readers Query the
+metric_key and sum the shards, which is a constant handful of items however
+much feedback has been processed. Items that are written rarely enough not
+to need sharding (e.g. time buckets) use shard 0 and can be read by key.
+"""
+
+import hashlib
+import os
+import random
+import uuid
+
+from boto3.dynamodb.types import TypeSerializer
+
+from aws_clients import get_client, get_resource, get_table, table_name
+from dynamodb_utils import from_dynamodb, to_dynamodb
+
+METRIC_SHARDS = int(os.environ.get('METRIC_SHARDS', '10'))
+
+# TransactWriteItems accepts at most 100 actions; BatchGetItem at most 100 keys
+TRANSACT_WRITE_LIMIT = 100
+BATCH_GET_LIMIT = 100
+
+_serializer = TypeSerializer()
+
+_TOKEN_NAMESPACE = uuid.UUID('5b0b8e8a-2f7c-4f43-9a57-7c1f4c1e6d2a')
+
+
+def counter_update(metric_key, deltas, shard_id=None, expires_at=None):
+    """Build the UpdateItem parameters that ADD deltas to one shard of a metric item.
+
+    Returns None when there is nothing to add.
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return None
+
+    names, values, clauses = {}, {}, []
+    for index, (name, value) in enumerate(sorted(deltas.items())):
+        # Attribute names such as 'channel:email' need placeholders
+        names[f'#a{index}'] = name
+        values[f':v{index}'] = value
+        clauses.append(f'#a{index} :v{index}')
+
+    expression = 'ADD ' + ', '.join(clauses)
+    if expires_at is not None:
+        expression = 'SET expires_at = :expires_at ' + expression
+        values[':expires_at'] = int(expires_at)
+
+    return {
+        'Key': {'metric_key': metric_key, 'shard_id': random.randrange(METRIC_SHARDS) if shard_id is None else shard_id},
+        'UpdateExpression': expression,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': to_dynamodb(values)
+    }
+
+
+def add_counters(metric_key, deltas, shard_id=None, expires_at=None):
+    """Atomically ADD numeric deltas to one shard of a metric item."""
+    apply_counter_updates([counter_update(metric_key, deltas, shard_id, expires_at)])
+
+
+def batch_shard(batch_id, metric_key):
+    """Shard a batch writes a sharded metric to, fixed so a retry sends the same request."""
+    digest = hashlib.sha256(f'{batch_id}#{metric_key}'.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % METRIC_SHARDS
+
+
+def apply_counter_updates(updates, batch_id=None):
+    """Apply several counter updates with TransactWriteItems (in chunks of 100).
+
+    Without a batch_id a single update is a plain UpdateItem and nothing
+    protects against a retry counting twice.
+
+    With a batch_id (e.g. derived from a stream batch's sequence range) every
+    chunk is sent with a ClientRequestToken built from the batch_id and the
+    chunk index. DynamoDB treats a repeated token as a no-op for 10 minutes,
+    so a retried batch re-sends already committed chunks without applying
+    them again, and a commit whose response was lost is not counted twice.
+    The updates must then be deterministic for the batch (see batch_shard).
+    A retry arriving after the token window can count committed chunks of a
+    multi-chunk batch again, so counting is at-least-once beyond it.
+    """
+    updates = [update for update in updates if update]
+    if not updates:
+        return
+
+    metrics_table = table_name('metrics')
+    if len(updates) == 1 and batch_id is None:
+        get_table(metrics_table).update_item(**updates[0])
+        return
+
+    client = get_client('dynamodb')
+    for index, start in enumerate(range(0, len(updates), TRANSACT_WRITE_LIMIT)):
+        request = {'TransactItems': [
+            {'Update': {
+                'TableName': metrics_table,
+                'Key': _serialize(update['Key']),
+                'UpdateExpression': update['UpdateExpression'],
+                'ExpressionAttributeNames': update['ExpressionAttributeNames'],
+                'ExpressionAttributeValues': _serialize(update['ExpressionAttributeValues'])
+            }}
+            for update in updates[start:start + TRANSACT_WRITE_LIMIT]
+        ]}
+        if batch_id is not None:
+            request['ClientRequestToken'] = request_token(batch_id, index)
+        client.transact_write_items(**request)
+
+
+def request_token(batch_id, chunk_index):
+    """ClientRequestToken (at most 36 characters) for one chunk of a batch."""
+    return str(uuid.uuid5(_TOKEN_NAMESPACE, f'{batch_id}#{chunk_index}'))
+
+
+def _serialize(values):
+    """Convert a resource-style dict into low-level attribute values."""
+    return {name: _serializer.serialize(value) for name, value in values.items()}
+
+
+def _numeric_fields(item):
+    return {
+        name: value for name, value in from_dynamodb(item).items()
+        if name not in ('metric_key', 'shard_id', 'expires_at') and isinstance(value, (int, float))
+    }
+
+
+def read_counters(metric_key):
+    """Sum all shards of a metric item into one {name: value} dict."""
+    table = get_table(table_name('metrics'))
+    totals = {}
+
+    query = {'KeyConditionExpression': 'metric_key = :key', 'ExpressionAttributeValues': {':key': metric_key}}
+    while True:
+        response = table.query(**query)
+        for item in response.get('Items', []):
+            for name, value in _numeric_fields(item).items():
+                totals[name] = totals.get(name, 0) + value
+        if 'LastEvaluatedKey' not in response:
+            return totals
+        query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def read_unsharded(metric_keys):
+    """Read shard 0 of several metric items with BatchGetItem; returns {metric_key: counters}."""
+    dynamodb = get_resource('dynamodb')
+    metrics_table = table_name('metrics')
+    keys = list(dict.fromkeys(metric_keys))
+    results = {}
+
+    for start in range(0, len(keys), BATCH_GET_LIMIT):
+        request = {metrics_table: {'Keys': [{'metric_key': key, 'shard_id': 0} for key in keys[start:start + BATCH_GET_LIMIT]]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(metrics_table, []):
+                results[item['metric_key']] = _numeric_fields(item)
+            request = response.get('UnprocessedKeys') or None
+
+    return results
+
+
+def breakdown(counters, prefix):
+    """Extract counters named '<prefix>:<value>' as {value: count}."""
+    return {
+        name[len(prefix) + 1:]: value
+        for name, value in counters.items()
+        if name.startswith(prefix + ':')
+    }
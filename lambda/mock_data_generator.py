@@ -1,10 +1,11 @@
 import json
-import boto3
 import random
 import os
 import uuid
 from datetime import datetime, timedelta
 
+from aws_clients import get_client
+
 def lambda_handler(event, context):
     """
     Periodically generate and send mock feedback data to the feedback ingestion endpoint.
@@ -144,7 +145,7 @@ def generate_random_feedback():
 
 def send_feedback(feedback):
     """Send feedback to the feedback ingestion Lambda function."""
-    lambda_client = boto3.client('lambda')
+    lambda_client = get_client('lambda')
 
     try:
         # Prepare payload for feedback ingestion function
@@ -0,0 +1,128 @@
+"""
+TTL-cached SSM Parameter Store access for the InsightModAI Lambda functions.
+
+All /insightmodai/* parameters are prefetched with one paginated
+GetParametersByPath call on first use in a container, missing parameters are
+negatively cached, and callers can invalidate an entry when a value turns out
+to be stale (e.g. an agent runtime ARN that no longer exists).
+"""
+
+import os
+import threading
+import time
+
+from aws_clients import get_client
+
+PARAMETER_PREFIX = '/insightmodai/'
+PARAMETER_CACHE_TTL_SECONDS = int(os.environ.get('PARAMETER_CACHE_TTL_SECONDS', '300'))
+PARAMETER_NEGATIVE_TTL_SECONDS = int(os.environ.get('PARAMETER_NEGATIVE_TTL_SECONDS', '60'))
+
+_MISSING = object()
+
+
+class ParameterCache:
+    """In-container parameter cache with positive and negative TTLs."""
+
+    def __init__(self, prefix=PARAMETER_PREFIX, ttl=PARAMETER_CACHE_TTL_SECONDS,
+                 negative_ttl=PARAMETER_NEGATIVE_TTL_SECONDS):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = {}
+        self._prefetched_until = 0
+        self._next_prefetch_at = 0
+        self._lock = threading.Lock()
+
+    def prefetch(self):
+        """Load every parameter under the prefix in one paginated listing."""
+        ssm = get_client('ssm')
+        now = time.time()
+        values = {}
+
+        paginator = ssm.get_paginator('get_parameters_by_path')
+        for page in paginator.paginate(Path=self.prefix.rstrip('/'), Recursive=True):
+            for parameter in page.get('Parameters', []):
+                values[parameter['Name']] = parameter['Value']
+
+        with self._lock:
+            for name, value in values.items():
+                self._entries[name] = (value, now + self.ttl)
+            self._prefetched_until = now + self.ttl
+
+        print(f"Prefetched {len(values)} SSM parameters under {self.prefix}")
+        return values
+
+    def get(self, name):
+        """Get a parameter value, or None if the parameter does not exist."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[1] > now:
+                return None if entry[0] is _MISSING else entry[0]
+            prefetch_due = (name.startswith(self.prefix)
+                            and self._prefetched_until <= now
+                            and self._next_prefetch_at <= now)
+
+        if prefetch_due:
+            try:
+                self.prefetch()
+            except Exception as e:
+                # Fall back to a single GetParameter below and back off the listing
+                print(f"Error prefetching SSM parameters: {e}")
+                with self._lock:
+                    self._next_prefetch_at = now + self.negative_ttl
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[1] > now:
+                return None if entry[0] is _MISSING else entry[0]
+            if name.startswith(self.prefix) and self._prefetched_until > now:
+                # The prefix listing is authoritative, so the parameter does not exist
+                self._entries[name] = (_MISSING, now + self.negative_ttl)
+                return None
+
+        return self._fetch(name)
+
+    def _fetch(self, name):
+        """Fetch a single parameter and cache the result."""
+        ssm = get_client('ssm')
+        try:
+            value = ssm.get_parameter(Name=name)['Parameter']['Value']
+            expires_at, cached = time.time() + self.ttl, value
+        except ssm.exceptions.ParameterNotFound:
+            value = None
+            expires_at, cached = time.time() + self.negative_ttl, _MISSING
+
+        with self._lock:
+            self._entries[name] = (cached, expires_at)
+        return value
+
+    def invalidate(self, name=None):
+        """Drop one cached parameter, or everything when name is None."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                self._prefetched_until = 0
+            else:
+                self._entries.pop(name, None)
+                if name.startswith(self.prefix):
+                    # Force a fresh lookup instead of trusting the old listing
+                    self._prefetched_until = 0
+
+
+_cache = ParameterCache()
+
+
+def get_parameter(name):
+    """Get a cached parameter value, or None if it does not exist."""
+    return _cache.get(name)
+
+
+def invalidate_parameter(name=None):
+    """Invalidate a cached parameter (or the whole cache)."""
+    _cache.invalidate(name)
+
+
+def agent_runtime_arn_parameter():
+    """SSM parameter name holding the AgentCore runtime ARN."""
+    return f'{PARAMETER_PREFIX}agent-runtime-arn-{os.environ["ENVIRONMENT"]}'
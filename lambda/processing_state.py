@@ -0,0 +1,162 @@
+"""
+Idempotent processing claims for feedback analysis.
+
+API feedback reaches the agent invoker twice: once from the asynchronous
+invoke in feedback ingestion and once from the DynamoDB stream. Before
+analyzing a feedback item the invoker claims it with a conditional write on
+the processing-state table:
+
+    pending -> in_progress (lease) -> done
+                    |
+                    +-> pending (released on failure)
+
+A claim succeeds when there is no state yet, the item was released, the
+lease has expired, or the same trigger path already holds it (so its own
+retries can resume). A failed claim reports whether the item is finished
+(the duplicate trigger is a no-op) or still held by the other path (the
+stream retries the record until the holder completes or releases it).
+
+The same claims and a saved checkpoint also guard resumable jobs such as
+bulk S3 ingestion, keyed 'ingest#s3://<bucket>/<key>#<etag>'.
+"""
+
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_table, table_name
+from dynamodb_utils import BatchWriter, from_dynamodb, to_dynamodb
+
+# Slightly longer than the invoker timeout so a crashed holder's lease lapses
+PROCESSING_LEASE_SECONDS = int(os.environ.get('PROCESSING_LEASE_SECONDS', '330'))
+PROCESSING_STATE_TTL_SECONDS = int(os.environ.get('PROCESSING_STATE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+STATE_PENDING = 'pending'
+STATE_IN_PROGRESS = 'in_progress'
+STATE_DONE = 'done'
+
+CLAIM_ACQUIRED = 'acquired'
+CLAIM_DONE = 'done'
+CLAIM_HELD = 'held'
+
+
+def _table():
+    return get_table(table_name('processing-state'))
+
+
+def claim(feedback_id, owner):
+    """Try to claim a feedback item for processing.
+
+    Returns CLAIM_ACQUIRED if the caller now holds the lease, CLAIM_DONE if
+    the item is already finished, or CLAIM_HELD if another owner holds it.
+    """
+    now = int(time.time())
+    try:
+        _table().update_item(
+            Key={'feedback_id': feedback_id},
+            UpdateExpression=(
+                'SET #state = :in_progress, #owner = :owner, lease_expires_at = :lease, '
+                'claimed_at = :now, expires_at = :expires, attempts = if_not_exists(attempts, :zero) + :one'
+            ),
+            ConditionExpression=(
+                'attribute_not_exists(feedback_id) OR '
+                '(#state <> :done AND (#state = :pending OR #owner = :owner OR lease_expires_at < :now))'
+            ),
+            ExpressionAttributeNames={'#state': 'state', '#owner': 'owner'},
+            ExpressionAttributeValues={
+                ':in_progress': STATE_IN_PROGRESS,
+                ':pending': STATE_PENDING,
+                ':done': STATE_DONE,
+                ':owner': owner,
+                ':lease': now + PROCESSING_LEASE_SECONDS,
+                ':now': now,
+                ':expires': now + PROCESSING_STATE_TTL_SECONDS,
+                ':zero': 0,
+                ':one': 1
+            }
+        )
+        return CLAIM_ACQUIRED
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            raise
+
+    item = _table().get_item(Key={'feedback_id': feedback_id}, ConsistentRead=True).get('Item') or {}
+    return CLAIM_DONE if item.get('state') == STATE_DONE else CLAIM_HELD
+
+
+def release(feedback_id, owner):
+    """Return a claimed item to pending so a retry can pick it up."""
+    try:
+        _table().update_item(
+            Key={'feedback_id': feedback_id},
+            UpdateExpression='SET #state = :pending REMOVE lease_expires_at',
+            ConditionExpression='#state = :in_progress AND #owner = :owner',
+            ExpressionAttributeNames={'#state': 'state', '#owner': 'owner'},
+            ExpressionAttributeValues={
+                ':pending': STATE_PENDING,
+                ':in_progress': STATE_IN_PROGRESS,
+                ':owner': owner
+            }
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            print(f"Error releasing processing claim for {feedback_id}: {e}")
+
+
+def complete(feedback_ids, owner):
+    """Mark claimed items done with one BatchWriteItem per 25 items."""
+    now = int(time.time())
+    writer = BatchWriter(table_name('processing-state'))
+    for feedback_id in feedback_ids:
+        writer.put({
+            'feedback_id': feedback_id,
+            'state': STATE_DONE,
+            'owner': owner,
+            'completed_at': now,
+            'expires_at': now + PROCESSING_STATE_TTL_SECONDS
+        })
+    for item in writer.flush():
+        # Leave the lease to expire; a later duplicate re-analyzes at worst
+        print(f"Could not mark {item['feedback_id']} as done")
+
+
+def get_checkpoint(job_id):
+    """Saved state and progress of a resumable job (e.g. a bulk S3 ingestion), or None."""
+    item = _table().get_item(Key={'feedback_id': job_id}, ConsistentRead=True).get('Item')
+    return from_dynamodb(item) if item else None
+
+
+def save_checkpoint(job_id, owner, progress, state=None):
+    """Record a claimed job's progress, optionally moving it to a new state.
+
+    Conditional on the caller still owning the claim, so a run whose lease
+    was taken over cannot overwrite the newer run's progress. Returns False
+    if the claim was lost.
+    """
+    now = int(time.time())
+    values = {':owner': owner, ':now': now, ':expires': now + PROCESSING_STATE_TTL_SECONDS}
+    names = {'#owner': 'owner'}
+    assignments = ['updated_at = :now', 'expires_at = :expires']
+    for index, (name, value) in enumerate(progress.items()):
+        names[f'#p{index}'] = name
+        values[f':p{index}'] = value
+        assignments.append(f'#p{index} = :p{index}')
+    if state:
+        names['#state'] = 'state'
+        values[':state'] = state
+        assignments.append('#state = :state')
+
+    try:
+        _table().update_item(
+            Key={'feedback_id': job_id},
+            UpdateExpression='SET ' + ', '.join(assignments),
+            ConditionExpression='#owner = :owner',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=to_dynamodb(values)
+        )
+        return True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
@@ -0,0 +1,174 @@
+"""
+Two-tier response cache with stale-while-revalidate and ETags.
+
+Responses are keyed by a hash of the request's query parameters. An
+in-container tier answers repeat polls without any I/O; a shared tier in the
+result-cache table lets every container reuse a response computed by one of
+them. Each entry is fresh for RESPONSE_CACHE_FRESH_SECONDS and may then be
+served stale for RESPONSE_CACHE_STALE_SECONDS while a single request, holding
+a short refresh lease, recomputes it. Responses carry an ETag; a request
+whose If-None-Match matches gets a 304 with no body.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_table, table_name
+
+RESPONSE_CACHE_FRESH_SECONDS = int(os.environ.get('RESPONSE_CACHE_FRESH_SECONDS', '15'))
+RESPONSE_CACHE_STALE_SECONDS = int(os.environ.get('RESPONSE_CACHE_STALE_SECONDS', '120'))
+RESPONSE_CACHE_REFRESH_LEASE_SECONDS = int(os.environ.get('RESPONSE_CACHE_REFRESH_LEASE_SECONDS', '20'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+
+
+def response_etag(body):
+    """Strong ETag for a response body."""
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class ResponseCache:
+    """Caches 200 responses of a request handler by query parameters.
+
+    Responses marked Cache-Control: no-store are passed through uncached.
+    """
+
+    def __init__(self, namespace, fresh_seconds=RESPONSE_CACHE_FRESH_SECONDS,
+                 stale_seconds=RESPONSE_CACHE_STALE_SECONDS, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def cache_key(self, query_params):
+        material = json.dumps(query_params or {}, sort_keys=True)
+        return f'{self.namespace}#' + hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def respond(self, query_params, if_none_match, compute):
+        """Answer a request from the cache, computing (and caching) on a miss.
+
+        compute() must return an API Gateway proxy response dict. Returns the
+        response with ETag, Cache-Control and X-Cache headers added.
+        """
+        key = self.cache_key(query_params)
+        now = time.time()
+
+        entry, tier = self._get_memory(key), 'memory'
+        if entry is None or entry['fresh_until'] <= now:
+            shared = self._get_shared(key)
+            if shared and (entry is None or shared['fresh_until'] > entry['fresh_until']):
+                entry, tier = shared, 'shared'
+                self._remember(key, entry)
+
+        if entry and entry['fresh_until'] > now:
+            return self._cached_response(entry, if_none_match, f'HIT-{tier}')
+
+        if entry and entry['stale_until'] > now and not self._acquire_refresh_lease(key, now):
+            # Another request is already recomputing this entry
+            return self._cached_response(entry, if_none_match, f'STALE-{tier}')
+
+        response = compute()
+        if response.get('statusCode') != 200 or (response.get('headers') or {}).get('Cache-Control') == 'no-store':
+            return response
+
+        entry = self._store(key, response)
+        return self._cached_response(entry, if_none_match, 'MISS')
+
+    def _cached_response(self, entry, if_none_match, cache_status):
+        headers = {
+            'ETag': entry['etag'],
+            'Cache-Control': f'max-age={self.fresh_seconds}, stale-while-revalidate={self.stale_seconds}',
+            'X-Cache': cache_status
+        }
+        if etag_matches(if_none_match, entry['etag']):
+            return {'statusCode': 304, 'headers': headers, 'body': ''}
+        return {'statusCode': 200, 'headers': {**entry.get('headers', {}), **headers}, 'body': entry['body']}
+
+    def _get_memory(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key):
+        try:
+            item = get_table(table_name('result-cache')).get_item(Key={'cache_key': key}).get('Item')
+        except Exception as e:
+            print(f"Error reading shared response cache: {e}")
+            return None
+        if not item or int(item.get('expires_at', 0)) <= time.time():
+            return None
+        return {
+            'body': item['body'],
+            'headers': json.loads(item.get('headers', '{}')),
+            'etag': item['etag'],
+            'fresh_until': float(item['fresh_until']),
+            'stale_until': float(item['expires_at'])
+        }
+
+    def _acquire_refresh_lease(self, key, now):
+        """Let one request recompute a stale entry; the rest keep serving it."""
+        try:
+            get_table(table_name('result-cache')).update_item(
+                Key={'cache_key': key},
+                # A lease on an already expired entry must not leave an item without TTL
+                UpdateExpression='SET refresh_lease_until = :lease, expires_at = if_not_exists(expires_at, :lease)',
+                ConditionExpression='attribute_not_exists(refresh_lease_until) OR refresh_lease_until < :now',
+                ExpressionAttributeValues={':lease': int(now) + RESPONSE_CACHE_REFRESH_LEASE_SECONDS, ':now': int(now)}
+            )
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            print(f"Error acquiring response cache refresh lease: {e}")
+            return True
+
+    def _store(self, key, response):
+        now = time.time()
+        body = response.get('body') or ''
+        entry = {
+            'body': body,
+            'headers': response.get('headers') or {},
+            'etag': response_etag(body),
+            'fresh_until': now + self.fresh_seconds,
+            'stale_until': now + self.fresh_seconds + self.stale_seconds
+        }
+        self._remember(key, entry)
+
+        try:
+            # Overwriting the item also clears the refresh lease
+            get_table(table_name('result-cache')).put_item(Item={
+                'cache_key': key,
+                'body': body,
+                'headers': json.dumps(entry['headers']),
+                'etag': entry['etag'],
+                'fresh_until': int(entry['fresh_until']),
+                'expires_at': int(entry['stale_until'])
+            })
+        except Exception as e:
+            print(f"Error writing shared response cache: {e}")
+
+        return entry
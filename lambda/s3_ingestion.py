@@ -0,0 +1,251 @@
+"""
+Streaming bulk ingestion of feedback files from S3.
+
+Files are read in chunks and parsed incrementally, so memory use does not
+depend on the file size. Supported layouts, optionally gzip-compressed
+(.gz suffix, gzip Content-Encoding or gzip magic bytes):
+
+    [ {...}, {...} ]      a JSON array of records (e.g. assets/sample-feedback.json)
+    {...}\\n{...}\\n        JSON Lines / NDJSON
+    {\\n  ...\\n}          a single (pretty-printed) JSON object, or several in a row
+
+Each record is validated on its own; invalid records are counted and logged
+but do not stop the file. Valid records get deterministic feedback IDs
+(derived from the object and the record's byte offset) and go through a
+BatchWriter. After every flush the byte offset of the last written record is
+checkpointed, so a run that is about to time out can stop and resume from
+there without duplicating records.
+"""
+
+import codecs
+import json
+import os
+import uuid
+import zlib
+
+# Bytes requested from S3 per read
+INGESTION_CHUNK_BYTES = int(os.environ.get('INGESTION_CHUNK_BYTES', str(256 * 1024)))
+
+# A single record larger than this is treated as malformed input
+INGESTION_MAX_RECORD_BYTES = int(os.environ.get('INGESTION_MAX_RECORD_BYTES', str(1024 * 1024)))
+
+FORMAT_ARRAY = 'array'
+FORMAT_LINES = 'lines'
+FORMAT_DOCUMENT = 'document'
+
+_WHITESPACE = b' \t\r\n'
+
+
+class MalformedFileError(ValueError):
+    """The file cannot be parsed past a given offset."""
+
+
+def is_gzip(key, content_encoding, head):
+    """Whether an object is gzip-compressed."""
+    return key.endswith('.gz') or (content_encoding or '').lower() == 'gzip' or head[:2] == b'\x1f\x8b'
+
+
+def decompressed_chunks(chunks):
+    """Stream-decompress gzip chunks."""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+
+
+def skip_bytes(chunks, count):
+    """Drop the first count bytes of a chunk stream (used to resume decompressed input)."""
+    for chunk in chunks:
+        if count >= len(chunk):
+            count -= len(chunk)
+            continue
+        yield chunk[count:]
+        count = 0
+
+
+def detect_format(first_byte):
+    return FORMAT_ARRAY if first_byte == b'[' else FORMAT_LINES
+
+
+def _detect_object_layout(head, chunks):
+    """Tell JSON Lines from a pretty-printed object for input starting with '{'.
+
+    If the first line is a complete JSON value the file is JSON Lines;
+    if instead the first value only parses across several lines, it is a
+    whole JSON document. Returns the format and the bytes read so far.
+    """
+    newline = head.find(b'\n')
+    while newline < 0 and len(head) <= INGESTION_MAX_RECORD_BYTES:
+        chunk = next(chunks, None)
+        if chunk is None:
+            # A single line is JSON Lines either way
+            return FORMAT_LINES, head
+        head += chunk
+        newline = head.find(b'\n')
+    try:
+        json.loads(head[:newline])
+        return FORMAT_LINES, head
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        pass
+
+    decoder = json.JSONDecoder()
+    while True:
+        try:
+            text = head.decode('utf-8')
+            _, end = decoder.raw_decode(text)
+            multiline = len(text[:end].encode('utf-8')) > newline
+            return (FORMAT_DOCUMENT if multiline else FORMAT_LINES), head
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            pass
+        chunk = next(chunks, None) if len(head) <= INGESTION_MAX_RECORD_BYTES else None
+        if chunk is None:
+            # Not a document either; JSON Lines reports the bad line and goes on
+            return FORMAT_LINES, head
+        head += chunk
+
+
+def iter_records(chunks, offset=0, file_format=None, on_format=None):
+    """Parse records from a stream of byte chunks starting at a byte offset.
+
+    chunks must begin at offset. file_format is None at the start of a file
+    (it is detected from the first byte and passed to on_format) and must be
+    given when resuming.
+    Yields (record_start, record_end, value, error), where offsets are byte
+    positions in the (decompressed) file and error is set when a JSON Lines
+    record is not valid JSON.
+    """
+    chunks = iter(chunks)
+    head = b''
+
+    if file_format is None:
+        # Read until the first non-whitespace byte, which decides the layout
+        stripped = b''
+        for chunk in chunks:
+            head += chunk
+            stripped = head.lstrip(_WHITESPACE)
+            if stripped:
+                break
+        if not stripped:
+            return
+        offset += len(head) - len(stripped)
+        head = stripped
+        file_format = detect_format(head[:1])
+        if head[:1] == b'{':
+            file_format, head = _detect_object_layout(head, chunks)
+        if on_format:
+            on_format(file_format)
+        if file_format == FORMAT_ARRAY:
+            head, offset = head[1:], offset + 1
+
+    if file_format == FORMAT_LINES:
+        yield from _iter_lines(head, offset, chunks)
+    elif file_format == FORMAT_DOCUMENT:
+        yield from _iter_array(head, offset, chunks, bracketed=False)
+    else:
+        yield from _iter_array(head, offset, chunks)
+
+
+def _iter_array(head, position, chunks, bracketed=True):
+    """Elements of a JSON array whose opening bracket has already been consumed.
+
+    With bracketed=False the input is one or more top-level JSON values
+    (a whole-document file) that simply end with the input.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    text = utf8.decode(head)
+    index = 0
+    exhausted = False
+
+    def fill():
+        nonlocal text, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            text += utf8.decode(b'', final=True)
+            return False
+        text += utf8.decode(chunk)
+        return True
+
+    while True:
+        # Whitespace and separators are ASCII, so each character is one byte
+        while True:
+            while index < len(text) and text[index] in ' \t\r\n,':
+                index += 1
+                position += 1
+            if index < len(text) or not fill():
+                break
+        if index >= len(text):
+            if not bracketed:
+                return
+            raise MalformedFileError(f'Unterminated JSON array at byte {position}')
+        if bracketed and text[index] == ']':
+            return
+
+        # Decode one element, reading more input until it is complete
+        while True:
+            try:
+                value, end = decoder.raw_decode(text, index)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # A number or literal ending exactly at the buffer end may continue in the next chunk
+            if end is not None and (end < len(text) or exhausted or isinstance(value, (dict, list, str))):
+                break
+            if len(text) - index > INGESTION_MAX_RECORD_BYTES or not fill():
+                if end is not None:
+                    break
+                raise MalformedFileError(f'Malformed JSON {"array element" if bracketed else "document"} at byte {position}')
+
+        record_bytes = len(text[index:end].encode('utf-8'))
+        yield position, position + record_bytes, value, None
+        position += record_bytes
+        index = end
+
+        # Drop consumed text so the buffer stays around one chunk
+        if index > INGESTION_CHUNK_BYTES:
+            text, index = text[index:], 0
+
+
+def _iter_lines(buffer, position, chunks):
+    """JSON Lines records; a bad line is reported and skipped."""
+    start = 0
+    while True:
+        newline = buffer.find(b'\n', start)
+        while newline < 0:
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            buffer, start = buffer[start:] + chunk, 0
+            newline = buffer.find(b'\n')
+            if newline < 0 and len(buffer) > INGESTION_MAX_RECORD_BYTES:
+                raise MalformedFileError(f'Line longer than {INGESTION_MAX_RECORD_BYTES} bytes at byte {position}')
+
+        line = buffer[start:newline] if newline >= 0 else buffer[start:]
+        end = position + len(line) + (1 if newline >= 0 else 0)
+        if line.strip(_WHITESPACE):
+            try:
+                value = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                yield position, end, None, f'invalid JSON: {e}'
+            else:
+                yield position, end, value, None
+
+        if newline < 0:
+            return
+        start, position = newline + 1, end
+
+
+def record_feedback_id(bucket, key, etag, record_start):
+    """Deterministic feedback ID for a record, so re-running a file overwrites instead of duplicating."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f's3://{bucket}/{key}?etag={etag}#{record_start}'))
+
+
+def job_id(bucket, key, etag):
+    """Checkpoint key of one ingestion job (one version of one object)."""
+    return f'ingest#s3://{bucket}/{key}#{etag}'
@@ -0,0 +1,131 @@
+"""
+Paginated, optionally parallel DynamoDB scans.
+
+A single Scan call returns at most 1 MB; callers that only read the first
+page silently miss the rest of the table. scan_items() follows
+LastEvaluatedKey to the end and, with segments > 1, splits the table into
+Segment/TotalSegments ranges scanned on a thread pool. Items are streamed as
+a generator through a bounded queue so memory stays flat, and closing the
+generator (e.g. from take() or reduce_items() with a stop condition) stops
+the workers after their current page.
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from aws_clients import get_table
+
+SCAN_MAX_WORKERS = int(os.environ.get('SCAN_MAX_WORKERS', '8'))
+
+# Pages buffered per segment between the workers and the consumer
+SCAN_QUEUE_PAGES_PER_SEGMENT = 2
+
+_DONE = object()
+
+
+def scan_pages(table_name, segment=None, total_segments=None, stop_event=None, **scan_kwargs):
+    """Yield raw Scan responses for one segment (or the whole table) until exhausted."""
+    table = get_table(table_name)
+    request = dict(scan_kwargs)
+    if total_segments and total_segments > 1:
+        request.update(Segment=segment, TotalSegments=total_segments)
+
+    while stop_event is None or not stop_event.is_set():
+        response = table.scan(**request)
+        yield response
+        if 'LastEvaluatedKey' not in response:
+            return
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def scan_items(table_name, segments=1, max_workers=None, **scan_kwargs):
+    """Yield every item matching a scan, following pagination across all segments.
+
+    scan_kwargs are passed to Scan (FilterExpression, ProjectionExpression,
+    ExpressionAttributeNames/Values, ...). Items from different segments are
+    interleaved in no particular order.
+    """
+    if segments <= 1:
+        for page in scan_pages(table_name, **scan_kwargs):
+            yield from page.get('Items', [])
+        return
+
+    stop_event = threading.Event()
+    pages = queue.Queue(maxsize=segments * SCAN_QUEUE_PAGES_PER_SEGMENT)
+
+    def scan_segment(segment):
+        try:
+            for page in scan_pages(table_name, segment, segments, stop_event, **scan_kwargs):
+                _put(pages, page.get('Items', []), stop_event)
+        except Exception as e:
+            _put(pages, e, stop_event)
+        finally:
+            _put(pages, _DONE, stop_event)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers or SCAN_MAX_WORKERS, segments))
+    try:
+        for segment in range(segments):
+            executor.submit(scan_segment, segment)
+
+        remaining = segments
+        while remaining:
+            entry = pages.get()
+            if entry is _DONE:
+                remaining -= 1
+            elif isinstance(entry, Exception):
+                raise entry
+            else:
+                yield from entry
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False)
+
+
+def _put(pages, entry, stop_event):
+    """Queue an entry for the consumer unless the scan has been abandoned."""
+    while not stop_event.is_set():
+        try:
+            pages.put(entry, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def count_items(table_name, segments=1, **scan_kwargs):
+    """Count matching items with Select='COUNT' across all pages and segments."""
+    scan_kwargs['Select'] = 'COUNT'
+    if segments <= 1:
+        return sum(page.get('Count', 0) for page in scan_pages(table_name, **scan_kwargs))
+
+    with ThreadPoolExecutor(max_workers=min(SCAN_MAX_WORKERS, segments)) as executor:
+        counts = executor.map(
+            lambda segment: sum(page.get('Count', 0) for page in scan_pages(table_name, segment, segments, **scan_kwargs)),
+            range(segments)
+        )
+        return sum(counts)
+
+
+def reduce_items(items, reducer, initial, stop=None):
+    """Fold items with reducer(accumulator, item), stopping early once stop(accumulator) is true."""
+    accumulator = initial
+    try:
+        for item in items:
+            accumulator = reducer(accumulator, item)
+            if stop is not None and stop(accumulator):
+                break
+    finally:
+        close = getattr(items, 'close', None)
+        if close:
+            close()
+    return accumulator
+
+
+def take(items, limit):
+    """Collect at most limit items, abandoning the rest of the scan."""
+    def collect(collected, item):
+        collected.append(item)
+        return collected
+
+    return reduce_items(items, collect, [], lambda collected: len(collected) >= limit)
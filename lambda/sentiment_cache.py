@@ -0,0 +1,157 @@
+"""
+Content-addressed cache for sentiment analysis results.
+
+Results are keyed by a hash of the normalized feedback text plus the model ID
+and prompt version, so repeated feedback (template answers, copy-pasted
+complaints) can be answered without invoking the agent. Lookups go through an
+in-process LRU tier first and a DynamoDB tier with TTL second.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from aws_clients import get_resource, table_name
+from dynamodb_utils import BatchWriter, to_dynamodb
+
+# Bump when the analysis prompt changes so old results are no longer reused
+SENTIMENT_PROMPT_VERSION = os.environ.get('SENTIMENT_PROMPT_VERSION', 'v1')
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.environ.get('SENTIMENT_CACHE_MAX_ENTRIES', '2048'))
+SENTIMENT_CACHE_TTL_SECONDS = int(os.environ.get('SENTIMENT_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+
+# BatchGetItem accepts at most 100 keys per call
+BATCH_GET_LIMIT = 100
+
+_WHITESPACE = re.compile(r'\s+')
+
+# Fields copied from a stored sentiment row into the cache
+CACHED_FIELDS = ('sentiment_score', 'sentiment_label', 'confidence', 'key_themes', 'agent_response', 'model_used')
+
+
+def normalize_feedback_text(text):
+    """Normalize feedback text so trivially different repeats share a key."""
+    text = unicodedata.normalize('NFKC', text or '')
+    return _WHITESPACE.sub(' ', text.casefold()).strip()
+
+
+def sentiment_cache_key(feedback_text, model_id=None):
+    """Build the cache key for a feedback text under the current model and prompt."""
+    model_id = model_id or os.environ.get('BEDROCK_MODEL_ID', 'amazon.titan-text-premier-v1:0')
+    material = f'{model_id}\n{SENTIMENT_PROMPT_VERSION}\n{normalize_feedback_text(feedback_text)}'
+    return 'sentiment#' + hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """Two-tier (LRU + DynamoDB) sentiment result cache with hit/miss counters."""
+
+    def __init__(self, max_entries=SENTIMENT_CACHE_MAX_ENTRIES, ttl=SENTIMENT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._stats = {'memory_hits': 0, 'persistent_hits': 0, 'misses': 0, 'writes': 0}
+
+    @property
+    def table_name(self):
+        return table_name('result-cache')
+
+    def _remember(self, key, result):
+        """Insert into the LRU tier (caller holds the lock)."""
+        self._entries.pop(key, None)
+        self._entries[key] = result
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def get(self, key):
+        """Get a cached result for one key, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Look up several keys; returns {key: result} for the hits."""
+        hits = {}
+        missing = []
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    hits[key] = self._entries[key]
+                else:
+                    missing.append(key)
+            self._stats['memory_hits'] += len(hits)
+
+        if missing:
+            persistent_hits = self._get_persistent(missing)
+            with self._lock:
+                for key, result in persistent_hits.items():
+                    self._remember(key, result)
+            hits.update(persistent_hits)
+            self._count('persistent_hits', len(persistent_hits))
+            self._count('misses', len(missing) - len(persistent_hits))
+
+        return hits
+
+    def _get_persistent(self, keys):
+        """Read keys from the DynamoDB tier, skipping expired items."""
+        dynamodb = get_resource('dynamodb')
+        now = int(time.time())
+        results = {}
+
+        try:
+            for start in range(0, len(keys), BATCH_GET_LIMIT):
+                request = {self.table_name: {'Keys': [{'cache_key': key} for key in keys[start:start + BATCH_GET_LIMIT]]}}
+                while request:
+                    response = dynamodb.batch_get_item(RequestItems=request)
+                    for item in response.get('Responses', {}).get(self.table_name, []):
+                        # TTL deletion is lazy, so expired items may still be returned
+                        if int(item.get('expires_at', 0)) > now:
+                            results[item['cache_key']] = item['result']
+                    request = response.get('UnprocessedKeys') or None
+        except Exception as e:
+            print(f"Error reading sentiment cache: {e}")
+
+        return results
+
+    def put(self, key, result):
+        """Cache a result in memory and buffer it for the DynamoDB tier."""
+        result = to_dynamodb({field: result[field] for field in CACHED_FIELDS if field in result})
+        with self._lock:
+            self._remember(key, result)
+            if self._writer is None:
+                self._writer = BatchWriter(self.table_name, key_attributes=('cache_key',))
+            writer = self._writer
+
+        writer.put({
+            'cache_key': key,
+            'result': result,
+            'created_at': int(time.time()),
+            'expires_at': int(time.time()) + self.ttl
+        })
+        self._count('writes')
+
+    def flush(self):
+        """Write buffered entries to the DynamoDB tier."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            writer.flush()
+
+    def stats(self):
+        """Hit/miss counters since container start."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['persistent_hits'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+sentiment_cache = SentimentCache()
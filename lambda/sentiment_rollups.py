@@ -0,0 +1,142 @@
+"""
+Time-bucketed sentiment rollups in the metrics table.
+
+Every sentiment row contributes to one minute, one hour and one day bucket
+(count, score sum, sum of squares and per-label counts), keyed by the
+bucket's start time, e.g. 'sentiment#hour#2024-05-01T13'. Windowed series
+and period comparisons are answered by reading one item per bucket with
+BatchGetItem instead of scanning raw sentiment rows.
+"""
+
+from datetime import datetime, timedelta
+
+from metrics_store import counter_update, read_unsharded
+
+# resolution -> (bucket width, key format, retention in seconds or None to keep)
+RESOLUTIONS = {
+    'minute': (timedelta(minutes=1), '%Y-%m-%dT%H:%M', 2 * 24 * 3600),
+    'hour': (timedelta(hours=1), '%Y-%m-%dT%H', 90 * 24 * 3600),
+    'day': (timedelta(days=1), '%Y-%m-%d', None),
+}
+
+
+def bucket_start(timestamp, resolution):
+    """Truncate a datetime to the start of its bucket."""
+    if resolution == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_key(timestamp, resolution):
+    """Metric key of the bucket containing a datetime."""
+    return f"sentiment#{resolution}#{timestamp.strftime(RESOLUTIONS[resolution][1])}"
+
+
+def parse_timestamp(value):
+    """Parse an ISO analysis timestamp (naive UTC), or None."""
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '')).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def add_rollup_contribution(item, sign, bucket_deltas):
+    """Add (sign=1) or remove (sign=-1) a sentiment row from its time buckets.
+
+    bucket_deltas maps (resolution, bucket start) to a Counter-like dict.
+    """
+    if not item or item.get('sentiment_score') is None:
+        return
+    timestamp = parse_timestamp(item.get('analysis_timestamp'))
+    if timestamp is None:
+        return
+
+    score = float(item['sentiment_score'])
+    for resolution in RESOLUTIONS:
+        deltas = bucket_deltas.setdefault((resolution, bucket_start(timestamp, resolution)), {})
+        for name, value in (
+            ('count', 1),
+            ('score_sum', score),
+            ('score_sum_sq', score * score),
+            (f"label:{item.get('sentiment_label', 'unknown')}", 1),
+        ):
+            deltas[name] = deltas.get(name, 0) + sign * value
+
+
+def rollup_updates(bucket_deltas):
+    """Counter updates (for metrics_store.apply_counter_updates) for accumulated bucket deltas."""
+    updates = []
+    for (resolution, start), deltas in bucket_deltas.items():
+        retention = RESOLUTIONS[resolution][2]
+        expires_at = int((start - datetime(1970, 1, 1)).total_seconds()) + retention if retention else None
+        updates.append(counter_update(bucket_key(start, resolution), deltas, shard_id=0, expires_at=expires_at))
+    return updates
+
+
+def sentiment_series(start, end, resolution='hour'):
+    """Per-bucket sentiment stats for [start, end), including empty buckets.
+
+    Returns a list of dicts with bucket, count, average_sentiment and labels.
+    """
+    width = RESOLUTIONS[resolution][0]
+    starts = []
+    current = bucket_start(start, resolution)
+    while current < end:
+        starts.append(current)
+        current += width
+
+    buckets = read_unsharded([bucket_key(bucket, resolution) for bucket in starts])
+
+    series = []
+    for bucket in starts:
+        counters = buckets.get(bucket_key(bucket, resolution), {})
+        count = counters.get('count', 0)
+        series.append({
+            'bucket': bucket.isoformat(),
+            'count': count,
+            'score_sum': counters.get('score_sum', 0),
+            'score_sum_sq': counters.get('score_sum_sq', 0),
+            'average_sentiment': round(counters.get('score_sum', 0) / count, 4) if count > 0 else None,
+            'labels': {
+                name.split(':', 1)[1]: value for name, value in counters.items() if name.startswith('label:')
+            }
+        })
+    return series
+
+
+def summarize_series(series):
+    """Combine a series into window totals: count, average_sentiment and labels."""
+    count = sum(point['count'] for point in series)
+    score_sum = sum(point['score_sum'] for point in series)
+    labels = {}
+    for point in series:
+        for label, value in point['labels'].items():
+            labels[label] = labels.get(label, 0) + value
+    return {
+        'count': count,
+        'average_sentiment': score_sum / count if count > 0 else None,
+        'labels': labels
+    }
+
+
+def compare_windows(window, resolution='hour', now=None):
+    """Compare the last window with the window before it.
+
+    Returns current and previous summaries plus the change in average
+    sentiment (None when either window has no data).
+    """
+    now = now or datetime.utcnow()
+    # Include the current, partially filled bucket in the latest window
+    end = bucket_start(now, resolution) + RESOLUTIONS[resolution][0]
+    series = sentiment_series(end - 2 * window, end, resolution)
+    middle = len(series) // 2
+
+    previous = summarize_series(series[:middle])
+    current = summarize_series(series[middle:])
+    change = None
+    if current['average_sentiment'] is not None and previous['average_sentiment'] is not None:
+        change = current['average_sentiment'] - previous['average_sentiment']
+
+    return {'current': current, 'previous': previous, 'change': change}
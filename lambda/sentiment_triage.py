@@ -0,0 +1,160 @@
+"""
+Local sentiment triage for incoming feedback.
+
+Combines the 1-5 rating, a weighted sentiment lexicon with negation and
+intensifier handling, and text length into a calibrated 0-1 score with a
+confidence. Clearly positive or clearly negative feedback can be stored
+directly; ambiguous or high-priority feedback is routed to the agent.
+"""
+
+import math
+import re
+
+DEFAULT_NEGATIVE_THRESHOLD = 0.3
+DEFAULT_POSITIVE_THRESHOLD = 0.7
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# Priorities that always get a full agent analysis
+HIGH_PRIORITIES = {'high', 'critical', 'urgent'}
+
+POSITIVE_TERMS = {
+    'excellent': 2.0, 'outstanding': 2.0, 'amazing': 2.0, 'fantastic': 2.0, 'best': 1.8,
+    'love': 1.8, 'perfect': 1.8, 'perfectly': 1.6, 'great': 1.5, 'impressed': 1.5,
+    'awesome': 1.8, 'wonderful': 1.8, 'recommend': 1.2, 'helpful': 1.2, 'satisfied': 1.2,
+    'happy': 1.2, 'appreciated': 1.0, 'appreciate': 1.0, 'good': 1.0, 'easy': 0.8,
+    'intuitive': 0.8, 'smooth': 0.8, 'professional': 0.8, 'resolved': 0.8, 'fast': 0.6,
+    'faster': 0.6, 'quick': 0.6, 'clean': 0.5, 'works': 0.5, 'decent': 0.4, 'reasonable': 0.3,
+}
+
+NEGATIVE_TERMS = {
+    'terrible': 2.0, 'awful': 2.0, 'horrible': 2.0, 'worst': 2.0, 'unacceptable': 2.0,
+    'hate': 2.0, 'useless': 1.8, 'disappointed': 1.6, 'disappointing': 1.6, 'frustrated': 1.6,
+    'frustrating': 1.6, 'angry': 1.6, 'dissatisfied': 1.6, 'misleading': 1.5, 'unhelpful': 1.5,
+    'dismissive': 1.5, 'poor': 1.5, 'broken': 1.5, 'crashing': 1.5, 'crash': 1.5,
+    'bad': 1.2, 'downtime': 1.2, 'confusing': 1.0, 'bugs': 1.0, 'glitches': 1.0,
+    'slow': 1.0, 'lost': 1.0, 'errors': 1.0, 'complicated': 1.0, 'declined': 1.0,
+    'switching': 1.0, 'complaints': 1.0, 'issue': 0.6, 'issues': 0.6, 'waited': 0.8,
+    'difficult': 0.8, 'expensive': 0.8, 'confused': 0.8, 'longer': 0.4,
+}
+
+NEGATORS = {'not', 'no', 'never', 'nothing', 'none', 'neither', 'nor', 'without', 'hardly', 'barely'}
+INTENSIFIERS = {
+    'very': 1.5, 'extremely': 1.8, 'incredibly': 1.6, 'really': 1.3, 'so': 1.2,
+    'highly': 1.4, 'super': 1.4, 'totally': 1.3, 'completely': 1.4, 'significantly': 1.4,
+}
+
+# Tokens after a negator whose polarity is flipped
+NEGATION_WINDOW = 3
+
+# Lexicon sum that maps to a strong (tanh ~ 0.76) text signal
+LEXICON_SCALE = 3.0
+
+# Logistic steepness used to calibrate the combined signal to a 0-1 score
+CALIBRATION_SLOPE = 3.0
+
+_TOKEN = re.compile(r"[a-z']+")
+
+
+def tokenize(text):
+    """Lowercase word tokens, keeping contractions such as didn't."""
+    return _TOKEN.findall((text or '').lower())
+
+
+def _is_negator(token):
+    return token in NEGATORS or token.endswith("n't")
+
+
+def lexicon_signal(tokens):
+    """Score tokens against the lexicon; returns (signal in [-1, 1], matched term count)."""
+    total = 0.0
+    matches = 0
+    negate_until = -1
+    intensity = 1.0
+
+    for position, token in enumerate(tokens):
+        if _is_negator(token):
+            negate_until = position + NEGATION_WINDOW
+            continue
+        if token in INTENSIFIERS:
+            intensity = INTENSIFIERS[token]
+            continue
+
+        weight = POSITIVE_TERMS.get(token, 0.0) - NEGATIVE_TERMS.get(token, 0.0)
+        if weight:
+            if position <= negate_until:
+                # Negation flips and dampens: "not great" is mildly negative
+                weight = -0.7 * weight
+            total += weight * intensity
+            matches += 1
+        intensity = 1.0
+
+    return math.tanh(total / LEXICON_SCALE), matches
+
+
+def rating_signal(rating):
+    """Map a 1-5 rating onto [-1, 1], or None if there is no usable rating."""
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= rating <= 5:
+        return None
+    return (rating - 3.0) / 2.0
+
+
+def triage_feedback(feedback_data, negative_threshold=DEFAULT_NEGATIVE_THRESHOLD,
+                    positive_threshold=DEFAULT_POSITIVE_THRESHOLD, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    Score feedback locally and decide whether the agent needs to see it.
+
+    Returns a dict with sentiment_score (0-1), sentiment_label, confidence,
+    route ('local' or 'agent') and the reason for the routing decision.
+    """
+    tokens = tokenize(feedback_data.get('feedback_text'))
+    text, matches = lexicon_signal(tokens)
+    rating = rating_signal(feedback_data.get('rating'))
+
+    # Longer texts with more lexicon hits carry more evidence
+    length_factor = min(len(tokens) / 12.0, 1.0)
+    evidence = min(matches / 3.0, 1.0)
+    text_weight = 0.25 + 0.35 * evidence * length_factor
+
+    if rating is None:
+        combined = text
+        confidence = 0.6 * evidence + 0.2 * length_factor
+    else:
+        combined = (1 - text_weight) * rating + text_weight * text
+        # Penalize a rating that contradicts the text
+        agreement = 1.0 - abs(rating - text) / 2.0 if matches else 0.8
+        confidence = (0.5 + 0.3 * evidence + 0.2 * length_factor) * agreement
+
+    score = 1.0 / (1.0 + math.exp(-CALIBRATION_SLOPE * combined))
+    confidence = round(min(max(confidence, 0.0), 1.0), 3)
+    score = round(score, 3)
+
+    if score <= negative_threshold:
+        label = 'negative'
+    elif score >= positive_threshold:
+        label = 'positive'
+    else:
+        label = 'neutral'
+
+    metadata = feedback_data.get('metadata') if isinstance(feedback_data.get('metadata'), dict) else {}
+    priority = str(feedback_data.get('priority') or metadata.get('priority') or '').lower()
+    if priority in HIGH_PRIORITIES:
+        route, reason = 'agent', f'{priority}_priority'
+    elif label == 'neutral':
+        route, reason = 'agent', 'ambiguous_score'
+    elif confidence < min_confidence:
+        route, reason = 'agent', 'low_confidence'
+    else:
+        route, reason = 'local', f'clear_{label}'
+
+    return {
+        'sentiment_score': score,
+        'sentiment_label': label,
+        'confidence': confidence,
+        'route': route,
+        'reason': reason,
+        'lexicon_matches': matches
+    }
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Backfill the feedback query index attributes on existing feedback rows.
+
+Ingestion writes feedback_date and a top-level category for DateTimeIndex and
+CategoryTimeIndex (see index_attributes in lambda/feedback_ingestion.py).
+Rows stored before that change have neither, so the indexes do not return
+them. This script scans the feedback table and sets the missing attributes.
+It is safe to re-run: rows that already have them are skipped.
+
+Usage:
+    python3 scripts/backfill_feedback_index_attributes.py --environment prod [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda'))
+
+
+def missing_index_attributes(item):
+    """Index attributes the row should have but does not."""
+    from feedback_ingestion import index_attributes
+
+    try:
+        timestamp = datetime.fromisoformat(str(item.get('timestamp', '')).replace('Z', ''))
+    except ValueError:
+        return {}
+    return {name: value for name, value in index_attributes(item, timestamp).items() if item.get(name) != value}
+
+
+def backfill(table, dry_run=False):
+    from botocore.exceptions import ClientError
+
+    scanned = updated = 0
+    request = {'ProjectionExpression': 'feedback_id, #ts, feedback_date, category, metadata',
+               'ExpressionAttributeNames': {'#ts': 'timestamp'}}
+    while True:
+        response = table.scan(**request)
+        for item in response.get('Items', []):
+            scanned += 1
+            attributes = missing_index_attributes(item)
+            if not attributes:
+                continue
+            updated += 1
+            if dry_run:
+                continue
+            names = {f'#a{index}': name for index, name in enumerate(attributes)}
+            values = {f':a{index}': value for index, value in enumerate(attributes.values())}
+            try:
+                table.update_item(
+                    Key={'feedback_id': item['feedback_id']},
+                    UpdateExpression='SET ' + ', '.join(f'#a{index} = :a{index}' for index in range(len(names))),
+                    ConditionExpression='attribute_exists(feedback_id)',
+                    ExpressionAttributeNames=names,
+                    ExpressionAttributeValues=values
+                )
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+        if 'LastEvaluatedKey' not in response:
+            break
+        request['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        print(f"Scanned {scanned} rows, {updated} need index attributes")
+
+    return scanned, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--environment', default='prod')
+    parser.add_argument('--stack-name', help='defaults to insightmodai-agent-<environment>')
+    parser.add_argument('--region', default='us-west-2')
+    parser.add_argument('--dry-run', action='store_true', help='count rows without writing')
+    args = parser.parse_args()
+
+    os.environ['ENVIRONMENT'] = args.environment
+    os.environ['STACK_NAME'] = args.stack_name or f'insightmodai-agent-{args.environment}'
+    os.environ.setdefault('AWS_DEFAULT_REGION', args.region)
+
+    from aws_clients import get_table, table_name
+
+    name = table_name('feedback-records')
+    print(f"Backfilling index attributes on {name}{' (dry run)' if args.dry_run else ''}")
+    scanned, updated = backfill(get_table(name), dry_run=args.dry_run)
+    print(f"Done: scanned {scanned} rows, {'would update' if args.dry_run else 'updated'} {updated}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Shared fixtures for the Lambda unit tests.
+
+The Lambda modules import their siblings by bare name (they are zipped flat),
+so lambda/ is put on sys.path; agent/ is too, for the agent's pure helpers. AWS access goes through the aws_clients registry,
+which the fixtures fill with in-memory tables and stub clients; nothing here
+talks to AWS.
+"""
+
+import os
+import sys
+
+import pytest
+from botocore.exceptions import ClientError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'lambda'))
+sys.path.insert(1, os.path.join(ROOT, 'agent'))
+
+os.environ.setdefault('STACK_NAME', 'test')
+os.environ.setdefault('ENVIRONMENT', 'test')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+# The agent module resolves its tables and SSM parameters at import time
+os.environ.setdefault('FEEDBACK_TABLE_NAME', 'test-feedback-records-test')
+os.environ.setdefault('SENTIMENT_TABLE_NAME', 'test-sentiment-analysis-test')
+os.environ.setdefault('CONFIG_TABLE_NAME', 'test-agent-config-test')
+os.environ.setdefault('AWS_EC2_METADATA_DISABLED', 'true')
+
+
+def conditional_check_failed():
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'failed'}}, 'PutItem')
+
+
+class FakeTable:
+    """In-memory stand-in for a boto3 Table resource.
+
+    put_item understands the two conditions the modules use for
+    version-checked writes: 'attribute_not_exists(<key>)' and
+    'version = :version'.
+    """
+
+    def __init__(self, key_attributes):
+        self.key_attributes = tuple(key_attributes)
+        self.items = {}
+        self.puts = 0
+
+    def _key(self, key):
+        return tuple(key[attribute] for attribute in self.key_attributes)
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(self._key(Key))
+        return {'Item': dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None, **kwargs):
+        key = self._key(Item)
+        current = self.items.get(key)
+        if ConditionExpression:
+            if ConditionExpression.startswith('attribute_not_exists('):
+                ok = current is None
+            elif ConditionExpression == 'version = :version':
+                ok = current is not None and current.get('version') == ExpressionAttributeValues[':version']
+            else:
+                raise AssertionError(f'Unsupported condition {ConditionExpression}')
+            if not ok:
+                raise conditional_check_failed()
+        self.items[key] = dict(Item)
+        self.puts += 1
+        return {}
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    """Serve in-memory tables (and stub clients) through the aws_clients registry.
+
+    tables.define(kind, *key_attributes) registers a FakeTable that
+    get_table(table_name(kind)) returns; tables.client(service, stub)
+    registers a stub for get_client(service).
+    """
+    import aws_clients
+
+    class Tables:
+        def define(self, kind, *key_attributes):
+            table = FakeTable(key_attributes)
+            monkeypatch.setitem(aws_clients._tables, aws_clients.table_name(kind), table)
+            return table
+
+        def client(self, service_name, stub):
+            monkeypatch.setitem(aws_clients._clients, service_name, stub)
+            return stub
+
+    return Tables()
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import activity_feed
+import metrics_aggregator
+
+
+def event(feedback_id, timestamp, channel='email'):
+    return activity_feed.feedback_event({'feedback_id': feedback_id, 'timestamp': timestamp,
+                                         'channel': channel, 'source': 'api'})
+
+
+@pytest.fixture
+def metrics(tables):
+    return tables.define('metrics', 'metric_key', 'shard_id')
+
+
+def test_append_events_creates_feed(metrics):
+    activity_feed.append_events([event('f1', '2024-01-01T00:00:00')])
+
+    assert [item['feedback_id'] for item in activity_feed.read_feed()] == ['f1']
+    assert [item['feedback_id'] for item in activity_feed.read_feed('email')] == ['f1']
+
+
+def test_append_events_merges_into_existing_feed(metrics):
+    activity_feed.append_events([event('f1', '2024-01-01T00:00:00')])
+    activity_feed.append_events([event('f2', '2024-01-02T00:00:00')])
+
+    assert [item['feedback_id'] for item in activity_feed.read_feed()] == ['f2', 'f1']
+    assert metrics.items[('activity#all', 0)]['version'] == 2
+
+
+def test_append_events_skips_events_already_in_feed(metrics):
+    activity_feed.append_events([event('f1', '2024-01-01T00:00:00')])
+    puts = metrics.puts
+    activity_feed.append_events([event('f1', '2024-01-01T00:00:00')])
+
+    assert metrics.puts == puts
+
+
+def test_merge_retries_after_concurrent_update(metrics, monkeypatch):
+    activity_feed.append_events([event('f1', '2024-01-01T00:00:00', channel=None)])
+    monkeypatch.setattr(activity_feed.time, 'sleep', lambda seconds: None)
+
+    original_get_item = metrics.get_item
+    raced = []
+
+    def racing_get_item(**kwargs):
+        response = original_get_item(**kwargs)
+        if not raced:
+            raced.append(True)
+            metrics.items[('activity#all', 0)]['version'] += 1
+        return response
+
+    monkeypatch.setattr(metrics, 'get_item', racing_get_item)
+    activity_feed.append_events([event('f2', '2024-01-02T00:00:00', channel=None)])
+
+    assert [item['feedback_id'] for item in activity_feed.read_feed()] == ['f2', 'f1']
+
+
+def test_aggregator_counts_even_when_feed_update_fails(monkeypatch):
+    applied = []
+    monkeypatch.setattr(metrics_aggregator, 'apply_counter_updates', lambda updates, batch_id=None: applied.append(updates))
+
+    def failing_append(events):
+        raise RuntimeError('feed unavailable')
+
+    monkeypatch.setattr(metrics_aggregator, 'append_events', failing_append)
+    record = {
+        'eventName': 'INSERT',
+        'eventSourceARN': 'arn:aws:dynamodb:us-west-2:1:table/test-feedback-records-test/stream/x',
+        'dynamodb': {'NewImage': {'feedback_id': {'S': 'f1'}, 'channel': {'S': 'email'}}}
+    }
+
+    response = metrics_aggregator.lambda_handler({'Records': [record]}, None)
+
+    assert json.loads(response['body'])['records'] == 1
+    assert len(applied) == 1
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+import agent_invoker
+
+
+def client_error(code, status=400):
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+                       'InvokeAgentRuntime')
+
+
+class SentimentWriter:
+    def __init__(self, table_name=None):
+        self.items = []
+
+    def put(self, item):
+        self.items.append(item)
+
+    def pending(self):
+        return list(self.items)
+
+    def flush(self):
+        return []
+
+
+class NoCache:
+    def get(self, key):
+        return None
+
+    def get_many(self, keys):
+        return {}
+
+    def put(self, key, result):
+        pass
+
+    def flush(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def invoker(monkeypatch):
+    state = {'error': None, 'released': [], 'completed': []}
+
+    def invoke(session_id, payload):
+        raise state['error']
+
+    monkeypatch.setattr(agent_invoker, 'get_parameter', lambda name: 'arn:agent')
+    monkeypatch.setattr(agent_invoker, 'invoke_agent_runtime', invoke)
+    monkeypatch.setattr(agent_invoker, 'get_recent_sentiments', lambda customer_id: [])
+    monkeypatch.setattr(agent_invoker, 'sentiment_cache', NoCache())
+    monkeypatch.setattr(agent_invoker, 'load_triage_settings', lambda: {'enabled': False})
+    monkeypatch.setattr(agent_invoker, 'BatchWriter', SentimentWriter)
+    monkeypatch.setattr(agent_invoker, 'update_profiles', lambda items: [])
+    monkeypatch.setattr(agent_invoker, 'claim', lambda feedback_id, owner: agent_invoker.CLAIM_ACQUIRED)
+    monkeypatch.setattr(agent_invoker, 'release', lambda feedback_id, owner: state['released'].append(feedback_id))
+    monkeypatch.setattr(agent_invoker, 'complete', lambda ids, owner: state['completed'].extend(ids))
+    return state
+
+
+def stream_event(*feedback_ids):
+    return {'Records': [
+        {'eventName': 'INSERT',
+         'dynamodb': {'SequenceNumber': str(index), 'NewImage': {
+             'feedback_id': {'S': feedback_id}, 'customer_id': {'S': f'c-{feedback_id}'},
+             'feedback_text': {'S': 'It was fine'}, 'rating': {'N': '2'}}}}
+        for index, feedback_id in enumerate(feedback_ids, start=1)
+    ]}
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (client_error('ThrottlingException'), True),
+    (client_error('InternalServerError', status=503), True),
+    (client_error('SomethingElse', status=429), True),
+    (ReadTimeoutError(endpoint_url='https://agentcore'), True),
+    (client_error('AccessDeniedException', status=403), False),
+    (client_error('ValidationException'), False),
+    (ValueError('bad payload'), False),
+])
+def test_retryable_errors_are_told_apart(error, retryable):
+    assert agent_invoker.is_retryable_error(error) is retryable
+
+
+def test_transient_agent_error_is_raised_instead_of_falling_back(invoker):
+    invoker['error'] = client_error('ThrottlingException')
+    writer = SentimentWriter()
+
+    with pytest.raises(ClientError):
+        agent_invoker.process_single_feedback('f1', {'feedback_text': 'It was fine', 'rating': 2}, writer)
+
+    assert writer.items == []
+
+
+def test_permanent_agent_error_falls_back_to_rating(invoker):
+    invoker['error'] = client_error('AccessDeniedException', status=403)
+    writer = SentimentWriter()
+
+    result = agent_invoker.process_single_feedback('f1', {'feedback_text': 'It was fine', 'rating': 2}, writer)
+
+    assert result['status'] == 'fallback_to_rating'
+    assert [item['model_used'] for item in writer.items] == ['rating_based_fallback']
+
+
+def test_stream_reports_throttled_records_as_batch_item_failures(invoker):
+    invoker['error'] = client_error('ThrottlingException')
+
+    response = agent_invoker.lambda_handler(stream_event('f1', 'f2'), None)
+
+    assert sorted(failure['itemIdentifier'] for failure in response['batchItemFailures']) == ['1', '2']
+    assert sorted(invoker['released']) == ['f1', 'f2']
+    assert invoker['completed'] == []
+
+
+def test_stream_completes_records_that_fell_back_to_rating(invoker):
+    invoker['error'] = client_error('ValidationException')
+
+    response = agent_invoker.lambda_handler(stream_event('f1'), None)
+
+    assert response['batchItemFailures'] == []
+    assert invoker['completed'] == ['f1']
+    assert json.loads(response['body'])['results'][0]['status'] == 'fallback_to_rating'
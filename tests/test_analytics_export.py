@@ -0,0 +1,111 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import analytics_exporter
+import analytics_query
+
+
+def stream_record(sequence, changed_at, score, timestamp='2024-03-01T10:00:00'):
+    return {
+        'eventName': 'MODIFY',
+        'dynamodb': {
+            'SequenceNumber': sequence,
+            'ApproximateCreationDateTime': changed_at,
+            'NewImage': {
+                'feedback_id': {'S': 'f1'},
+                'analysis_timestamp': {'S': timestamp},
+                'sentiment_score': {'N': str(score)},
+            }
+        }
+    }
+
+
+def export(records):
+    rows = [row for record in records for _, row in analytics_exporter.rows_for_record('sentiment', record)]
+    return pa.Table.from_pylist(rows, schema=analytics_query.dataset_schema('sentiment'))
+
+
+def test_newer_change_wins_over_higher_sequence_from_another_shard():
+    # After a shard split the child shard's sequence numbers can sort below the parent's
+    older = stream_record('900000000000000000001', 1709287200, 0.2)
+    newer = stream_record('100000000000000000001', 1709287260, 0.9)
+
+    current = analytics_query.latest_rows(export([older, newer]))
+
+    assert current.column('sentiment_score').to_pylist() == [0.9]
+
+
+def test_sequence_breaks_ties_within_the_same_change_time():
+    first = stream_record('100', 1709287200, 0.2)
+    second = stream_record('200', 1709287200, 0.9)
+
+    current = analytics_query.latest_rows(export([second, first]))
+
+    assert current.column('sentiment_score').to_pylist() == [0.9]
+
+
+def test_move_to_another_day_leaves_a_tombstone():
+    record = stream_record('300', 1709373600, 0.5, timestamp='2024-03-02T10:00:00')
+    record['dynamodb']['OldImage'] = {
+        'feedback_id': {'S': 'f1'},
+        'analysis_timestamp': {'S': '2024-03-01T10:00:00'},
+        'sentiment_score': {'N': '0.1'},
+    }
+
+    rows = analytics_exporter.rows_for_record('sentiment', record)
+
+    assert [(day, row['_deleted']) for day, row in rows] == [('2024-03-02', False), ('2024-03-01', True)]
+    assert all(row['_changed_at'] == 1709373600000 for _, row in rows)
+
+
+def test_sentiment_aggregates_reads_current_rows_from_a_local_export(tmp_path):
+    from datetime import datetime
+
+    import pyarrow.parquet as pq
+
+    records = [
+        stream_record('1', 1709287200, 0.9),
+        stream_record('2', 1709287260, 0.5),
+    ]
+    partition = tmp_path / 'sentiment' / 'date=2024-03-01'
+    partition.mkdir(parents=True)
+    pq.write_table(export(records), partition / 'delta-1-2.parquet')
+
+    rows = analytics_query.sentiment_aggregates(datetime(2024, 3, 1), datetime(2024, 3, 2), 'day', root=str(tmp_path))
+
+    assert [(row['period'], row['count'], row['mean_score']) for row in rows] == [('2024-03-01', 1, 0.5)]
+
+
+def test_aggregator_exports_before_counting(monkeypatch):
+    import metrics_aggregator
+
+    calls = []
+    monkeypatch.setenv('INSIGHTS_BUCKET_NAME', 'insights')
+    monkeypatch.setattr(metrics_aggregator, 'export_stream_batch', lambda records: calls.append('export') or 1)
+    monkeypatch.setattr(metrics_aggregator, 'apply_counter_updates',
+                        lambda updates, batch_id=None: calls.append('counters'))
+    monkeypatch.setattr(metrics_aggregator, 'append_events', lambda events: calls.append('feed'))
+
+    record = stream_record('1', 1709287200, 0.9)
+    record['eventSourceARN'] = 'arn:aws:dynamodb:us-west-2:1:table/test-sentiment-analysis-test/stream/x'
+    metrics_aggregator.lambda_handler({'Records': [record]}, None)
+
+    assert calls == ['export', 'counters', 'feed']
+
+
+def test_failed_export_fails_the_batch_before_counting(monkeypatch):
+    import metrics_aggregator
+
+    counted = []
+    monkeypatch.setenv('INSIGHTS_BUCKET_NAME', 'insights')
+
+    def failing_export(records):
+        raise RuntimeError('S3 unavailable')
+
+    monkeypatch.setattr(metrics_aggregator, 'export_stream_batch', failing_export)
+    monkeypatch.setattr(metrics_aggregator, 'apply_counter_updates', lambda updates, batch_id=None: counted.append(updates))
+
+    with pytest.raises(RuntimeError):
+        metrics_aggregator.lambda_handler({'Records': [stream_record('1', 1709287200, 0.9)]}, None)
+    assert counted == []
@@ -0,0 +1,145 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import config_client
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def config(tables, monkeypatch):
+    table = tables.define('agent-config', 'config_key')
+    clock = Clock()
+    monkeypatch.setattr(config_client.time, 'time', clock.time)
+    monkeypatch.setattr(config_client, '_cache', config_client.ConfigCache(ttl=30))
+
+    reads = []
+    get_item = table.get_item
+
+    def counting_get_item(**kwargs):
+        reads.append('version' if 'ProjectionExpression' in kwargs else 'snapshot')
+        return get_item(**kwargs)
+
+    monkeypatch.setattr(table, 'get_item', counting_get_item)
+    table.clock, table.reads = clock, reads
+    return table
+
+
+def store_snapshot(table, version, **settings):
+    table.items[(config_client.SNAPSHOT_KEY,)] = {
+        'config_key': config_client.SNAPSHOT_KEY, 'settings': settings, 'version': version}
+
+
+def test_settings_are_served_from_memory_within_the_ttl(config):
+    store_snapshot(config, 1, negative_threshold='0.2')
+
+    assert config_client.get_setting('negative_threshold') == '0.2'
+    assert config_client.get_setting('batch_size') == config_client.DEFAULTS['batch_size']
+    config.clock.now += 29
+    config_client.get_config()
+
+    assert config.reads == ['snapshot']
+    assert config_client.config_version() == 1
+
+
+def test_unchanged_version_is_revalidated_without_reloading(config):
+    store_snapshot(config, 1, negative_threshold='0.2')
+    config_client.get_config()
+
+    # Settings changed without a version bump are not picked up: only the version is compared
+    store_snapshot(config, 1, negative_threshold='0.9')
+    config.clock.now += 31
+
+    assert config_client.get_setting('negative_threshold') == '0.2'
+    assert config.reads == ['snapshot', 'version']
+
+
+def test_new_version_reloads_the_settings(config):
+    store_snapshot(config, 1, negative_threshold='0.2')
+    config_client.get_config()
+
+    store_snapshot(config, 2, negative_threshold='0.25')
+    config.clock.now += 31
+
+    assert config_client.get_setting('negative_threshold') == '0.25'
+    assert config_client.config_version() == 2
+    assert config.reads == ['snapshot', 'version', 'snapshot']
+
+
+def test_failed_refresh_keeps_the_last_settings(config, monkeypatch):
+    store_snapshot(config, 1, negative_threshold='0.2')
+    config_client.get_config()
+
+    def unavailable(**kwargs):
+        raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'down'}}, 'GetItem')
+
+    monkeypatch.setattr(config, 'get_item', unavailable)
+    config.clock.now += 31
+
+    assert config_client.get_setting('negative_threshold') == '0.2'
+    assert config_client.config_version() == 1
+
+
+def test_unreadable_config_falls_back_to_defaults(config, monkeypatch):
+    def unavailable(**kwargs):
+        raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'down'}}, 'GetItem')
+
+    monkeypatch.setattr(config, 'get_item', unavailable)
+
+    assert config_client.get_config() == config_client.DEFAULTS
+    assert config_client.config_version() is None
+
+
+class StubTransactions:
+    def __init__(self, table, conflicts=0):
+        self.table = table
+        self.conflicts = conflicts
+        self.calls = []
+
+    def transact_write_items(self, TransactItems):
+        self.calls.append(TransactItems)
+        if self.conflicts:
+            self.conflicts -= 1
+            raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': 'cancelled'},
+                               'CancellationReasons': [{'Code': 'ConditionalCheckFailed'}]}, 'TransactWriteItems')
+        snapshot = TransactItems[0]['Put']['Item']
+        store_snapshot(self.table, int(snapshot['version']['N']),
+                       **{key: value['S'] for key, value in snapshot['settings']['M'].items()})
+
+
+def test_update_bumps_the_version_conditionally_and_invalidates_the_cache(config, tables):
+    store_snapshot(config, 3, negative_threshold='0.2')
+    client = tables.client('dynamodb', StubTransactions(config))
+    config_client.get_config()
+
+    assert config_client.update_config({'positive_threshold': 0.8}) == 4
+
+    snapshot_put = client.calls[0][0]['Put']
+    assert snapshot_put['ConditionExpression'] == '#version = :version'
+    assert snapshot_put['ExpressionAttributeValues'] == {':version': {'N': '3'}}
+    assert [item['Put']['Item']['config_key'] for item in client.calls[0][1:]] == [{'S': 'positive_threshold'}]
+    # The writer's own container sees the new version without waiting for the TTL
+    assert config_client.get_config()['positive_threshold'] == '0.8'
+    assert config_client.config_version() == 4
+
+
+def test_update_retries_after_a_concurrent_change(config, tables):
+    store_snapshot(config, 1)
+    client = tables.client('dynamodb', StubTransactions(config, conflicts=1))
+
+    assert config_client.update_config({'batch_size': 20}) == 2
+    assert len(client.calls) == 2
+
+
+def test_update_gives_up_when_the_config_keeps_changing(config, tables):
+    store_snapshot(config, 1)
+    tables.client('dynamodb', StubTransactions(config, conflicts=config_client.CONFIG_UPDATE_MAX_ATTEMPTS))
+
+    with pytest.raises(config_client.ConfigConflictError):
+        config_client.update_config({'batch_size': 20})
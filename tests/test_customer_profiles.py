@@ -0,0 +1,62 @@
+import pytest
+
+import customer_profiles
+
+
+def observation(feedback_id, score, timestamp):
+    return {'feedback_id': feedback_id, 'sentiment_score': score, 'sentiment_label': 'positive',
+            'analysis_timestamp': timestamp, 'channel': 'email'}
+
+
+@pytest.fixture
+def profiles(tables):
+    return tables.define('customer-profiles', 'customer_id')
+
+
+def test_record_sentiments_creates_profile(profiles):
+    profile = customer_profiles.record_sentiments('c1', [observation('f1', 0.8, '2024-01-01T00:00:00')])
+
+    assert profile['version'] == 1
+    stored = customer_profiles.get_profile('c1')
+    assert stored['count'] == 1
+    assert stored['version'] == 1
+
+
+def test_record_sentiments_updates_existing_profile(profiles):
+    customer_profiles.record_sentiments('c1', [observation('f1', 0.8, '2024-01-01T00:00:00')])
+    customer_profiles.record_sentiments('c1', [observation('f2', 0.4, '2024-01-02T00:00:00')])
+
+    stored = customer_profiles.get_profile('c1')
+    assert stored['version'] == 2
+    assert stored['count'] == 2
+    assert stored['mean_score'] == pytest.approx(0.6)
+    assert [entry['feedback_id'] for entry in stored['recent']] == ['f2', 'f1']
+
+
+def test_record_sentiments_skips_retried_observations(profiles):
+    customer_profiles.record_sentiments('c1', [observation('f1', 0.8, '2024-01-01T00:00:00')])
+    customer_profiles.record_sentiments('c1', [observation('f1', 0.8, '2024-01-01T00:00:00')])
+
+    assert customer_profiles.get_profile('c1')['count'] == 1
+    assert profiles.puts == 1
+
+
+def test_record_sentiments_retries_after_concurrent_update(profiles, monkeypatch):
+    customer_profiles.record_sentiments('c1', [observation('f1', 0.8, '2024-01-01T00:00:00')])
+    monkeypatch.setattr(customer_profiles.time, 'sleep', lambda seconds: None)
+
+    # Another writer bumps the version between this writer's read and its put
+    original_get_item = profiles.get_item
+    raced = []
+
+    def racing_get_item(**kwargs):
+        response = original_get_item(**kwargs)
+        if not raced:
+            raced.append(True)
+            profiles.items[('c1',)]['version'] += 1
+        return response
+
+    monkeypatch.setattr(profiles, 'get_item', racing_get_item)
+    customer_profiles.record_sentiments('c1', [observation('f2', 0.4, '2024-01-02T00:00:00')])
+
+    assert customer_profiles.get_profile('c1')['version'] == 3
@@ -0,0 +1,194 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import feedback_ingestion
+
+
+def feedback(**fields):
+    return {'customer_id': 'c1', 'feedback_text': 'Great service', 'channel': 'email', **fields}
+
+
+def test_build_feedback_item_keeps_server_keys():
+    timestamp = datetime(2024, 3, 1, 10, 0, 0)
+    record = feedback(feedback_id='client-id', timestamp='1999-01-01T00:00:00', ingested_at_ms=1,
+                      source='spoofed', feedback_date='1999-01-01')
+
+    item = feedback_ingestion.build_feedback_item(record, 'server-id', 'api', timestamp, 1709287200000)
+
+    assert item['feedback_id'] == 'server-id'
+    assert item['timestamp'] == '2024-03-01T10:00:00'
+    assert item['ingested_at_ms'] == 1709287200000
+    assert item['source'] == 'api'
+    # The date index partition matches the stored timestamp
+    assert item['feedback_date'] == item['timestamp'][:10]
+
+
+def test_build_feedback_item_lifts_category_and_keeps_client_fields():
+    item = feedback_ingestion.build_feedback_item(
+        feedback(rating=4, metadata={'category': 'billing'}), 'id', 's3', datetime(2024, 3, 1), s3_key='in.json'
+    )
+
+    assert item['category'] == 'billing'
+    assert item['rating'] == 4
+    assert item['s3_key'] == 'in.json'
+
+
+class FakeBatchWriter:
+    """Collects items instead of calling BatchWriteItem; fail_ids are reported unwritten."""
+
+    instances = []
+    fail_ids = set()
+
+    def __init__(self, table_name):
+        self.items = []
+        FakeBatchWriter.instances.append(self)
+
+    def put(self, item):
+        self.items.append(item)
+
+    def flush(self):
+        return [item for item in self.items if item['feedback_id'] in FakeBatchWriter.fail_ids]
+
+
+@pytest.fixture
+def batch_api(monkeypatch):
+    FakeBatchWriter.instances = []
+    FakeBatchWriter.fail_ids = set()
+    state = {'config_reads': 0, 'auto_process': 'false', 'invocations': []}
+
+    def get_setting(key, default=None):
+        state['config_reads'] += 1
+        return state['auto_process'] if key == 'auto_process_feedback' else default
+
+    monkeypatch.setattr(feedback_ingestion, 'BatchWriter', FakeBatchWriter)
+    monkeypatch.setattr(feedback_ingestion, 'get_setting', get_setting)
+    monkeypatch.setattr(feedback_ingestion, 'invoke_agent_invoker', state['invocations'].append)
+    return state
+
+
+def post_batch(body):
+    event = {'resource': '/feedback/batch', 'body': body if isinstance(body, str) else json.dumps(body)}
+    response = feedback_ingestion.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+@pytest.mark.parametrize('body', ['not json', [], {'feedback': []}, {'customer_id': 'c1'}, 'null'])
+def test_batch_rejects_malformed_requests(batch_api, body):
+    status, result = post_batch(body)
+
+    assert status == 400
+    assert 'error' in result
+    assert FakeBatchWriter.instances == []
+
+
+def test_batch_rejects_too_many_records(batch_api, monkeypatch):
+    monkeypatch.setattr(feedback_ingestion, 'FEEDBACK_BATCH_MAX_ITEMS', 2)
+
+    status, _ = post_batch([feedback()] * 3)
+
+    assert status == 400
+
+
+def test_batch_accepts_all_valid_records(batch_api):
+    status, result = post_batch({'feedback': [feedback(), feedback(feedback_id='client-id')]})
+
+    assert status == 200
+    assert result['accepted'] == 2
+    stored_ids = [item['feedback_id'] for item in FakeBatchWriter.instances[0].items]
+    assert [entry['feedback_id'] for entry in result['results']] == stored_ids
+    assert 'client-id' not in stored_ids
+
+
+def test_batch_reports_partial_success_per_record(batch_api):
+    status, result = post_batch([feedback(), feedback(channel=''), feedback(rating=9)])
+
+    assert status == 207
+    assert (result['accepted'], result['rejected'], result['failed']) == (1, 2, 0)
+    assert [entry['status'] for entry in result['results']] == ['accepted', 'rejected', 'rejected']
+    assert result['results'][1] == {'index': 1, 'status': 'rejected', 'error': 'Field channel must be a non-empty string'}
+    assert len(FakeBatchWriter.instances[0].items) == 1
+
+
+def test_batch_with_only_invalid_records_is_a_client_error(batch_api):
+    status, result = post_batch([feedback(channel=''), {'customer_id': 'c1'}])
+
+    assert status == 400
+    assert result['rejected'] == 2
+
+
+def test_batch_reports_records_that_could_not_be_written(batch_api, monkeypatch):
+    monkeypatch.setattr(feedback_ingestion.uuid, 'uuid4', iter(['id-1', 'id-2']).__next__)
+    FakeBatchWriter.fail_ids = {'id-2'}
+
+    status, result = post_batch([feedback(), feedback()])
+
+    assert status == 207
+    assert result['results'][1] == {'index': 1, 'status': 'failed', 'error': 'Could not be stored, please resubmit'}
+
+
+def test_batch_where_nothing_could_be_written_is_a_server_error(batch_api, monkeypatch):
+    monkeypatch.setattr(feedback_ingestion.uuid, 'uuid4', iter(['id-1']).__next__)
+    FakeBatchWriter.fail_ids = {'id-1'}
+
+    status, result = post_batch([feedback()])
+
+    assert status == 500
+    assert result['failed'] == 1
+
+
+def test_batch_reads_config_once_and_groups_agent_invocations(batch_api):
+    batch_api['auto_process'] = 'true'
+
+    status, _ = post_batch([feedback()] * 25)
+
+    assert status == 200
+    assert batch_api['config_reads'] == 1
+    assert [len(payload['feedback_batch']) for payload in batch_api['invocations']] == [10, 10, 5]
+
+
+def test_batch_skips_agent_when_auto_processing_is_off(batch_api):
+    post_batch([feedback()] * 3)
+
+    assert batch_api['config_reads'] == 1
+    assert batch_api['invocations'] == []
+
+
+@pytest.fixture
+def single_api(tables, monkeypatch):
+    table = tables.define('feedback-records', 'feedback_id')
+    monkeypatch.setattr(feedback_ingestion, 'trigger_agent_processing', lambda feedback_id, data: None)
+    return table
+
+
+def post_single(body):
+    response = feedback_ingestion.lambda_handler({'body': json.dumps(body)}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+@pytest.mark.parametrize('record', [
+    feedback(channel=''),
+    feedback(rating=9),
+    feedback(rating='five'),
+    feedback(metadata='vip'),
+    feedback(feedback_text='x' * 20000),
+])
+def test_single_endpoint_keeps_accepting_records_batch_validation_rejects(single_api, record):
+    assert feedback_ingestion.validate_feedback(record)
+
+    status, result = post_single(record)
+
+    assert status == 200
+    assert single_api.items[(result['feedback_id'],)]['feedback_text'] == record['feedback_text']
+
+
+def test_single_endpoint_still_requires_fields(single_api):
+    record = feedback()
+    del record['channel']
+
+    status, result = post_single(record)
+
+    assert status == 500
+    assert result == {'error': 'Missing required field: channel'}
+    assert single_api.items == {}
@@ -0,0 +1,214 @@
+import random
+
+import pytest
+
+pytest.importorskip('strands')
+pytest.importorskip('bedrock_agentcore')
+
+import insights_agent
+
+
+def daily(scores, start_day=1):
+    return [f'2024-03-{start_day + index:02d}T12:00:00' for index in range(len(scores))]
+
+
+def test_statistics_of_a_linear_series():
+    scores = [0.2, 0.3, 0.4, 0.5, 0.6]
+
+    stats = insights_agent.compute_sentiment_statistics(daily(scores), scores)
+
+    assert stats['average_sentiment'] == 0.4
+    # z * sample std / sqrt(n) = 1.96 * 0.1581 / 2.236
+    assert stats['confidence_interval'] == [0.261, 0.539]
+    assert stats['slope_per_day'] == pytest.approx(0.1)
+    # A perfect fit leaves no residuals, so the slope interval collapses
+    assert stats['slope_confidence_interval'] == pytest.approx([0.1, 0.1])
+    assert stats['trend'] == 'improving'
+    assert (stats['first_analysis'], stats['last_analysis']) == ('2024-03-01T12:00:00.000000', '2024-03-05T12:00:00.000000')
+    assert stats['sentiment_distribution'] == {'positive': 0, 'neutral': 3, 'negative': 2}
+    assert sum(stats['score_histogram']) == 5
+
+
+def test_statistics_do_not_depend_on_input_order():
+    scores = [0.9, 0.7, 0.6, 0.4, 0.3, 0.1]
+    timestamps = daily(scores)
+    pairs = list(zip(timestamps, scores))
+    random.Random(7).shuffle(pairs)
+
+    shuffled = insights_agent.compute_sentiment_statistics([t for t, _ in pairs], [s for _, s in pairs])
+
+    assert shuffled == insights_agent.compute_sentiment_statistics(timestamps, scores)
+    assert shuffled['trend'] == 'declining'
+
+
+def test_ewma_weights_the_newest_samples_highest(monkeypatch):
+    scores = [0.2, 0.4, 0.9]
+    stats = insights_agent.compute_sentiment_statistics(daily(scores), scores)
+    assert stats['average_sentiment'] < stats['ewma_sentiment'] < 0.9
+
+    # A span of one gives the newest sample all of the weight
+    monkeypatch.setattr(insights_agent, 'TREND_EWMA_SPAN', 1)
+    assert insights_agent.compute_sentiment_statistics(daily(scores), scores)['ewma_sentiment'] == 0.9
+
+
+def test_noisy_flat_series_is_stable():
+    scores = [0.4, 0.6] * 10
+
+    stats = insights_agent.compute_sentiment_statistics(daily(scores), scores)
+
+    assert stats['trend'] == 'stable'
+    low, high = stats['slope_confidence_interval']
+    assert low < 0 < high
+
+
+def test_too_few_samples_have_no_trend():
+    stats = insights_agent.compute_sentiment_statistics(daily([0.2, 0.8]), [0.2, 0.8])
+
+    assert stats['trend'] == 'insufficient_data'
+    assert stats['slope_per_day'] is None and stats['slope_confidence_interval'] is None
+
+
+def test_summary_of_no_rows_is_insufficient_data():
+    summary = insights_agent.summarize_sentiment_items('7d', [], 'sentiment_index')
+
+    assert summary == {'timeframe': '7d', 'data_source': 'sentiment_index', 'total_analyses': 0,
+                       'average_sentiment': 0.5, 'trend': 'insufficient_data'}
+
+
+@pytest.fixture
+def sentiment_reads(monkeypatch):
+    reads = {'ranges': [], 'rows': [], 'previous': None, 'export': None}
+
+    def query_sentiment_range(start, end):
+        reads['ranges'].append((start, end))
+        return reads['rows']
+
+    monkeypatch.setattr(insights_agent, 'query_sentiment_range', query_sentiment_range)
+    monkeypatch.setattr(insights_agent, 'read_gzip_json', lambda key: reads['previous'])
+    monkeypatch.setattr(insights_agent, 'read_exported_sentiment', lambda start, end: reads['export'])
+    return reads
+
+
+REPORT_START = insights_agent.datetime(2024, 3, 1)
+REPORT_END = insights_agent.datetime(2024, 3, 8)
+
+
+def previous_entry(watermark='2024-03-07T00:00:00', data_source='sentiment_index'):
+    return {'watermark': watermark, 'data_source': data_source, 'series_key': 'reports/series/x.json.gz'}
+
+
+def test_report_series_without_a_previous_report_reads_the_timeframe(sentiment_reads):
+    sentiment_reads['rows'] = [{'feedback_id': 'f1', 'analysis_timestamp': '2024-03-02T00:00:00', 'sentiment_score': 0.7}]
+
+    series, source = insights_agent.build_report_series({'timeframe': '7d'}, None, REPORT_START, REPORT_END)
+
+    assert (series, source) == ({'f1': ['2024-03-02T00:00:00', 0.7]}, 'sentiment_index')
+    assert sentiment_reads['ranges'] == [(REPORT_START, REPORT_END)]
+
+
+def test_report_series_merges_the_delta_since_the_watermark(sentiment_reads):
+    sentiment_reads['previous'] = {
+        'old': ['2024-02-28T00:00:00', 0.1],
+        'kept': ['2024-03-03T00:00:00', 0.5],
+        'reanalyzed': ['2024-03-06T00:00:00', 0.2],
+    }
+    sentiment_reads['rows'] = [
+        {'feedback_id': 'reanalyzed', 'analysis_timestamp': '2024-03-07T00:01:00', 'sentiment_score': 0.9},
+        {'feedback_id': 'new', 'analysis_timestamp': '2024-03-07T12:00:00', 'sentiment_score': 0.6},
+    ]
+
+    series, source = insights_agent.build_report_series({'timeframe': '7d'}, previous_entry(), REPORT_START, REPORT_END)
+
+    assert source == 'sentiment_index'
+    assert series == {
+        'kept': ['2024-03-03T00:00:00', 0.5],
+        'reanalyzed': ['2024-03-07T00:01:00', 0.9],
+        'new': ['2024-03-07T12:00:00', 0.6],
+    }
+    # Only the delta is read, starting a little before the watermark
+    assert sentiment_reads['ranges'] == [
+        (insights_agent.datetime(2024, 3, 7) - insights_agent.REPORT_DELTA_OVERLAP, REPORT_END)]
+
+
+def test_report_series_delta_never_starts_before_the_timeframe(sentiment_reads):
+    sentiment_reads['previous'] = {}
+
+    insights_agent.build_report_series({'timeframe': '7d'}, previous_entry('2024-02-01T00:00:00'), REPORT_START, REPORT_END)
+
+    assert sentiment_reads['ranges'] == [(REPORT_START, REPORT_END)]
+
+
+@pytest.mark.parametrize('entry', [
+    previous_entry(data_source='analytics_export'),
+    previous_entry(watermark=None),
+])
+def test_report_series_rebuilds_when_the_previous_series_cannot_be_reused(sentiment_reads, entry):
+    sentiment_reads['previous'] = {'stale': ['2024-03-03T00:00:00', 0.5]}
+
+    series, _ = insights_agent.build_report_series({'timeframe': '7d'}, entry, REPORT_START, REPORT_END)
+
+    assert series == {}
+    assert sentiment_reads['ranges'] == [(REPORT_START, REPORT_END)]
+
+
+def test_long_report_series_come_from_the_analytics_export(sentiment_reads):
+    sentiment_reads['export'] = [{'feedback_id': 'f1', 'analysis_timestamp': '2024-01-02T00:00:00', 'sentiment_score': 0.4}]
+
+    series, source = insights_agent.build_report_series({'timeframe': '90d'}, previous_entry(), REPORT_START, REPORT_END)
+
+    assert (series, source) == ({'f1': ['2024-01-02T00:00:00', 0.4]}, 'analytics_export')
+    assert sentiment_reads['ranges'] == []
+
+
+def feedback_row(label, **metadata):
+    return {'sentiment_label': label, 'metadata': metadata}
+
+
+def test_churn_indicators_combine_the_weighted_signals():
+    rows = [
+        feedback_row('negative', churn_risk='high', resolution_status='unresolved'),
+        feedback_row('negative', resolution_status='resolved'),
+        feedback_row('positive', churn_risk='medium', resolution_status='escalated'),
+        feedback_row('neutral'),
+    ]
+
+    indicators = insights_agent.compute_churn_indicators(rows, 'declining')
+
+    assert indicators == {
+        'latest_stated_churn_risk': 'high',
+        'stated_churn_risk_counts': {'high': 1, 'medium': 1},
+        'resolution_status_counts': {'unresolved': 1, 'resolved': 1, 'escalated': 1},
+        'open_issues': 2,
+        'negative_streak': 2,
+        'recent_negative_share': 0.5,
+        # 0.35 * 1.0 + 0.25 * 2/3 + 0.25 * 0.5 + 0.15
+        'churn_risk_score': 0.792,
+        'churn_risk_level': 'high',
+    }
+
+
+def test_churn_risk_only_counts_the_five_newest_labels():
+    rows = [feedback_row('positive')] * 5 + [feedback_row('negative')] * 10
+
+    indicators = insights_agent.compute_churn_indicators(rows, 'stable')
+
+    assert (indicators['negative_streak'], indicators['recent_negative_share']) == (0, 0.0)
+    assert (indicators['churn_risk_score'], indicators['churn_risk_level']) == (0.0, 'low')
+
+
+def test_churn_risk_level_thresholds():
+    # Stated medium risk (0.175) plus a declining trend (0.15) is a medium risk
+    indicators = insights_agent.compute_churn_indicators([feedback_row('neutral', churn_risk='medium')], 'declining')
+
+    assert (indicators['churn_risk_score'], indicators['churn_risk_level']) == (0.325, 'medium')
+
+
+def test_churn_indicators_without_metadata():
+    rows = [{'sentiment_label': 'negative', 'metadata': 'not a map'}, {}]
+
+    indicators = insights_agent.compute_churn_indicators(rows, 'stable')
+
+    assert indicators['latest_stated_churn_risk'] is None
+    assert indicators['open_issues'] == 0
+    assert indicators['negative_streak'] == 1
+    assert indicators['recent_negative_share'] == 1.0
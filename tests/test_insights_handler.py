@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import insights_handler
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(insights_handler, '_last_metric_values', {})
+
+
+def failing(*args, **kwargs):
+    raise RuntimeError('rollups unavailable')
+
+
+def test_failed_metric_is_served_stale_with_last_good_value(monkeypatch):
+    monkeypatch.setattr(insights_handler, 'compare_windows', lambda window, resolution: {'change': 0.25})
+    values, _, stale = insights_handler.evaluate_metrics({'sentimentTrend': (insights_handler.get_sentiment_trend, 0)})
+    assert (values, stale) == ({'sentimentTrend': 0.25}, [])
+
+    monkeypatch.setattr(insights_handler, 'compare_windows', failing)
+    values, _, stale = insights_handler.evaluate_metrics({'sentimentTrend': (insights_handler.get_sentiment_trend, 0)})
+
+    assert (values, stale) == ({'sentimentTrend': 0.25}, ['sentimentTrend'])
+
+
+def test_failed_metric_without_a_last_value_uses_its_default(monkeypatch):
+    monkeypatch.setattr(insights_handler, 'latency_summary', failing)
+
+    values, _, stale = insights_handler.evaluate_metrics(
+        {'avgProcessingTime': (insights_handler.get_average_processing_time, 0)})
+
+    assert (values, stale) == ({'avgProcessingTime': 0}, ['avgProcessingTime'])
+
+
+def test_summary_marks_failed_providers_stale_and_uncacheable(monkeypatch):
+    monkeypatch.setattr(insights_handler, 'read_counters', lambda kind: {'feedback_count': 3})
+    monkeypatch.setattr(insights_handler, 'compare_windows', lambda window, resolution: {'change': None})
+    monkeypatch.setattr(insights_handler, 'latency_summary', lambda start, end: {})
+    monkeypatch.setattr(insights_handler, 'sentiment_series', failing)
+    monkeypatch.setattr(insights_handler, 'read_feed', failing)
+
+    response = insights_handler.handle_summary_insights()
+    body = json.loads(response['body'])
+
+    assert body['totalFeedback'] == 3
+    assert sorted(body['meta']['staleMetrics']) == ['activeSessions', 'recentActivity']
+    assert response['headers'] == {'Cache-Control': 'no-store'}
+
+
+def test_active_sessions_sum_the_last_hour_of_minute_rollups(monkeypatch):
+    requested = []
+
+    def series(start, end, resolution):
+        requested.append((end - start, resolution))
+        return [{'count': 2, 'score_sum': 1.0, 'labels': {}}, {'count': 3, 'score_sum': 2.0, 'labels': {}}]
+
+    monkeypatch.setattr(insights_handler, 'sentiment_series', series)
+
+    assert insights_handler.get_active_sessions_count() == 5
+    assert requested == [(insights_handler.timedelta(hours=1), 'minute')]
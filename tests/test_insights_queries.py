@@ -0,0 +1,73 @@
+import importlib.util
+import os
+
+import pytest
+
+import insights_queries
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      'scripts', 'backfill_feedback_index_attributes.py')
+
+
+@pytest.fixture
+def backfill_script():
+    spec = importlib.util.spec_from_file_location('backfill_feedback_index_attributes', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ScanTable:
+    def __init__(self, pages):
+        self.pages = pages
+        self.updates = []
+
+    def scan(self, **request):
+        page = request.get('ExclusiveStartKey', {}).get('page', 0)
+        response = {'Items': self.pages[page]}
+        if page + 1 < len(self.pages):
+            response['LastEvaluatedKey'] = {'page': page + 1}
+        return response
+
+    def update_item(self, **request):
+        self.updates.append(request)
+
+
+@pytest.mark.parametrize('built, allowed, rejected', [
+    (0, [], ['customer_id', 'category', None]),
+    (2, [None, 'customer_id'], ['channel', 'category']),
+    (4, [None, 'customer_id', 'channel', 'category', 'label'], []),
+])
+def test_queries_need_their_index_to_be_built(monkeypatch, built, allowed, rejected):
+    monkeypatch.setattr(insights_queries, 'FEEDBACK_QUERY_INDEXES', built)
+    monkeypatch.setattr(insights_queries, '_query_page', lambda *args: ([], None))
+    monkeypatch.setattr(insights_queries, 'batch_get', lambda *args: {})
+
+    for name in allowed:
+        insights_queries.query_feedback({name: 'value'} if name else {})
+    for name in rejected:
+        with pytest.raises(insights_queries.QueryError):
+            insights_queries.query_feedback({name: 'value'} if name else {})
+
+
+def test_backfill_sets_missing_index_attributes(backfill_script):
+    table = ScanTable([
+        [{'feedback_id': 'f1', 'timestamp': '2024-03-01T10:00:00', 'metadata': {'category': 'billing'}},
+         {'feedback_id': 'f2', 'timestamp': '2024-03-02T10:00:00', 'feedback_date': '2024-03-02'}],
+        [{'feedback_id': 'f3', 'timestamp': 'not a time'}],
+    ])
+
+    scanned, updated = backfill_script.backfill(table)
+
+    assert (scanned, updated) == (3, 1)
+    update = table.updates[0]
+    assert update['Key'] == {'feedback_id': 'f1'}
+    assert dict(zip(update['ExpressionAttributeNames'].values(), update['ExpressionAttributeValues'].values())) == {
+        'feedback_date': '2024-03-01', 'category': 'billing'}
+
+
+def test_backfill_dry_run_writes_nothing(backfill_script):
+    table = ScanTable([[{'feedback_id': 'f1', 'timestamp': '2024-03-01T10:00:00'}]])
+
+    assert backfill_script.backfill(table, dry_run=True) == (1, 1)
+    assert table.updates == []
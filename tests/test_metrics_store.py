@@ -0,0 +1,79 @@
+import metrics_aggregator
+import metrics_store
+
+
+class StubDynamoDB:
+    """Records transact_write_items calls; optionally fails one call."""
+
+    def __init__(self, fail_on_call=None):
+        self.calls = []
+        self.fail_on_call = fail_on_call
+
+    def transact_write_items(self, **request):
+        self.calls.append(request)
+        if self.fail_on_call == len(self.calls):
+            raise RuntimeError('transaction failed')
+
+
+def updates(count):
+    return [metrics_store.counter_update(f'bucket#{index}', {'count': 1}, shard_id=0) for index in range(count)]
+
+
+def test_updates_are_chunked_by_transaction_limit(tables):
+    client = tables.client('dynamodb', StubDynamoDB())
+
+    metrics_store.apply_counter_updates(updates(250), batch_id='batch-1')
+
+    assert [len(call['TransactItems']) for call in client.calls] == [100, 100, 50]
+
+
+def test_chunks_carry_stable_distinct_request_tokens(tables):
+    client = tables.client('dynamodb', StubDynamoDB())
+
+    metrics_store.apply_counter_updates(updates(150), batch_id='batch-1')
+    metrics_store.apply_counter_updates(updates(150), batch_id='batch-1')
+
+    tokens = [call['ClientRequestToken'] for call in client.calls]
+    assert tokens[:2] == tokens[2:]
+    assert tokens[0] != tokens[1]
+    assert all(len(token) <= 36 for token in tokens)
+
+
+def test_retried_batch_resends_committed_chunks_with_same_token(tables):
+    client = tables.client('dynamodb', StubDynamoDB(fail_on_call=2))
+
+    try:
+        metrics_store.apply_counter_updates(updates(150), batch_id='batch-1')
+    except RuntimeError:
+        pass
+    client.fail_on_call = None
+    metrics_store.apply_counter_updates(updates(150), batch_id='batch-1')
+
+    # The retry re-sends chunk 0 with the token DynamoDB already committed, so it is not applied twice
+    assert client.calls[0]['ClientRequestToken'] == client.calls[2]['ClientRequestToken']
+    assert client.calls[0]['TransactItems'] == client.calls[2]['TransactItems']
+
+
+def test_single_update_with_batch_id_uses_a_transaction(tables):
+    client = tables.client('dynamodb', StubDynamoDB())
+
+    metrics_store.apply_counter_updates(updates(1), batch_id='batch-1')
+
+    assert len(client.calls) == 1
+    assert 'ClientRequestToken' in client.calls[0]
+
+
+def test_aggregator_sends_the_same_request_when_a_batch_is_retried(tables):
+    client = tables.client('dynamodb', StubDynamoDB())
+    tables.define('metrics', 'metric_key', 'shard_id')
+    record = {
+        'eventName': 'INSERT',
+        'eventSourceARN': 'arn:aws:dynamodb:us-west-2:1:table/test-feedback-records-test/stream/x',
+        'dynamodb': {'SequenceNumber': '100', 'NewImage': {'feedback_id': {'S': 'f1'}, 'channel': {'S': 'email'}}}
+    }
+
+    metrics_aggregator.lambda_handler({'Records': [record]}, None)
+    metrics_aggregator.lambda_handler({'Records': [record]}, None)
+
+    # The summary shard is derived from the batch, not drawn at random
+    assert client.calls[0] == client.calls[1]
@@ -0,0 +1,108 @@
+import pytest
+
+import agent_invoker
+import processing_state
+from conftest import FakeTable, conditional_check_failed
+
+
+class FakeStateTable(FakeTable):
+    """FakeTable with the claim and release updates of processing_state."""
+
+    def __init__(self):
+        super().__init__(['feedback_id'])
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues, **kwargs):
+        values = ExpressionAttributeValues
+        current = self.items.get(self._key(Key))
+        if ':lease' in values:
+            ok = current is None or (
+                current['state'] != processing_state.STATE_DONE
+                and (current['state'] == processing_state.STATE_PENDING
+                     or current['owner'] == values[':owner']
+                     or current.get('lease_expires_at', 0) < values[':now'])
+            )
+            updated = {'state': processing_state.STATE_IN_PROGRESS, 'owner': values[':owner'],
+                       'lease_expires_at': values[':lease']}
+        else:
+            ok = current is not None and current['state'] == processing_state.STATE_IN_PROGRESS \
+                and current['owner'] == values[':owner']
+            updated = {'state': processing_state.STATE_PENDING, 'lease_expires_at': 0}
+        if not ok:
+            raise conditional_check_failed()
+        self.items[self._key(Key)] = {**(current or {}), **Key, **updated}
+        return {}
+
+
+@pytest.fixture
+def states(monkeypatch):
+    table = FakeStateTable()
+    monkeypatch.setattr(processing_state, '_table', lambda: table)
+
+    class StateWriter:
+        def __init__(self, table_name):
+            self.items = []
+
+        def put(self, item):
+            self.items.append(item)
+
+        def flush(self):
+            for item in self.items:
+                table.items[(item['feedback_id'],)] = item
+            return []
+
+    monkeypatch.setattr(processing_state, 'BatchWriter', StateWriter)
+    return table
+
+
+def stream_record(feedback_id, sequence):
+    return {'eventName': 'INSERT',
+            'dynamodb': {'SequenceNumber': sequence, 'NewImage': {'feedback_id': {'S': feedback_id}}}}
+
+
+def test_claim_distinguishes_done_from_held(states):
+    assert processing_state.claim('f1', 'direct') == processing_state.CLAIM_ACQUIRED
+    assert processing_state.claim('f1', 'direct') == processing_state.CLAIM_ACQUIRED
+    assert processing_state.claim('f1', 'stream') == processing_state.CLAIM_HELD
+
+    processing_state.complete(['f1'], 'direct')
+
+    assert processing_state.claim('f1', 'stream') == processing_state.CLAIM_DONE
+
+
+def test_expired_lease_can_be_taken_over(states):
+    processing_state.claim('f1', 'direct')
+    states.items[('f1',)]['lease_expires_at'] = 0
+
+    assert processing_state.claim('f1', 'stream') == processing_state.CLAIM_ACQUIRED
+
+
+def test_stream_retries_record_held_by_direct_path_until_released(states):
+    record = stream_record('f1', '100')
+    processing_state.claim('f1', agent_invoker.DIRECT_CLAIM_OWNER)
+
+    claimed, skipped, retry = agent_invoker.claim_records([record])
+    assert (claimed, skipped, retry) == ([], [], ['100'])
+
+    # The direct path fails and hands the item back
+    processing_state.release('f1', agent_invoker.DIRECT_CLAIM_OWNER)
+
+    claimed, skipped, retry = agent_invoker.claim_records([record])
+    assert (claimed, skipped, retry) == ([record], [], [])
+
+
+def test_stream_skips_record_the_direct_path_finished(states):
+    processing_state.claim('f1', agent_invoker.DIRECT_CLAIM_OWNER)
+    processing_state.complete(['f1'], agent_invoker.DIRECT_CLAIM_OWNER)
+
+    claimed, skipped, retry = agent_invoker.claim_records([stream_record('f1', '100')])
+
+    assert (claimed, retry) == ([], [])
+    assert skipped == [{'feedback_id': 'f1', 'status': 'duplicate_skipped'}]
+
+
+def test_stream_release_leaves_direct_claim_alone(states):
+    processing_state.claim('f1', agent_invoker.DIRECT_CLAIM_OWNER)
+
+    processing_state.release('f1', agent_invoker.STREAM_CLAIM_OWNER)
+
+    assert states.items[('f1',)]['state'] == processing_state.STATE_IN_PROGRESS
@@ -0,0 +1,116 @@
+import gzip
+import json
+
+import pytest
+
+import s3_ingestion
+
+RECORDS = [
+    {'customer_id': 'c1', 'feedback_text': 'Great service'},
+    {'customer_id': 'c2', 'feedback_text': 'Très bien, merci — ★★★★★'},
+    {'customer_id': 'c3', 'feedback_text': '配送が遅い'},
+]
+
+ARRAY = (' [\n  ' + ',\n  '.join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + '\n]\n').encode('utf-8')
+LINES = ('\n'.join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + '\n').encode('utf-8')
+DOCUMENTS = ('\n'.join(json.dumps(record, ensure_ascii=False, indent=2) for record in RECORDS) + '\n').encode('utf-8')
+
+
+def chunked(data, size):
+    return (data[index:index + size] for index in range(0, len(data), size))
+
+
+def parse(data, chunk_size, **kwargs):
+    return list(s3_ingestion.iter_records(chunked(data, chunk_size), **kwargs))
+
+
+@pytest.mark.parametrize('data, file_format', [(ARRAY, 'array'), (LINES, 'lines'), (DOCUMENTS, 'document')])
+@pytest.mark.parametrize('chunk_size', [1, 5, 64, 1 << 16])
+def test_offsets_span_each_record(data, file_format, chunk_size):
+    formats = []
+
+    records = parse(data, chunk_size, on_format=formats.append)
+
+    assert formats == [file_format]
+    assert [value for _, _, value, _ in records] == RECORDS
+    for start, end, value, _ in records:
+        assert json.loads(data[start:end]) == value
+
+
+@pytest.mark.parametrize('data, file_format', [(ARRAY, 'array'), (LINES, 'lines'), (DOCUMENTS, 'document')])
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_resuming_from_a_record_end_yields_the_remaining_records(data, file_format, chunk_size):
+    records = parse(data, 1 << 16)
+
+    for index, (_, end, _, _) in enumerate(records):
+        resumed = parse(data[end:], chunk_size, offset=end, file_format=file_format)
+
+        assert resumed == records[index + 1:]
+
+
+@pytest.mark.parametrize('data, file_format', [(ARRAY, 'array'), (LINES, 'lines')])
+def test_resuming_gzip_input_skips_decompressed_bytes(data, file_format):
+    compressed = gzip.compress(data)
+    records = parse(data, 1 << 16)
+    _, end, _, _ = records[0]
+
+    chunks = s3_ingestion.skip_bytes(s3_ingestion.decompressed_chunks(chunked(compressed, 9)), end)
+    resumed = list(s3_ingestion.iter_records(chunks, offset=end, file_format=file_format))
+
+    assert s3_ingestion.is_gzip('feedback.json', None, compressed[:2])
+    assert resumed == records[1:]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 1 << 16])
+def test_single_pretty_printed_object_is_one_record(chunk_size):
+    data = json.dumps(RECORDS[1], ensure_ascii=False, indent=2).encode('utf-8')
+    formats = []
+
+    records = parse(data, chunk_size, on_format=formats.append)
+
+    assert formats == ['document']
+    assert records == [(0, len(data), RECORDS[1], None)]
+
+
+def test_single_line_object_is_json_lines():
+    formats = []
+
+    records = parse(json.dumps(RECORDS[0]).encode('utf-8'), 4, on_format=formats.append)
+
+    assert formats == ['lines']
+    assert [value for _, _, value, _ in records] == [RECORDS[0]]
+
+
+def test_bad_first_line_still_parses_as_json_lines():
+    records = parse(b'{not json\n{"customer_id": "c2"}\n', 3)
+
+    assert records[0][3].startswith('invalid JSON')
+    assert records[1][2] == {'customer_id': 'c2'}
+
+
+def test_bad_line_is_reported_and_parsing_continues():
+    data = b'{"customer_id": "c1"}\n{not json}\n\n{"customer_id": "c2"}'
+
+    records = parse(data, 4)
+
+    assert [(start, end) for start, end, _, _ in records] == [(0, 22), (22, 33), (34, 55)]
+    assert records[1][2] is None and records[1][3].startswith('invalid JSON')
+    assert records[2][2] == {'customer_id': 'c2'}
+
+
+def test_number_split_across_chunks_is_not_cut_short():
+    records = parse(b'[12345, 6]', 3)
+
+    assert [(start, end, value) for start, end, value, _ in records] == [(1, 6, 12345), (8, 9, 6)]
+
+
+def test_unterminated_array_is_malformed():
+    with pytest.raises(s3_ingestion.MalformedFileError):
+        parse(b'[{"customer_id": "c1"}, ', 4)
+
+
+def test_record_ids_are_stable_per_offset():
+    first = s3_ingestion.record_feedback_id('bucket', 'feedback.json', 'etag', 0)
+
+    assert first == s3_ingestion.record_feedback_id('bucket', 'feedback.json', 'etag', 0)
+    assert first != s3_ingestion.record_feedback_id('bucket', 'feedback.json', 'etag', 22)